@@ -0,0 +1,7 @@
+"""
+    Benchmarks
+
+    Times the hot paths of the higher/lower game and the report downloader, keeps a JSON history of the results
+    and fails when a path has become slower than its recent history by more than a threshold.
+    To Run: `python -m benchmarks`
+"""
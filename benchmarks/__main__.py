@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+from . import downloader_benchmarks, game_benchmarks
+
+SUITES = {
+    "game": game_benchmarks.run,
+    "downloader": downloader_benchmarks.run,
+}
+
+
+def load_history(path: str) -> list[dict]:
+    """Returns the recorded benchmark runs, oldest first, or an empty list if there is no history file."""
+    if not os.path.exists(path):
+        return []
+    with open(path) as file:
+        return json.load(file)
+
+
+def find_regressions(results: dict[str, float], history: list[dict], threshold: float, window: int = 5) -> list[str]:
+    """
+    Compares each result to the median of its most recent recorded runs.
+
+    Parameters
+    ----------
+    results (dict[str, float]): The seconds per call of each benchmark in this run
+    history (list[dict]): The recorded runs, oldest first
+    threshold (float): How much slower than the median a result may be, 0.25 allows 25% slower
+    window (int): How many of the most recent recorded runs make up the baseline
+
+    Returns
+    -------
+    regressions (list[str]): A description of each benchmark that is slower than allowed
+    """
+    regressions = []
+    for name, seconds in results.items():
+        recent = [run["results"][name] for run in history if name in run["results"]][-window:]
+        if not recent:
+            continue
+        baseline = statistics.median(recent)
+        if seconds > baseline * (1 + threshold):
+            regressions.append(f"{name}: {seconds * 1e6:.3f} us is {seconds / baseline - 1:.0%} slower than {baseline * 1e6:.3f} us")
+    return regressions
+
+
+def main() -> None:
+    """Runs the benchmarks, records the results and exits with an error if any path has regressed."""
+    parser = argparse.ArgumentParser(prog="benchmarks", description="Time the game and downloader hot paths.")
+    parser.add_argument("--history", default="bench_history.json", help="JSON file the results are recorded in")
+    parser.add_argument("--threshold", type=float, default=0.25, help="fraction slower than recent runs that counts as a regression")
+    parser.add_argument("--suite", choices=sorted(SUITES), action="append", help="only run the given suites")
+    parser.add_argument("--no-record", action="store_true", help="compare against the history without adding this run to it")
+    args = parser.parse_args()
+
+    results = {}
+    for suite in args.suite or SUITES:
+        results.update(SUITES[suite]())
+    for name, seconds in results.items():
+        print(f"{name:<28}{seconds * 1e6:>14.3f} us")
+
+    history = load_history(args.history)
+    regressions = find_regressions(results, history, args.threshold)
+
+    if not args.no_record:
+        history.append({"timestamp": time.time(), "python": platform.python_version(), "results": results})
+        with open(args.history, "w") as file:
+            json.dump(history, file, indent=2)
+
+    if regressions:
+        print("Regressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Benchmarks for the report downloader against the local stand-in server."""
+from __future__ import annotations
+
+import asyncio
+import io
+import os
+import shutil
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+from parallelprocessing import parallel_processing
+from parallelprocessing.loadtest import load_test
+from parallelprocessing.mock_server import start_mock_server
+
+
+async def time_download(days: int, repeat: int) -> float:
+    """Returns the fastest time in seconds to download a number of days from the stand-in server."""
+    runner, report_api = await start_mock_server()
+    try:
+        timings = []
+        with tempfile.TemporaryDirectory() as directory:
+            for _ in range(repeat):
+                output = os.path.join(directory, "reports")
+                started = time.perf_counter()
+                with redirect_stdout(io.StringIO()):
+                    await parallel_processing.main(report_api=report_api, output=output, days=range(1, days + 1), checkpoint=None, cache=None)
+                timings.append(time.perf_counter() - started)
+                shutil.rmtree(output)
+        return min(timings)
+    finally:
+        await runner.cleanup()
+
+
+def run(days: int = 2, repeat: int = 3, requests: int = 500) -> dict[str, float]:
+    """Runs the downloader benchmarks and returns the seconds per downloaded day and the seconds per request at the p50 and p99 latency."""
+    results = asyncio.run(load_test(requests=requests, concurrency=20))
+    return {
+        "download_day": asyncio.run(time_download(days, repeat)) / days,
+        "request_p50": results["p50_ms"] / 1000,
+        "request_p99": results["p99_ms"] / 1000,
+    }
@@ -0,0 +1,70 @@
+"""Benchmarks for the card, deck and game classes."""
+from __future__ import annotations
+
+import io
+import timeit
+from contextlib import redirect_stdout
+from typing import Callable
+from unittest import mock
+
+from higherlowergame.card import Card
+from higherlowergame.deck import Deck
+from higherlowergame.game import Game
+from higherlowergame.state import GameState
+
+
+def time_call(function: Callable[[], object], repeat: int = 5) -> float:
+    """Returns the fastest time in seconds of one call to a function, over several timing runs."""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def silent_game(max_rounds: int) -> Callable[[], None]:
+    """Returns a function that plays a whole game without any output, Game.take_guess must be patched to not ask for input."""
+    game = Game()
+    game.max_rounds = max_rounds
+    game.deck = Deck()
+    game.replay_question = lambda: None
+    output = io.StringIO()
+
+    def play() -> None:
+        game.deck.reset_deck()
+        game.score = 0
+        output.seek(0)
+        output.truncate()
+        with redirect_stdout(output):
+            game.play_game()
+
+    return play
+
+
+def run() -> dict[str, float]:
+    """Runs every game benchmark and returns the seconds per call of each."""
+    deck = Deck()
+    card = Card("Clubs", "8")
+    previous_card = Card("Hearts", "Q")
+
+    def move_through_deck() -> None:
+        deck.current_position = 0
+        for _ in range(51):
+            deck.move_to_next_card()
+
+    state = GameState()
+    snapshot = state.snapshot()
+
+    results = {
+        "deck_construction": time_call(Deck),
+        "shuffle_deck": time_call(deck.shuffle_deck),
+        "reset_deck": time_call(deck.reset_deck),
+        "move_to_next_card": time_call(move_through_deck) / 51,
+        "compare_cards": time_call(lambda: card.compare_cards(previous_card)),
+        "card_name": time_call(card.card_name),
+        "state_snapshot": time_call(state.snapshot),
+        "state_load": time_call(lambda: state.load(snapshot)),
+        "state_restore": time_call(lambda: GameState.restore(snapshot)),
+    }
+    with mock.patch.object(Game, "take_guess", staticmethod(lambda: 1)):
+        for max_rounds in (3, 10, 50):
+            results[f"play_game_{max_rounds}_rounds"] = time_call(silent_game(max_rounds))
+    return results
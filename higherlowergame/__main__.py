@@ -1,9 +1,62 @@
+import argparse
+import asyncio
+import os
+import sys
+
+from .batch import FORMATS, OUTPUT_BUFFER, play_batch
+from .eventlog import EventLogWriter
 from .game import Game
+from .leaderboard import Leaderboard
+from .server import serve
+from .solver import PolicyTable, Solver
 
 def main() -> None:
-    """Start a new game."""
-    game = Game()
-    game.new_game()
+    """Start a new game, play games from a script of answers with --batch, or host games for many players over TCP with --serve."""
+    parser = argparse.ArgumentParser(prog="higherlowergame", description="Play the Higher/Lower game.")
+    parser.add_argument("--serve", action="store_true", help="host games over TCP instead of playing in the terminal")
+    parser.add_argument("--host", default="127.0.0.1", help="the host to serve on")
+    parser.add_argument("--port", type=int, default=8765, help="the port to serve on")
+    parser.add_argument("--event-log", help="append the outcome of every round to this binary log file")
+    parser.add_argument("--hints", action="store_true", help="show the odds of the next card and the best guess before each guess")
+    parser.add_argument("--policy", help="take the best guess from this policy table written by solver.save_table instead of solving as you play")
+    parser.add_argument("--leaderboard", help="rank final scores, loading and saving the leaderboard in this file")
+    parser.add_argument("--player", type=int, help="the id of 0 or more to rank your final scores under when playing with --leaderboard")
+    parser.add_argument("--save-interval", type=float, default=60.0, help="seconds between saves of the leaderboard")
+    parser.add_argument("--batch", nargs="?", const="-", metavar="ANSWERS", help="play games from a file of h, l, p, y and n lines, p playing the best guess, or stdin if - or not given")
+    parser.add_argument("--format", choices=FORMATS, default="transcript", help="write batch play as the game transcript or one CSV row per round")
+    parser.add_argument("--output", help="write batch play to this file instead of stdout")
+    parser.add_argument("--seed", type=int, help="shuffle the batch play decks the same way every time")
+    args = parser.parse_args()
+
+    event_log = EventLogWriter(args.event_log) if args.event_log else None
+    policy = PolicyTable(args.policy) if args.policy else Solver()
+    leaderboard = None
+    if args.leaderboard:
+        leaderboard = Leaderboard.load(args.leaderboard) if os.path.exists(args.leaderboard) else Leaderboard()
+    try:
+        if args.serve:
+            asyncio.run(serve(args.host, args.port, event_log=event_log, leaderboard=leaderboard, leaderboard_path=args.leaderboard, save_interval=args.save_interval))
+            return
+
+        if args.batch is not None:
+            answers = sys.stdin if args.batch == "-" else open(args.batch)
+            output = open(args.output, "w", buffering=OUTPUT_BUFFER, newline="") if args.output else sys.stdout
+            try:
+                play_batch(answers, output, args.format, seed=args.seed, show_hints=args.hints, event_log=event_log, leaderboard=leaderboard, player_id=args.player,
+                           policy=policy)
+            finally:
+                if answers is not sys.stdin:
+                    answers.close()
+                if output is not sys.stdout:
+                    output.close()
+        else:
+            game = Game(event_log, show_hints=args.hints, leaderboard=leaderboard, player_id=args.player, policy=policy)
+            game.new_game()
+        if leaderboard is not None:
+            leaderboard.save(args.leaderboard)
+    finally:
+        if event_log is not None:
+            event_log.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,142 @@
+"""
+    Batch play
+
+    Plays games back to back from a script of answers, one per line as a player would type them: h or l for each guess and
+    y or n after each game, or p to play the guess a policy, the solver or a precomputed policy table, says is best. Nothing is prompted for or echoed, every game is one pass of a loop over GameState.step, and all
+    output goes through one buffered writer, either as the transcript the terminal game would show or as one CSV row per round.
+    With a seed the decks are dealt the same every time, so a recorded session replays to the same output.
+    To Run: `python -m higherlowergame --batch answers.txt --seed 1 --format csv --output rounds.csv`, or `--batch -` to read stdin
+"""
+from __future__ import annotations
+
+import random
+from typing import Iterable, NamedTuple, Optional, TextIO, Union
+
+from .deck import Deck
+from .eventlog import EventLogWriter
+from .game import Game
+from .leaderboard import Leaderboard
+from .solver import PolicyTable, Solver
+from .state import GameState
+
+FORMATS = ("transcript", "csv")
+CSV_HEADER = "game,round,previous_card,card,guess,answer,points,score\n"
+OUTPUT_BUFFER = 1 << 16
+
+
+class BatchResult(NamedTuple):
+    """How many games were finished and rounds played, and how many lines were not a valid answer."""
+    games: int
+    rounds: int
+    invalid: int
+
+
+def play_batch(
+    lines: Iterable[str], output: TextIO, format: str = "transcript", max_rounds: int = 3, seed: Optional[int] = None,
+    show_hints: bool = False, event_log: Optional[EventLogWriter] = None, leaderboard: Optional[Leaderboard] = None, session_id: Optional[int] = None,
+    player_id: Optional[int] = None, policy: Optional[Union[Solver, PolicyTable]] = None,
+) -> BatchResult:
+    """
+    Plays games from lines of answers until a game is finished with n or the lines run out, writing each round to output.
+
+    Parameters
+    ----------
+    lines (Iterable[str]): The answers, such as an open file, line endings and surrounding spaces are ignored, p plays the policy's best guess
+    output (TextIO): Where the transcript or CSV rows are written
+    format (str): "transcript" for the messages the terminal game shows or "csv" for one row per round
+    max_rounds (int): How many rounds a game consists of
+    seed (int): Shuffles every deck the same way each time if given
+    show_hints (bool): Whether the transcript shows the odds and the policy's best guess before each guess
+    event_log (EventLogWriter): Where the outcome of every round is recorded, if given
+    leaderboard (Leaderboard): Where the final score of every game is recorded, if given
+    session_id (int): The id the rounds are recorded under, a new session of the event log if not given
+    player_id (int): The player the final scores are ranked as, a new anonymous player of the leaderboard if not given
+    policy (Solver | PolicyTable): What the best guess comes from for p answers and hints, a Solver if not given
+
+    Returns
+    -------
+    result (BatchResult): How many games and rounds were played and lines were invalid
+
+    Raises
+    ------
+    ValueError: if the format is not transcript or csv
+    """
+    if format not in FORMATS:
+        raise ValueError(f"The format must be one of {', '.join(FORMATS)}, not {format}")
+    if session_id is None:
+        session_id = event_log.next_session() if event_log is not None else 0
+    if player_id is None and leaderboard is not None:
+        player_id = leaderboard.new_player_id()
+    if policy is None:
+        policy = Solver()
+    hints = policy if show_hints else None
+    transcript = format == "transcript"
+    write = output.write
+    state = GameState(Deck(random.Random(seed)), max_rounds)
+    games = rounds = invalid = 0
+
+    if transcript:
+        write("Setting up a new game.\n")
+        write(round_lines(state, hints))
+    else:
+        write(CSV_HEADER)
+    for line in lines:
+        answer = line.strip()
+        if state.over:
+            if answer == "y":
+                state.new_game()
+                if transcript:
+                    write("Setting up a new game.\n")
+                    write(round_lines(state, hints))
+            elif answer == "n":
+                if transcript:
+                    write("Thank you for playing.\n")
+                break
+            else:
+                invalid += 1
+                if transcript:
+                    write("Please only answer with 'y' or 'n'\n")
+            continue
+
+        if answer == "h":
+            guess = 1
+        elif answer == "l":
+            guess = -1
+        elif answer == "p":
+            guess = policy.advise(state)[0]
+        else:
+            invalid += 1
+            if transcript:
+                write("Please only enter 'h' or 'l' to guess\n")
+            continue
+
+        outcome = state.step(guess)
+        rounds += 1
+        if event_log is not None:
+            event_log.record(session_id, outcome.round, outcome.previous_card.index, outcome.card.index, guess, outcome.answer, outcome.points)
+        if transcript:
+            write(f"The next card is {outcome.card.name}\n{Game.result_message(outcome)}\n")
+        else:
+            write(f"{games + 1},{outcome.round + 1},{outcome.previous_card.name},{outcome.card.name},{'h' if guess == 1 else 'l'},{outcome.answer},{outcome.points},{outcome.score}\n")
+
+        if not state.over:
+            if transcript:
+                write(round_lines(state, hints))
+            continue
+        games += 1
+        if leaderboard is not None:
+            leaderboard.record(player_id, state.score)
+        if transcript:
+            write(f"Game Over\nYour final score was: {state.score}\n")
+            if leaderboard is not None:
+                write(f"Your best score ranks {leaderboard.rank(player_id)} of {len(leaderboard)}\n")
+    return BatchResult(games, rounds, invalid)
+
+
+def round_lines(state: GameState, hints: Optional[Union[Solver, PolicyTable]] = None) -> str:
+    """Returns the transcript lines introducing the next round, as the terminal game shows them before asking for a guess, with hints from a policy if given."""
+    lines = f"Rounder number {state.round + 1}:\nThe {'first card is' if state.round == 0 else 'previous card was'} {state.card().name}\n"
+    if hints is not None:
+        lines += Game.hint_message(state.odds(), hints.advise(state)) + "\n"
+    return lines
+
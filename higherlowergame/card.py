@@ -28,12 +28,21 @@ class Card:
     """
     A class to represent a Card
 
+    There are only 52 Card objects, one for each suit and value, created once when the module loads.
+    Constructing a Card returns the existing object so cards can be compared by identity and use no per-instance dict.
+
     Attributes
     ----------
     suit : str
         The suit of the card
     value: str
         The name of the card mapping to a numerical value 1-13
+    index: int
+        The position 0-51 of the card in a new unshuffled deck
+    name: str
+        The human readable card name
+    rank: int
+        The numerical value 1-13 of the card
 
     Methods
     -------
@@ -44,9 +53,11 @@ class Card:
     compare_cards(previous_card):
         Takes another Card and returns which has the higher value.
     """
-    def __init__(self, suit: str, value: str) -> None:
+    __slots__ = ("suit", "value", "index", "name", "rank")
+
+    def __new__(cls, suit: str, value: str) -> Card:
         """
-        Constructs all the attributes for a card object
+        Returns the card object for a suit and value
 
         Parameters
         ----------
@@ -55,17 +66,29 @@ class Card:
         value: str
             The name of the card
 
+        Raises
+        ------
+        ValueError: if the suit or value is not one of a standard deck
         """
-        self.suit = suit
-        self.value = value
-    
+        try:
+            return _cards_by_key[suit, value]
+        except KeyError:
+            raise ValueError(f"There is no {value} of {suit} card") from None
+
+    def __reduce__(self) -> tuple:
+        """Pickles the card by its suit and value so unpickling returns the shared card object."""
+        return (Card, (self.suit, self.value))
+
+    def __repr__(self) -> str:
+        return f"Card({self.suit!r}, {self.value!r})"
+
     def card_name(self) -> str:
         """Returns a human readable card name."""
-        return f"{self.value}{suits[self.suit]}"
+        return self.name
 
-    def card_value(self) -> str:
+    def card_value(self) -> int:
         """Returns the numerical value of a card."""
-        return values[self.value]
+        return self.rank
 
     def compare_cards(self, previous_card: Card) -> int:
         """
@@ -79,12 +102,31 @@ class Card:
         -------
         compare_result (int): An integer describing which card had the higher value, 1 for this card, -1 for the previous_card and 0 if they match
         """
-        current_value = self.card_value()
-        previous_value = previous_card.card_value()
-
-        if current_value == previous_value:
-            return 0
-        elif current_value > previous_value:
-            return 1
-        else:
-            return -1
+        return COMPARE_RESULTS[self.index][previous_card.index]
+
+
+def _create_card(suit: str, value: str, index: int) -> Card:
+    """Creates one of the 52 shared card objects, only called when the module loads."""
+    card = object.__new__(Card)
+    card.suit = suit
+    card.value = value
+    card.index = index
+    card.name = f"{value}{suits[suit]}"
+    card.rank = values[value]
+    return card
+
+
+# All 52 cards in the order of a new unshuffled deck, CARDS[card.index] is card
+CARDS = tuple(
+    _create_card(card_suit, card_value, suit_number * len(values) + value_number)
+    for suit_number, card_suit in enumerate(suits.keys())
+    for value_number, card_value in enumerate(values.keys())
+)
+
+_cards_by_key = {(card.suit, card.value): card for card in CARDS}
+
+# COMPARE_RESULTS[current.index][previous.index] is the result of current.compare_cards(previous)
+COMPARE_RESULTS = tuple(
+    tuple((current.rank > previous.rank) - (current.rank < previous.rank) for previous in CARDS)
+    for current in CARDS
+)
@@ -1,14 +1,31 @@
+from __future__ import annotations
+
 import random
-from .card import suits, values, Card
+from array import array
+from typing import Iterable, Optional
+from .card import CARDS, Card, values
+from .rank_counter import RankCounter
+
+
+class DeckExhausted(Exception):
+    """Raised when trying to move past the last card of a deck."""
+
 
 class Deck:
     """
     A class to represent a collection of cards in a specific order
 
+    The order of the cards is kept as a compact array of card indices, the Card objects themselves are shared.
+    Once the odds are asked for, the values of the cards after the current position are counted and the count is updated as each card is taken.
+
     Attributes
     ----------
+    rng : random.Random
+        The random number generator used to shuffle the deck
+    order : array
+        The index of each card in the deck, one byte per card
     deck : list[Card]
-        A list of Cards
+        A list of Cards in deck order
     current_position : int
         The position in the list of the cards to reperasent the top card in the deck
 
@@ -24,36 +41,63 @@ class Deck:
         Takes the card from the top of the deck, moving to the next position.
     reset_deck():
         Reorders the deck of cards and sets the position back to the start.
+    from_order(order):
+        Returns a deck with the cards in a given order.
+    remaining_ranks():
+        Returns the count of each value in the cards after the current position.
+    odds(card):
+        Returns the chance of the next card being higher, lower or matching a card.
     """
-    def __init__(self):
+    def __init__(self, rng: Optional[random.Random] = None, order: Optional[Iterable[int]] = None):
         """
         Constructs all the attributes for a Deck object.
 
-        Sets up a list of Cards for all 52 combinations then shuffles the list and sets the position to the start.
+        Sets up the order of all 52 cards then shuffles the order and sets the position to the start.
+
+        Parameters
+        ----------
+        rng: random.Random
+            The random number generator to shuffle with, the random module if not given
+        order: Iterable[int]
+            The card indices in deck order, used as they are without shuffling if given
         """
-        all_suits = suits.keys()
-        all_values = values.keys()
-
-        self.deck = []
-        for card_suit in all_suits:
-            for card_value in all_values:
-                self.deck.append(Card(card_suit, card_value))
-        
-        self.shuffle_deck()
+        self.rng = rng if rng is not None else random
+        self._remaining = None
+        self._counted_order = None
+        self._counted_position = 0
+        if order is not None:
+            self.order = array("B", order)
+        else:
+            self.order = array("B", range(len(CARDS)))
+            self.shuffle_deck()
         self.current_position = 0
 
+    @classmethod
+    def from_order(cls, order: Iterable[int], rng: Optional[random.Random] = None) -> Deck:
+        """Returns a deck with the cards in a given order of card indices, such as a row from streams.shuffled_decks."""
+        return cls(rng, order)
+
+    @property
+    def deck(self) -> list[Card]:
+        """A list of the Cards in deck order."""
+        return [CARDS[index] for index in self.order]
+
+    @deck.setter
+    def deck(self, cards: Iterable[Card]) -> None:
+        self.order = array("B", (card.index for card in cards))
 
     def shuffle_deck(self) -> None:
         """Reorders the list of cards in a random order."""
-        random.shuffle(self.deck)
+        self.rng.shuffle(self.order)
+        self._remaining = None
 
     def current_card(self) -> Card:
         """Returns the Card at the top of the deck."""
-        return self.deck[self.current_position]
+        return CARDS[self.order[self.current_position]]
 
     def previous_card(self) -> Card:
         """Returns the previous Card that was at the top of the deck."""
-        return self.deck[self.current_position - 1]
+        return CARDS[self.order[self.current_position - 1]]
 
     def move_to_next_card(self) -> None:
         """
@@ -61,18 +105,46 @@ class Deck:
 
         Raises
         ------
-        Exception: if there are no more cards in the list
+        DeckExhausted: if there are no more cards in the list
         """
-        if self.current_position >= len(self.deck):
-            raise Exception("last card")
+        if self.current_position >= len(self.order):
+            raise DeckExhausted("last card")
 
         self.current_position += 1
+        counted = self._remaining is not None and self._counted_order is self.order and self._counted_position + 1 == self.current_position
+        if counted and self.current_position < len(self.order):
+            self._remaining.remove(CARDS[self.order[self.current_position]].rank - 1)
+            self._counted_position = self.current_position
     
     def reset_deck(self) -> None:
         """Reorders the deck of cards and sets the position back to the start."""
         self.current_position = 0
         self.shuffle_deck()
 
+    def remaining_ranks(self) -> RankCounter:
+        """
+        Returns the count of each value in the cards after the current position.
 
+        The count is only rebuilt if the deck was reordered or the position was changed other than by move_to_next_card.
+        Rank 0 of the counter is for aces and rank 12 for kings.
+        """
+        if self._remaining is None or self._counted_order is not self.order or self._counted_position != self.current_position:
+            self._remaining = RankCounter.from_ranks((CARDS[index].rank - 1 for index in self.order[self.current_position + 1:]), len(values))
+            self._counted_order = self.order
+            self._counted_position = self.current_position
+        return self._remaining
 
+    def odds(self, card: Optional[Card] = None) -> tuple[float, float, float]:
+        """
+        Returns the chance of the next card being higher, lower or matching a card.
+
+        Parameters
+        ----------
+        card (Card): The card to compare to, the current card if not given
 
+        Returns
+        -------
+        odds (tuple[float, float, float]): The chance of the next card being higher, lower and matching
+        """
+        card = card if card is not None else self.current_card()
+        return self.remaining_ranks().odds(card.rank - 1)
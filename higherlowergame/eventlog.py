@@ -0,0 +1,244 @@
+"""
+    Game event log
+
+    Records the outcome of every round played to an append-only binary file of fixed-width records.
+    The reader memory maps the file and exposes each field as a NumPy column without copying,
+    so logs of hundreds of millions of rounds can be analysed in bounded memory.
+    The writer hands out session ids and keeps how many it has reserved in the header, so every run appending to the same log
+    records its sessions under new ids.
+"""
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+from typing import Iterator
+
+import numpy as np
+
+MAGIC = b"HLEV"
+VERSION = 1
+
+# magic, version, record size, then the session ids reserved so far, which also starts the records 16 byte aligned
+HEADER = struct.Struct("<4sHHQ")
+SESSIONS = struct.Struct("<Q")
+SESSIONS_OFFSET = 8
+SESSION_BLOCK = 1024 # session ids are reserved in the header this many at a time
+
+# session id, round number, previous card index, current card index, guess, compare result, score change
+RECORD = struct.Struct("<QHBBbbbx")
+
+RECORD_DTYPE = np.dtype({
+    "names": ["session", "round", "previous_card", "current_card", "guess", "result", "score_change"],
+    "formats": ["<u8", "<u2", "u1", "u1", "i1", "i1", "i1"],
+    "offsets": [0, 8, 10, 11, 12, 13, 14],
+    "itemsize": RECORD.size,
+})
+
+
+class EventLogWriter:
+    """
+    A class to append round outcomes to an event log file
+
+    Records are packed into a buffer and written to the file when the buffer is full, when flush is called or when the writer is closed.
+    Session ids are reserved in the header SESSION_BLOCK at a time before they are handed out, so after a crash the next run
+    skips the rest of the block rather than reusing an id. A record left partly written by a crash is cut off when the log is
+    opened again, so the records appended after it stay aligned.
+
+    Attributes
+    ----------
+    path : str
+        The path of the log file
+    buffer_records : int
+        How many records are buffered before they are written
+
+    Methods
+    -------
+    next_session():
+        Returns a session id no other session in the log has.
+    record(session, round_number, previous_card, current_card, guess, result, score_change):
+        Adds the outcome of one round to the log.
+    flush():
+        Writes the buffered records to the file.
+    close():
+        Writes the buffered records and closes the file.
+    """
+    def __init__(self, path: str, buffer_records: int = 4096) -> None:
+        """
+        Opens a log file for appending, writing the header if the file is new
+
+        Parameters
+        ----------
+        path: str
+            The path of the log file
+        buffer_records: int
+            How many records are buffered before they are written
+
+        Raises
+        ------
+        ValueError: if the file exists but is not an event log
+        """
+        self.path = path
+        self.buffer_records = buffer_records
+        self._buffer = bytearray(buffer_records * RECORD.size)
+        self._buffered = 0
+        open(path, "ab").close()
+        # opened for update rather than append so the session count in the header can be rewritten in place
+        self._file = open(path, "r+b")
+        size = self._file.seek(0, os.SEEK_END)
+        if size == 0:
+            self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, 0))
+            self._file.flush()
+            reserved = 0
+        else:
+            try:
+                reserved = read_header(path)
+            except ValueError:
+                self._file.close()
+                raise
+            whole = HEADER.size + (size - HEADER.size) // RECORD.size * RECORD.size
+            if whole != size:
+                self._file.truncate(whole)
+                self._file.seek(whole)
+            if reserved == 0 and os.path.getsize(path) >= HEADER.size + RECORD.size:
+                # logs written before session ids were reserved in the header start after their highest session
+                with EventLogReader(path) as reader:
+                    reserved = int(reader.column("session").max()) + 1
+        self._next_session = self._reserved = reserved
+
+    def next_session(self) -> int:
+        """Returns a session id that no session recorded in the log, by this or an earlier writer, has used."""
+        if self._next_session == self._reserved:
+            self._reserved += SESSION_BLOCK
+            os.pwrite(self._file.fileno(), SESSIONS.pack(self._reserved), SESSIONS_OFFSET)
+        session = self._next_session
+        self._next_session += 1
+        return session
+
+    def record(self, session: int, round_number: int, previous_card: int, current_card: int, guess: int, result: int, score_change: int) -> None:
+        """
+        Adds the outcome of one round to the log.
+
+        Parameters
+        ----------
+        session (int): The id of the game session
+        round_number (int): The round number counting from 0
+        previous_card (int): The index of the card the player guessed from
+        current_card (int): The index of the card that was turned over
+        guess (int): 1 for a higher guess, -1 for a lower guess
+        result (int): The result of comparing the cards, 1 higher, -1 lower, 0 if they match
+        score_change (int): The points gained or lost in the round
+        """
+        RECORD.pack_into(self._buffer, self._buffered * RECORD.size, session, round_number, previous_card, current_card, guess, result, score_change)
+        self._buffered += 1
+        if self._buffered == self.buffer_records:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes the buffered records to the file."""
+        if self._buffered:
+            self._file.write(memoryview(self._buffer)[:self._buffered * RECORD.size])
+            self._buffered = 0
+        self._file.flush()
+
+    def close(self) -> None:
+        """Writes the buffered records and closes the file."""
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self) -> EventLogWriter:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def read_header(path: str) -> int:
+    """
+    Checks the header of an event log file and returns how many session ids have been reserved in it.
+
+    Raises
+    ------
+    ValueError: if the file is not an event log of this version
+    """
+    with open(path, "rb") as file:
+        header = file.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError(f"{path} is not a game event log")
+    magic, version, record_size, sessions = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+        raise ValueError(f"{path} is not a version {VERSION} game event log")
+    return sessions
+
+
+class EventLogReader:
+    """
+    A class to read an event log file through a memory map
+
+    A partly written record at the end of the file, such as after a crash, is ignored.
+
+    Attributes
+    ----------
+    path : str
+        The path of the log file
+    records : np.ndarray
+        A structured array view of every record in the file
+
+    Methods
+    -------
+    column(name):
+        Returns one field of every record as an array view.
+    chunks(size):
+        Yields views of the records a number at a time.
+    close():
+        Closes the memory map.
+    """
+    def __init__(self, path: str) -> None:
+        """
+        Memory maps an event log file
+
+        Parameters
+        ----------
+        path: str
+            The path of the log file
+
+        Raises
+        ------
+        ValueError: if the file is not an event log
+        """
+        read_header(path)
+        self.path = path
+        count = (os.path.getsize(path) - HEADER.size) // RECORD.size
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if count else None
+        if self._map is None:
+            self.records = np.empty(0, dtype=RECORD_DTYPE)
+        else:
+            self.records = np.frombuffer(self._map, dtype=RECORD_DTYPE, count=count, offset=HEADER.size)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def column(self, name: str) -> np.ndarray:
+        """Returns one field of every record as an array view, no data is copied."""
+        return self.records[name]
+
+    def chunks(self, size: int = 1_000_000) -> Iterator[np.ndarray]:
+        """Yields views of the records a number at a time, so only the pages in use are read from disk."""
+        for start in range(0, len(self.records), size):
+            yield self.records[start:start + size]
+
+    def close(self) -> None:
+        """Closes the memory map, any arrays taken from the reader must be deleted first."""
+        self.records = np.empty(0, dtype=RECORD_DTYPE)
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self) -> EventLogReader:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
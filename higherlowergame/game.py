@@ -1,37 +1,108 @@
+from typing import Optional, Union
+
 from .deck import Deck
+from .eventlog import EventLogWriter
+from .leaderboard import Leaderboard
+from .solver import PolicyTable, Solver
+from .state import GameState, RoundOutcome
 
 class Game:
     """
-        A class to represent a full game tracking the score and controlling each round.
+        A class to represent a full game in the terminal, showing each round of its GameState and asking the player for their guesses.
 
         Attributes
         ----------
+        state : GameState
+            The deck, score and round of the game, which the rules move on
         score : int
-            The player score of the current round
+            The player score of the current game
         max_rounds : int
             How many rounds a game consists of
         deck : Deck
             The full deck of cards used in the game
         current_round : int
             The round the player is currently on
+        event_log : EventLogWriter | None
+            Where the outcome of every round is recorded, if set
+        session_id : int
+            The id the rounds are recorded under in the event log, a new session of the event log if not given
+        show_hints : bool
+            Whether to show the chance of the next card being higher, lower or matching and the best guess before each guess
+        policy : Solver | PolicyTable
+            What the best guess in the hints comes from, a Solver unless a precomputed PolicyTable is given
+        leaderboard : Leaderboard | None
+            Where the final score of every game is recorded, if set
+        player_id : int | None
+            The player the final scores are ranked as, a new anonymous player of the leaderboard if not given
 
         Methods
         -------
         new_game():
             Sets up a new game.
         play_game():
-            Plays all rounds of a new game.
+            Plays all rounds of a game, then more games for as long as the player wants to play again.
         play_round(round_number: int):
             Plays a specific round of a game.
+        hint_message(odds, advice):
+            Returns the hint shown before a guess.
+        result_message(outcome: RoundOutcome):
+            Returns the message telling the user how their guess scored.
         take_guess():
             Asks the user to guess higher or lower.
         replay_question():
-            Asks the user if they want to replay and starts a new game if so.
+            Asks the user if they want to replay.
     """
-    def __init__(self):
+    def __init__(self, event_log: Optional[EventLogWriter] = None, session_id: Optional[int] = None, show_hints: bool = False, leaderboard: Optional[Leaderboard] = None, player_id: Optional[int] = None,
+                 policy: Optional[Union[Solver, PolicyTable]] = None):
         """ Set up a new game"""
-        self.score = 0
-    
+        self.state = GameState()
+        self.event_log = event_log
+        if session_id is None:
+            session_id = event_log.next_session() if event_log is not None else 0
+        self.session_id = session_id
+        self.show_hints = show_hints
+        self.policy = policy if policy is not None else Solver()
+        self.leaderboard = leaderboard
+        if player_id is None and leaderboard is not None:
+            player_id = leaderboard.new_player_id()
+        self.player_id = player_id
+
+    @property
+    def score(self) -> int:
+        """The player score of the current game."""
+        return self.state.score
+
+    @score.setter
+    def score(self, score: int) -> None:
+        self.state.score = score
+
+    @property
+    def max_rounds(self) -> int:
+        """How many rounds a game consists of."""
+        return self.state.max_rounds
+
+    @max_rounds.setter
+    def max_rounds(self, max_rounds: int) -> None:
+        self.state.max_rounds = max_rounds
+
+    @property
+    def deck(self) -> Deck:
+        """The full deck of cards used in the game."""
+        return self.state.deck
+
+    @deck.setter
+    def deck(self, deck: Deck) -> None:
+        self.state.deck = deck
+
+    @property
+    def current_round(self) -> int:
+        """The round the player is currently on."""
+        return self.state.round
+
+    @current_round.setter
+    def current_round(self, round_number: int) -> None:
+        self.state.round = round_number
+
     def new_game(self) -> None:  
         """
         Sets up a new game.
@@ -55,31 +126,38 @@ Good Luck!
 
     def play_game(self) -> None:
         """
-        Plays all rounds of a new game.
+        Plays all rounds of a game, then more games for as long as the player wants to play again.
 
         Runs each round of the game from 0.
-        After the last round tells the user their final score and asks if they want to play again.
+        After the last round tells the user their final score and asks if they want to play again,
+        starting the next game with a reshuffled deck and no score if so.
         """
 
-        print(f"Setting up a new game.")
-        self.current_round = 0
-
-        for round_number in range(self.max_rounds):
-            self.play_round(round_number)
-        
-        print("Game Over")
-        print(f"Your final score was: {self.score}")
-        self.replay_question()
+        while True:
+            print(f"Setting up a new game.")
+            self.current_round = 0
+
+            for round_number in range(self.max_rounds):
+                self.play_round(round_number)
+
+            print("Game Over")
+            print(f"Your final score was: {self.score}")
+            if self.leaderboard is not None:
+                self.leaderboard.record(self.player_id, self.score)
+                print(f"Your best score ranks {self.leaderboard.rank(self.player_id)} of {len(self.leaderboard)}")
+            if not self.replay_question():
+                break
+            self.state.new_game()
         
 
     def play_round(self, round_number: int) -> None:
         """
             Plays a specific round of a game.
 
-            Starts a new round by taking the next card from the deck.
-            Shows the user the previous card and asks the user to guess higher or lower.
-            Take the next card from the deck and compares the values.
-            If the user was right add one point to their score, if they were wrong remove one point, if they match then keep the same score.
+            Shows the user the card at the top of the deck, and the odds of the next card if hints are on, and asks the user to guess higher or lower.
+            The game state then takes the next card from the deck and scores the guess.
+            If the user was right they gain one point, if they were wrong they lose one point, if they match they keep the same score.
+            Records the outcome in the event log if there is one.
 
 
             Parameters
@@ -89,67 +167,73 @@ Good Luck!
         """
         print(f"Rounder number {round_number+1}:")
         
-        self.deck.move_to_next_card()
-        previous_card = self.deck.previous_card()
-        current_card = self.deck.current_card()
+        odds = self.state.odds() if self.show_hints else None
+        previous_card = self.state.card()
 
         print(f"The {'first card is' if round_number == 0 else 'previous card was'} {previous_card.card_name()}")
+        if odds is not None:
+            print(Game.hint_message(odds, self.policy.advise(self.state)))
         guess = Game.take_guess()
+        outcome = self.state.step(guess)
         
-        print(f"The next card is {current_card.card_name()}")
-        answer = current_card.compare_cards(previous_card)
-        result = "higher" if answer == 1 else "lower"
-
-        if answer == 0:
-            print(f"The card's values match. Your score is still {self.score}")
-        elif answer == guess:
-            self.score = self.score + 1
-            print(f"The next card's value is {result}, you got it right! You gain 1 point and your current score is {self.score}")
-        else:
-            self.score = self.score - 1
-            print(f"The next card's value is {result}, you guessed wrong. You lose 1 point and your current score is {self.score}")
+        print(f"The next card is {outcome.card.card_name()}")
+        print(Game.result_message(outcome))
+
+        if self.event_log is not None:
+            self.event_log.record(self.session_id, round_number, outcome.previous_card.index, outcome.card.index, guess, outcome.answer, outcome.points)
 
     
+    @staticmethod
+    def hint_message(odds: tuple[float, float, float], advice: tuple[int, float]) -> str:
+        """Returns the hint shown before a guess: the chance of the next card being higher, lower or matching, and the policy's best guess."""
+        higher, lower, match = odds
+        guess, expected = advice
+        return (
+            f"Hint: the next card is higher {higher:.0%}, lower {lower:.0%} and matches {match:.0%} of the time\n"
+            f"Hint: the best guess is {'higher (h)' if guess == 1 else 'lower (l)'}, expecting {expected:+.2f} more points this game"
+        )
+
+    @staticmethod
+    def result_message(outcome: RoundOutcome) -> str:
+        """Returns the message telling the user whether their guess was right and their current score."""
+        result = "higher" if outcome.answer == 1 else "lower"
+        if outcome.answer == 0:
+            return f"The card's values match. Your score is still {outcome.score}"
+        if outcome.points == 1:
+            return f"The next card's value is {result}, you got it right! You gain 1 point and your current score is {outcome.score}"
+        return f"The next card's value is {result}, you guessed wrong. You lose 1 point and your current score is {outcome.score}"
+
     @staticmethod
     def take_guess() -> int:
         """
         Asks the user to guess higher or lower.
         
         Takes an input from the user to guess h or l and returns 1 and -1 respectively.
-        If the user types anything else remind the user to only enter l or h and call the function again.
+        If the user types anything else remind the user to only enter l or h and ask again.
 
         Returns
         ------
         guess (int): An integer for the users guess, 1 if a higher guess and -1 is a lower guess
         """
-        guess = input("Is the next card higher (h) or lower (l): ")
-        print(guess)
-
-        if guess != "h" and guess != "l":
+        while True:
+            guess = input("Is the next card higher (h) or lower (l): ")
+            print(guess)
+
+            if guess == "h":
+                return 1
+            if guess == "l":
+                return -1
             print("Please only enter 'h' or 'l' to guess")
-            return Game.take_guess()
-        
-        if guess == "h":
-            return 1
-        else:
-            return -1
-
-
-    def replay_question(self) -> None:
-        """Asks the user if they want to replay and starts a new game if so."""
-        replay = input("Would you like to play again? Yes (y) or No (n): ")
-        
-        if replay != "y" and replay != "n":
-            print("Please only answer with 'y' or 'n'")
-            self.replay_question()
-        
-        elif replay == "n":
-            print("Thank you for playing.")
-
-        else: 
-            self.play_game()
-        
 
 
+    def replay_question(self) -> bool:
+        """Asks the user if they want to replay until they answer y or n, returning True if they do."""
+        while True:
+            replay = input("Would you like to play again? Yes (y) or No (n): ")
 
-        
+            if replay == "y":
+                return True
+            if replay == "n":
+                print("Thank you for playing.")
+                return False
+            print("Please only answer with 'y' or 'n'")
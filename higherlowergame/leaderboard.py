@@ -0,0 +1,450 @@
+"""
+    Leaderboard
+
+    Keeps the best final score of every player and answers rank, top K and percentile queries over millions of players.
+    Players are ordered by a single integer key per entry, higher scores first and players who reached a score earlier
+    ahead of later ones. The keys are held in sorted blocks of a few thousand, found by bisecting the last key of each block,
+    with the length of each block in a RankCounter, so inserting, removing, ranking and finding the player at a position
+    all take O(log n) steps plus a short move within one block.
+    The leaderboard is saved as a small header followed by the player ids and scores in rank order, which loads straight into
+    the sorted blocks without sorting.
+    To Run: `python -m higherlowergame.leaderboard --games 5000000 --players 1000000`
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import math
+import os
+import struct
+import time
+from array import array
+from bisect import bisect_left, insort
+from typing import Iterable, Iterator, Optional, Sequence
+
+import numpy as np
+
+from .rank_counter import RankCounter
+
+MAGIC = b"HLLB"
+VERSION = 1
+
+# magic, version, number of players, then the player ids as int64 and the scores as int32 in rank order
+HEADER = struct.Struct("<4sH2xQ")
+
+# a key is the negated score above the order the score was reached in, so sorting keys sorts by score then arrival
+SEQUENCE_BITS = 40
+SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+MAX_SCORE = 1 << 22
+
+
+def make_key(score: int, sequence: int) -> int:
+    """Returns the sort key of a score reached as the given entry, lower keys rank higher."""
+    return (-score << SEQUENCE_BITS) | sequence
+
+
+def key_score(key: int) -> int:
+    """Returns the score a key was made from."""
+    return -(key >> SEQUENCE_BITS)
+
+
+class SortedKeys:
+    """
+    A class to keep distinct integer keys in order with fast positional lookups, using sorted blocks
+
+    Attributes
+    ----------
+    block_size : int
+        How many keys a block is split back to once it holds twice as many
+
+    Methods
+    -------
+    add(key):
+        Inserts a key.
+    remove(key):
+        Removes a key.
+    rank(key):
+        Returns how many keys are lower than a key.
+    iterate(start):
+        Yields the keys in order from a position.
+    to_array():
+        Returns every key in order as a NumPy array.
+    """
+    def __init__(self, keys: Sequence[int] = (), block_size: int = 2048) -> None:
+        """
+        Builds the blocks from keys that are already sorted
+
+        Parameters
+        ----------
+        keys: Sequence[int]
+            Distinct keys in ascending order, such as a NumPy array
+        block_size: int
+            How many keys a block is split back to once it holds twice as many
+        """
+        self.block_size = block_size
+        keys = np.asarray(keys, dtype=np.int64)
+        self._blocks = [array("q", keys[start:start + block_size].tobytes()) for start in range(0, len(keys), block_size)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._lengths = RankCounter([len(block) for block in self._blocks])
+
+    def __len__(self) -> int:
+        return self._lengths.total
+
+    def __getitem__(self, position: int) -> int:
+        """Returns the key at a position in order, negative positions count from the end."""
+        if position < 0:
+            position += len(self)
+        block = self._lengths.find(position)
+        return self._blocks[block][position - self._lengths.count_below(block)]
+
+    def add(self, key: int) -> None:
+        """Inserts a key, which must not already be present."""
+        if not self._blocks:
+            self._blocks.append(array("q", [key]))
+            self._maxes.append(key)
+            self._lengths = RankCounter([1])
+            return
+        number = min(bisect_left(self._maxes, key), len(self._blocks) - 1)
+        block = self._blocks[number]
+        insort(block, key)
+        self._maxes[number] = block[-1]
+        self._lengths.add(number)
+        if len(block) > 2 * self.block_size:
+            # the block list only changes on a split, once every block_size inserts, so rebuilding the lengths is amortised
+            self._blocks[number:number + 1] = [block[:self.block_size], block[self.block_size:]]
+            self._maxes[number:number + 1] = [block[self.block_size - 1], block[-1]]
+            self._lengths = RankCounter([len(block) for block in self._blocks])
+
+    def remove(self, key: int) -> None:
+        """
+        Removes a key.
+
+        Raises
+        ------
+        KeyError: if the key is not present
+        """
+        number = bisect_left(self._maxes, key)
+        if number == len(self._blocks):
+            raise KeyError(key)
+        block = self._blocks[number]
+        position = bisect_left(block, key)
+        if block[position] != key:
+            raise KeyError(key)
+        del block[position]
+        if block:
+            self._maxes[number] = block[-1]
+            self._lengths.add(number, -1)
+        else:
+            del self._blocks[number]
+            del self._maxes[number]
+            self._lengths = RankCounter([len(block) for block in self._blocks])
+
+    def rank(self, key: int) -> int:
+        """Returns how many keys are lower than a key, whether or not it is present."""
+        number = bisect_left(self._maxes, key)
+        if number == len(self._blocks):
+            return len(self)
+        return self._lengths.count_below(number) + bisect_left(self._blocks[number], key)
+
+    def iterate(self, start: int = 0) -> Iterator[int]:
+        """Yields the keys in order from a position."""
+        if start >= len(self):
+            return
+        number = self._lengths.find(start)
+        offset = start - self._lengths.count_below(number)
+        for block in self._blocks[number:]:
+            yield from block[offset:]
+            offset = 0
+
+    def to_array(self) -> np.ndarray:
+        """Returns every key in order as a NumPy array."""
+        if not self._blocks:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.frombuffer(block, dtype=np.int64) for block in self._blocks])
+
+
+class Leaderboard:
+    """
+    A class to rank players by their best final score
+
+    A player who reaches a score first ranks ahead of players who reach it later in top lists,
+    while rank and percentile treat every player with the same score alike.
+
+    Methods
+    -------
+    record(player, score):
+        Records a final score, keeping it if it is the player's best.
+    record_many(players, scores):
+        Records many final scores at once.
+    score(player):
+        Returns a player's best score.
+    rank(player):
+        Returns a player's rank, 1 for the best score.
+    percentile(player):
+        Returns the percentage of players with a lower score.
+    top(count):
+        Returns the best players in order with their scores.
+    cutoff(percent):
+        Returns the score needed to be in the top percent of players.
+    new_player_id():
+        Returns a negative id for a player who has not said who they are.
+    save(path):
+        Writes the leaderboard to a file.
+    load(path):
+        Returns a leaderboard read from a file.
+    """
+    def __init__(self, block_size: int = 2048) -> None:
+        """Constructs an empty leaderboard whose sorted blocks hold around block_size players."""
+        self._keys = SortedKeys(block_size=block_size)
+        self._best = {}
+        self._players = array("q")
+
+    def __len__(self) -> int:
+        return len(self._best)
+
+    def __contains__(self, player: int) -> bool:
+        return player in self._best
+
+    def record(self, player: int, score: int) -> bool:
+        """
+        Records a player's final score, keeping it if it beats their best.
+
+        Returns
+        -------
+        improved (bool): True if it is the player's first or best score
+
+        Raises
+        ------
+        ValueError: if the score is outside +-MAX_SCORE
+        """
+        if not -MAX_SCORE < score < MAX_SCORE:
+            raise ValueError(f"Scores must be within +-{MAX_SCORE}")
+        old = self._best.get(player)
+        if old is not None and score <= key_score(old):
+            return False
+        key = make_key(score, len(self._players))
+        self._players.append(player)
+        if old is not None:
+            self._keys.remove(old)
+        self._keys.add(key)
+        self._best[player] = key
+        return True
+
+    def record_many(self, players: Iterable[int], scores: Iterable[int]) -> int:
+        """
+        Records many final scores in the order given, as record would one at a time.
+
+        Each player's best score in the batch is found with NumPy first. A batch that improves more than a quarter as many
+        players as the leaderboard holds rebuilds the sorted blocks in one sort, smaller batches are inserted one by one.
+
+        Returns
+        -------
+        improved (int): How many players have a new best score
+
+        Raises
+        ------
+        ValueError: if the arrays differ in length or a score is outside +-MAX_SCORE
+        """
+        players = np.asarray(players, dtype=np.int64)
+        scores = np.asarray(scores, dtype=np.int64)
+        if players.shape != scores.shape:
+            raise ValueError("There must be one score for every player")
+        if len(scores) == 0:
+            return 0
+        if np.abs(scores).max() >= MAX_SCORE:
+            raise ValueError(f"Scores must be within +-{MAX_SCORE}")
+        # sorted by player, then best score, then arrival, the first entry of each player is the one record would keep
+        order = np.lexsort((np.arange(len(players)), -scores, players))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = players[order[1:]] != players[order[:-1]]
+        best = np.sort(order[first])
+
+        new_players, new_scores = [], []
+        for player, score in zip(players[best].tolist(), scores[best].tolist()):
+            old = self._best.get(player)
+            if old is None or score > key_score(old):
+                new_players.append(player)
+                new_scores.append(score)
+        if len(new_players) * 4 <= len(self):
+            for player, score in zip(new_players, new_scores):
+                self.record(player, score)
+            return len(new_players)
+
+        replaced = np.array([self._best[player] for player in new_players if player in self._best], dtype=np.int64)
+        sequences = np.arange(len(self._players), len(self._players) + len(new_players), dtype=np.int64)
+        new_keys = (-np.array(new_scores, dtype=np.int64) << SEQUENCE_BITS) | sequences
+        keys = self._keys.to_array()
+        if len(replaced):
+            keys = keys[~np.isin(keys, replaced)]
+        self._keys = SortedKeys(np.sort(np.concatenate((keys, new_keys))), self._keys.block_size)
+        self._players.extend(new_players)
+        self._best.update(zip(new_players, new_keys.tolist()))
+        return len(new_players)
+
+    def score(self, player: int) -> int:
+        """
+        Returns a player's best score.
+
+        Raises
+        ------
+        KeyError: if the player has no score
+        """
+        return key_score(self._best[player])
+
+    def rank(self, player: int) -> int:
+        """
+        Returns a player's rank, one more than the number of players with a higher score.
+
+        Raises
+        ------
+        KeyError: if the player has no score
+        """
+        return self._keys.rank(make_key(self.score(player), 0)) + 1
+
+    def percentile(self, player: int) -> float:
+        """
+        Returns the percentage of players with a lower score than a player.
+
+        Raises
+        ------
+        KeyError: if the player has no score
+        """
+        at_least = self._keys.rank(make_key(self.score(player) - 1, 0))
+        return 100 * (len(self) - at_least) / len(self)
+
+    def top(self, count: int) -> list[tuple[int, int]]:
+        """Returns the (player, score) of the best count players in order."""
+        keys = self._keys.iterate()
+        return [(self._players[key & SEQUENCE_MASK], key_score(key)) for key, _ in zip(keys, range(count))]
+
+    def cutoff(self, percent: float) -> int:
+        """
+        Returns the score needed to be in the top percent of players, the score of the last player within it.
+
+        Raises
+        ------
+        ValueError: if the leaderboard is empty or the percent is not above 0 and at most 100
+        """
+        if not len(self) or not 0 < percent <= 100:
+            raise ValueError("The leaderboard must have players and the percent must be above 0 and at most 100")
+        return key_score(self._keys[max(math.ceil(len(self) * percent / 100), 1) - 1])
+
+    def new_player_id(self) -> int:
+        """
+        Returns an id below every player's, for a player who has not said who they are.
+        Players choose ids from 0 up, so these never clash with theirs, and counting down from it gives more.
+        """
+        return min(min(self._best, default=0), 0) - 1
+
+    def save(self, path: str) -> None:
+        """Writes the player ids and scores in rank order to a file, replacing it whole."""
+        keys = self._keys.to_array()
+        players = np.frombuffer(self._players, dtype=np.int64)[keys & SEQUENCE_MASK]
+        scores = (-(keys >> SEQUENCE_BITS)).astype("<i4")
+        with open(path + ".tmp", "wb") as file:
+            file.write(HEADER.pack(MAGIC, VERSION, len(keys)))
+            file.write(players.astype("<i8").tobytes())
+            file.write(scores.tobytes())
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str, block_size: int = 2048) -> Leaderboard:
+        """
+        Returns a leaderboard read from a file written by save, players keep their order within each score.
+
+        Raises
+        ------
+        ValueError: if the file is not a leaderboard of this version or is cut short
+        """
+        with open(path, "rb") as file:
+            data = file.read()
+        if len(data) < HEADER.size:
+            raise ValueError(f"{path} is not a leaderboard")
+        magic, version, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} leaderboard")
+        if len(data) != HEADER.size + count * 12:
+            raise ValueError(f"{path} should hold {count} players")
+        players = np.frombuffer(data, dtype="<i8", count=count, offset=HEADER.size)
+        scores = np.frombuffer(data, dtype="<i4", count=count, offset=HEADER.size + count * 8).astype(np.int64)
+        # saved in rank order, so numbering the entries in that order keeps the keys sorted
+        keys = (-scores << SEQUENCE_BITS) | np.arange(count, dtype=np.int64)
+
+        leaderboard = cls(block_size)
+        leaderboard._keys = SortedKeys(keys, block_size)
+        leaderboard._players = array("q", players.astype(np.int64).tobytes())
+        leaderboard._best = dict(zip(players.tolist(), keys.tolist()))
+        return leaderboard
+
+
+async def save_periodically(leaderboard: Leaderboard, path: str, interval: float = 60.0) -> None:
+    """Saves the leaderboard every interval seconds until cancelled, then once more."""
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            leaderboard.save(path)
+    finally:
+        leaderboard.save(path)
+
+
+def synthetic_scores(games: int, players: int, max_rounds: int = 3, seed: Optional[int] = None, batch_size: int = 1_000_000) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    """
+    Yields batches of (player ids, final scores) for games played by random players guessing at random.
+
+    Parameters
+    ----------
+    games (int): How many final scores to make
+    players (int): How many different players play them
+    max_rounds (int): How many rounds each game has
+    seed (int): Makes the same scores every time if given
+    batch_size (int): The most scores in a batch
+    """
+    rng = np.random.default_rng(seed)
+    # a random guess matches 3 of the 51 cards left and is otherwise right as often as wrong
+    match = 3 / 51
+    points = np.array([1, -1, 0], dtype=np.int8)
+    for start in range(0, games, batch_size):
+        size = min(batch_size, games - start)
+        rounds = rng.choice(points, size=(size, max_rounds), p=[(1 - match) / 2, (1 - match) / 2, match])
+        yield rng.integers(0, players, size, dtype=np.int64), rounds.sum(axis=1, dtype=np.int64)
+
+
+def main() -> None:
+    """Fills a leaderboard with synthetic scores and times recording, queries, saving and loading."""
+    parser = argparse.ArgumentParser(description="Time a leaderboard of synthetic Higher/Lower scores.")
+    parser.add_argument("--games", type=int, default=5_000_000, help="final scores to record")
+    parser.add_argument("--players", type=int, default=1_000_000, help="different players")
+    parser.add_argument("--rounds", type=int, default=20, help="rounds in each game")
+    parser.add_argument("--seed", type=int, default=0, help="the seed for the scores")
+    parser.add_argument("--path", default="leaderboard.bin", help="where to save the leaderboard")
+    args = parser.parse_args()
+
+    leaderboard = Leaderboard()
+    started = time.perf_counter()
+    for players, scores in synthetic_scores(args.games, args.players, args.rounds, args.seed):
+        leaderboard.record_many(players, scores)
+    elapsed = time.perf_counter() - started
+    print(f"Recorded {args.games} scores for {len(leaderboard)} players in {elapsed:.2f}s, {args.games / elapsed:,.0f} scores/s")
+
+    rng = np.random.default_rng(args.seed + 1)
+    started = time.perf_counter()
+    for player, score in zip(rng.integers(0, args.players, 100_000).tolist(), rng.integers(0, args.rounds + 1, 100_000).tolist()):
+        leaderboard.record(player, score)
+    print(f"Recorded scores one at a time in {(time.perf_counter() - started) / 100_000 * 1e6:.1f}us each")
+    queried = [player for player in rng.integers(0, args.players, 100_000).tolist() if player in leaderboard]
+    started = time.perf_counter()
+    for player in queried:
+        leaderboard.rank(player)
+    print(f"Ranked a player in {(time.perf_counter() - started) / max(len(queried), 1) * 1e6:.1f}us")
+    print(f"Top 5: {leaderboard.top(5)}, top 1% cutoff: {leaderboard.cutoff(1)}, median: {leaderboard.cutoff(50)}")
+
+    started = time.perf_counter()
+    leaderboard.save(args.path)
+    saved = time.perf_counter() - started
+    started = time.perf_counter()
+    Leaderboard.load(args.path)
+    print(f"Saved {os.path.getsize(args.path):,} bytes in {saved:.2f}s and loaded them in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+    Load test for the higher/lower game server
+
+    Opens many connections to a running server, plays games on all of them at once and reports how long each turn took.
+    To Run: `python -m higherlowergame.loadtest --connections 1000`
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+
+def percentile(latencies: list[float], percent: float) -> float:
+    """Returns the latency below which the given percent of the sorted latencies fall."""
+    if not latencies:
+        return 0.0
+    position = min(len(latencies) - 1, int(round(percent / 100 * (len(latencies) - 1))))
+    return latencies[position]
+
+
+async def read_until(reader: asyncio.StreamReader, *prefixes: str) -> str:
+    """Reads lines from the server until one starts with one of the prefixes and returns it."""
+    while True:
+        line = (await reader.readline()).decode()
+        if not line:
+            raise ConnectionError("server closed the connection")
+        if line.startswith(prefixes):
+            return line
+
+
+async def play_client(host: str, port: int, games: int, latencies: list[float]) -> None:
+    """Plays a number of games on one connection, recording how long each turn took."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        await read_until(reader, "CARD")
+        for game_number in range(games):
+            while True:
+                started = time.perf_counter()
+                writer.write(b"h\n")
+                line = await read_until(reader, "CARD", "REPLAY")
+                latencies.append(time.perf_counter() - started)
+                if line.startswith("REPLAY"):
+                    break
+
+            if game_number + 1 < games:
+                writer.write(b"y\n")
+                await read_until(reader, "CARD")
+            else:
+                writer.write(b"n\n")
+                await read_until(reader, "BYE")
+    finally:
+        writer.close()
+
+
+async def load_test(host: str = "127.0.0.1", port: int = 8765, connections: int = 100, games: int = 10) -> dict:
+    """
+    Plays games on many connections at once and reports the turn latency.
+
+    Parameters
+    ----------
+    host (str): The host the server is listening on
+    port (int): The port the server is listening on
+    connections (int): How many players connect at once
+    games (int): How many games each player plays
+
+    Returns
+    -------
+    report (dict): The number of connections and turns, the p50 and p99 turn latency in milliseconds and the turns per second
+    """
+    latencies = []
+    started = time.perf_counter()
+    await asyncio.gather(*(play_client(host, port, games, latencies) for _ in range(connections)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "connections": connections,
+        "turns": len(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "turns_per_second": len(latencies) / elapsed,
+    }
+
+
+def main() -> None:
+    """Runs a load test against a server and prints the report."""
+    parser = argparse.ArgumentParser(description="Load test the Higher/Lower game server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--connections", type=int, default=100)
+    parser.add_argument("--games", type=int, default=10)
+    args = parser.parse_args()
+
+    report = asyncio.run(load_test(args.host, args.port, args.connections, args.games))
+    print(
+        f"{report['connections']} connections played {report['turns']} turns at {report['turns_per_second']:.0f} turns/s, "
+        f"p50 {report['p50_ms']:.2f} ms, p99 {report['p99_ms']:.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
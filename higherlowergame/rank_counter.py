@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+from typing import Iterable, Sequence
+
+
+class RankCounter:
+    """
+    A class to count how many cards of each rank are left, using a Fenwick tree
+
+    Ranks are numbered from 0 and can be any number of ranks, a standard deck has 13.
+    Adding or removing a card and counting the cards below a rank each take O(log ranks) time,
+    so the odds of the next card being higher or lower never need the rest of the deck scanning.
+
+    Attributes
+    ----------
+    total : int
+        How many cards are counted
+
+    Methods
+    -------
+    from_ranks(ranks, size):
+        Returns a counter of the given ranks.
+    add(rank, amount):
+        Adds cards of a rank.
+    remove(rank):
+        Removes one card of a rank.
+    count(rank):
+        Returns how many cards of a rank are left.
+    count_below(rank):
+        Returns how many cards have a lower rank.
+    find(position):
+        Returns the rank of the card at a position when the cards are sorted by rank.
+    counts():
+        Returns how many cards of each rank are left.
+    odds(rank):
+        Returns the chance of the next card being higher, lower or the same rank.
+    """
+    def __init__(self, counts: Sequence[int]) -> None:
+        """
+        Builds the tree in O(ranks) from the starting count of each rank
+
+        Parameters
+        ----------
+        counts: Sequence[int]
+            How many cards of each rank there are, one entry per rank
+        """
+        self._counts = list(counts)
+        self._tree = [0] + self._counts
+        for position in range(1, len(self._tree)):
+            parent = position + (position & -position)
+            if parent < len(self._tree):
+                self._tree[parent] += self._tree[position]
+        self.total = sum(self._counts)
+
+    @classmethod
+    def from_ranks(cls, ranks: Iterable[int], size: int) -> RankCounter:
+        """Returns a counter of the given ranks, size is how many different ranks there are."""
+        counts = [0] * size
+        for rank in ranks:
+            counts[rank] += 1
+        return cls(counts)
+
+    def add(self, rank: int, amount: int = 1) -> None:
+        """Adds cards of a rank, a negative amount removes them."""
+        self._counts[rank] += amount
+        self.total += amount
+        tree = self._tree
+        position = rank + 1
+        while position < len(tree):
+            tree[position] += amount
+            position += position & -position
+
+    def remove(self, rank: int) -> None:
+        """
+        Removes one card of a rank.
+
+        Raises
+        ------
+        ValueError: if there are no cards of the rank left
+        """
+        if self._counts[rank] == 0:
+            raise ValueError(f"There are no cards of rank {rank} left")
+        self.add(rank, -1)
+
+    def count(self, rank: int) -> int:
+        """Returns how many cards of a rank are left."""
+        return self._counts[rank]
+
+    def count_below(self, rank: int) -> int:
+        """Returns how many cards have a lower rank."""
+        tree = self._tree
+        total = 0
+        position = rank
+        while position > 0:
+            total += tree[position]
+            position -= position & -position
+        return total
+
+    def find(self, position: int) -> int:
+        """
+        Returns the rank of the card at a position, counting from 0, when the cards left are sorted by rank, in O(log ranks).
+
+        Raises
+        ------
+        IndexError: if the position is not between 0 and total - 1
+        """
+        if not 0 <= position < self.total:
+            raise IndexError(f"There is no card at position {position} of {self.total}")
+        tree = self._tree
+        # walk down from the largest power of two, skipping every subtree that ends before the position
+        rank = 0
+        step = 1 << ((len(tree) - 1).bit_length() - 1)
+        while step:
+            if rank + step < len(tree) and tree[rank + step] <= position:
+                rank += step
+                position -= tree[rank]
+            step >>= 1
+        return rank
+
+    def counts(self) -> list[int]:
+        """Returns how many cards of each rank are left."""
+        return list(self._counts)
+
+    def odds(self, rank: int) -> tuple[float, float, float]:
+        """
+        Returns the chance of the next card being higher, lower or the same rank.
+
+        Parameters
+        ----------
+        rank (int): The rank the next card is compared to
+
+        Returns
+        -------
+        odds (tuple[float, float, float]): The chance of a higher, lower and the same rank, all 0 if there are no cards left
+        """
+        if self.total == 0:
+            return (0.0, 0.0, 0.0)
+        lower = self.count_below(rank)
+        same = self._counts[rank]
+        return ((self.total - lower - same) / self.total, lower / self.total, same / self.total)
@@ -0,0 +1,203 @@
+"""
+    Higher/lower game server
+
+    Hosts many games at once over TCP using asyncio, one game session per connection.
+    Players and the server take turns sending single lines of text:
+
+    Server                          Client
+    START <max_rounds>
+    CARD <round> <card name>
+                                    h or l
+    RESULT <card name> <points> <score>
+    CARD <round> <card name>        (or OVER <score> and REPLAY after the last round)
+    RANK <rank> <players>           between OVER and REPLAY when a leaderboard is kept, the rank of the player's best score
+                                    HELLO <player id> at any time, an id of 0 or more to rank final scores under
+    HELLO <player id>               once the id is set
+                                    y or n after REPLAY
+    ERROR <message>                 after anything else, the same answer is then asked for again
+    BYE                             before the server closes the connection
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+from typing import Optional
+
+from .eventlog import EventLogWriter
+from .leaderboard import Leaderboard, save_periodically
+from .state import GameState
+
+
+class Session(GameState):
+    """
+    A class to represent the state of one player's game on the server, a GameState that talks in lines of text
+
+    Attributes
+    ----------
+    deck : Deck
+        The deck of cards used in the game
+    max_rounds : int
+        How many rounds a game consists of
+    score : int
+        The player score of the current game
+    round : int
+        How many rounds of the current game have been played
+    replaying : bool
+        True while waiting for the player to answer if they want to play again
+    finished : bool
+        True once the player has asked to stop playing
+    event_log : EventLogWriter | None
+        Where the outcome of every round is recorded, if set
+    session_id : int
+        The id the rounds are recorded under in the event log
+    leaderboard : Leaderboard | None
+        Where the final score of every game is recorded, if set
+    player_id : int | None
+        The player the final scores are ranked as, set by the player with HELLO, nothing is ranked while it is None
+
+    Methods
+    -------
+    new_game():
+        Starts a new game and returns the lines to send to the player.
+    handle(line):
+        Plays the player's answer and returns the lines to send back.
+    """
+    __slots__ = ("finished", "event_log", "session_id", "leaderboard", "player_id")
+
+    def __init__(
+        self, max_rounds: int = 3, event_log: Optional[EventLogWriter] = None, session_id: int = 0, leaderboard: Optional[Leaderboard] = None,
+        player_id: Optional[int] = None,
+    ) -> None:
+        """
+        Constructs all the attributes for a session
+
+        Parameters
+        ----------
+        max_rounds: int
+            How many rounds a game consists of
+        event_log: EventLogWriter
+            Where the outcome of every round is recorded, nothing is recorded if not given
+        session_id: int
+            The id the rounds are recorded under in the event log
+        leaderboard: Leaderboard
+            Where the final score of every game is recorded, nothing is recorded if not given
+        player_id: int
+            The player the final scores are ranked as until the player says who they are with HELLO
+        """
+        super().__init__(max_rounds=max_rounds)
+        self.finished = False
+        self.event_log = event_log
+        self.session_id = session_id
+        self.leaderboard = leaderboard
+        self.player_id = player_id
+
+    @property
+    def replaying(self) -> bool:
+        """True while waiting for the player to answer if they want to play again, once every round has been played."""
+        return self.over
+
+    def new_game(self) -> list[str]:
+        """Starts a new game with a reset deck and returns the lines to send to the player."""
+        super().new_game()
+        return [f"START {self.max_rounds}", self._card_line()]
+
+    def _card_line(self) -> str:
+        """Returns the line showing the card the player is guessing from."""
+        return f"CARD {self.round + 1} {self.card().card_name()}"
+
+    def handle(self, line: str) -> list[str]:
+        """
+        Plays the player's answer and returns the lines to send back.
+
+        Parameters
+        ----------
+        line (str): The line sent by the player without its line ending
+
+        Returns
+        -------
+        lines (list[str]): The lines to send to the player
+        """
+        if line.startswith("HELLO "):
+            player_id = line[len("HELLO "):]
+            if not player_id.isdigit():
+                return ["ERROR A player id must be a whole number of 0 or more"]
+            self.player_id = int(player_id)
+            return [f"HELLO {self.player_id}"]
+
+        if self.replaying:
+            if line == "y":
+                return self.new_game()
+            if line == "n":
+                self.finished = True
+                return ["BYE"]
+            return ["ERROR Please only answer with 'y' or 'n'"]
+
+        if line == "h":
+            guess = 1
+        elif line == "l":
+            guess = -1
+        else:
+            return ["ERROR Please only enter 'h' or 'l' to guess"]
+
+        outcome = self.step(guess)
+        if self.event_log is not None:
+            self.event_log.record(self.session_id, outcome.round, outcome.previous_card.index, outcome.card.index, guess, outcome.answer, outcome.points)
+
+        lines = [f"RESULT {outcome.card.card_name()} {outcome.points} {outcome.score}"]
+        if not self.over:
+            lines.append(self._card_line())
+        else:
+            lines.append(f"OVER {self.score}")
+            if self.leaderboard is not None and self.player_id is not None:
+                self.leaderboard.record(self.player_id, self.score)
+                lines.append(f"RANK {self.leaderboard.rank(self.player_id)} {len(self.leaderboard)}")
+            lines.append("REPLAY")
+        return lines
+
+
+async def handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, session: Session) -> None:
+    """Plays games with one connected player until they stop playing or disconnect."""
+    writer.write(("\n".join(session.new_game()) + "\n").encode())
+    try:
+        while not session.finished:
+            line = await reader.readline()
+            if not line:
+                break
+            writer.write(("\n".join(session.handle(line.decode().strip())) + "\n").encode())
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(
+    host: str = "127.0.0.1", port: int = 8765, max_rounds: int = 3, event_log: Optional[EventLogWriter] = None, leaderboard: Optional[Leaderboard] = None
+) -> asyncio.AbstractServer:
+    """Starts listening for players and returns the running server, port 0 picks a free port."""
+    # the event log hands out ids no earlier run has recorded under, without one they only need to differ within this run
+    next_session = event_log.next_session if event_log is not None else itertools.count().__next__
+    # players who do not say who they are are ranked under ids below every saved player's, one per connection
+    anonymous = itertools.count(leaderboard.new_player_id(), -1) if leaderboard is not None else None
+    return await asyncio.start_server(
+        lambda reader, writer: handle_connection(
+            reader, writer, Session(max_rounds, event_log, next_session(), leaderboard, next(anonymous) if anonymous is not None else None)
+        ), host, port, backlog=4096,
+    )
+
+
+async def serve(
+    host: str = "127.0.0.1", port: int = 8765, max_rounds: int = 3, event_log: Optional[EventLogWriter] = None,
+    leaderboard: Optional[Leaderboard] = None, leaderboard_path: Optional[str] = None, save_interval: float = 60.0,
+) -> None:
+    """Hosts games until the process is stopped, saving the leaderboard to leaderboard_path every save_interval seconds if both are given."""
+    server = await start_server(host, port, max_rounds, event_log, leaderboard)
+    saver = asyncio.create_task(save_periodically(leaderboard, leaderboard_path, save_interval)) if leaderboard is not None and leaderboard_path else None
+    print(f"Serving the Higher/Lower game on {host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if saver is not None:
+            saver.cancel()
+            await asyncio.gather(saver, return_exceptions=True)
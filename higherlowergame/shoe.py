@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import random
+from typing import Optional
+
+from .card import CARDS, Card, suits, values
+from .deck import DeckExhausted
+from .rank_counter import RankCounter
+
+
+class Shoe:
+    """
+    A class to represent one or more decks of cards shuffled together, used in place of a Deck
+
+    The shoe is shuffled lazily with a Fisher-Yates shuffle that only picks the card for a position when it is dealt,
+    so resetting and dealing cost the same however many decks are in the shoe.
+    Before shuffling, position p holds card p % 52 and only positions that have been swapped are stored.
+    The values of the cards after the current position are counted once the odds are asked for and updated as each card is dealt.
+
+    Attributes
+    ----------
+    decks : int
+        How many 52 card decks are in the shoe
+    size : int
+        How many cards are in the shoe
+    rng : random.Random
+        The random number generator used to shuffle the shoe
+    cut_card : int | None
+        How many cards are dealt before the shoe is reshuffled, if not set moving past the last card raises DeckExhausted
+    reshuffles : int
+        How many times the cut card has been reached
+    current_position : int
+        The position of the top card in the shoe
+
+    Methods
+    -------
+    shuffle_deck():
+        Reorders the cards in a random order.
+    current_card():
+        Returns the Card at the top of the shoe.
+    previous_card():
+        Returns the previous Card that was at the top of the shoe.
+    move_to_next_card():
+        Takes the card from the top of the shoe, moving to the next position.
+    reset_deck():
+        Reorders the shoe of cards and sets the position back to the start.
+    remaining_ranks():
+        Returns the count of each value in the cards after the current position.
+    odds(card):
+        Returns the chance of the next card being higher, lower or matching a card.
+    """
+    def __init__(self, decks: int = 1, cut_card: Optional[int] = None, rng: Optional[random.Random] = None) -> None:
+        """
+        Constructs all the attributes for a Shoe object.
+
+        Parameters
+        ----------
+        decks: int
+            How many 52 card decks are in the shoe
+        cut_card: int
+            How many cards are dealt before the shoe is reshuffled, never reshuffles if not given
+        rng: random.Random
+            The random number generator to shuffle with, the random module if not given
+
+        Raises
+        ------
+        ValueError: if there are no decks or the cut card is not between the second and last card
+        """
+        if decks < 1:
+            raise ValueError("A shoe needs at least one deck")
+        self.rng = rng if rng is not None else random
+        self.decks = decks
+        self.size = decks * len(CARDS)
+        if cut_card is not None and not 2 <= cut_card <= self.size:
+            raise ValueError(f"The cut card must be between 2 and {self.size}")
+        self.cut_card = cut_card
+        self.reshuffles = 0
+
+        self._swapped = {}
+        self._shuffled_to = 0
+        self._remaining = None
+        self._counted_position = 0
+        self.current_position = 0
+
+    @property
+    def deck(self) -> list[Card]:
+        """A list of every Card in shoe order, this deals the whole shoe so is slow for large shoes."""
+        return [self._card_at(position) for position in range(self.size)]
+
+    def _card_at(self, position: int) -> Card:
+        """Returns the Card at a position, picking the cards up to that position first if they have not been dealt."""
+        swapped = self._swapped
+        randrange = self.rng.randrange
+        while self._shuffled_to <= position:
+            # one step of Fisher-Yates, swap the next position with a random position at or after it
+            dealt = self._shuffled_to
+            pick = randrange(dealt, self.size)
+            swapped[dealt], swapped[pick] = swapped.get(pick, pick), swapped.get(dealt, dealt)
+            self._shuffled_to += 1
+        return CARDS[swapped.get(position, position) % len(CARDS)]
+
+    def shuffle_deck(self) -> None:
+        """Reorders the cards in a random order, the cards are only picked as they are dealt."""
+        self._swapped.clear()
+        self._shuffled_to = 0
+        self._remaining = None
+
+    def current_card(self) -> Card:
+        """Returns the Card at the top of the shoe."""
+        return self._card_at(self.current_position)
+
+    def previous_card(self) -> Card:
+        """Returns the previous Card that was at the top of the shoe."""
+        return self._card_at(self.current_position - 1)
+
+    def move_to_next_card(self) -> None:
+        """
+        Takes the card from the top of the shoe, moving to the next position.
+
+        When the cut card is reached every card except the top card is shuffled back into the shoe,
+        the top card stays as the previous card.
+
+        Raises
+        ------
+        DeckExhausted: if there are no more cards in the shoe and there is no cut card
+        """
+        if self.cut_card is not None and self.current_position + 1 >= self.cut_card:
+            self._reshuffle_under_top_card()
+        elif self.current_position + 1 >= self.size:
+            raise DeckExhausted("last card")
+
+        self.current_position += 1
+        if self._remaining is not None and self._counted_position + 1 == self.current_position:
+            self._remaining.remove(self.current_card().rank - 1)
+            self._counted_position = self.current_position
+
+    def _reshuffle_under_top_card(self) -> None:
+        """Shuffles every card back into the shoe keeping the top card at the start."""
+        self._card_at(self.current_position)
+        top = self._swapped.get(self.current_position, self.current_position)
+        self.shuffle_deck()
+        if top != 0:
+            self._swapped[0] = top
+            self._swapped[top] = 0
+        self._shuffled_to = 1
+        self.current_position = 0
+        self.reshuffles += 1
+
+    def reset_deck(self) -> None:
+        """Reorders the shoe of cards and sets the position back to the start."""
+        self.current_position = 0
+        self.shuffle_deck()
+
+    def remaining_ranks(self) -> RankCounter:
+        """
+        Returns the count of each value in the cards after the current position.
+
+        The count starts from the full shoe and takes out the cards dealt so far, it is only rebuilt after a shuffle
+        or if the position was changed other than by move_to_next_card. Rank 0 of the counter is for aces and rank 12 for kings.
+        """
+        if self._remaining is None or self._counted_position != self.current_position:
+            self._remaining = RankCounter([len(suits) * self.decks] * len(values))
+            for position in range(self.current_position + 1):
+                self._remaining.remove(self._card_at(position).rank - 1)
+            self._counted_position = self.current_position
+        return self._remaining
+
+    def odds(self, card: Optional[Card] = None) -> tuple[float, float, float]:
+        """
+        Returns the chance of the next card being higher, lower or matching a card.
+
+        Parameters
+        ----------
+        card (Card): The card to compare to, the current card if not given
+
+        Returns
+        -------
+        odds (tuple[float, float, float]): The chance of the next card being higher, lower and matching
+        """
+        card = card if card is not None else self.current_card()
+        return self.remaining_ranks().odds(card.rank - 1)
@@ -0,0 +1,199 @@
+"""
+    Headless simulation of the higher/lower game
+
+    Plays large batches of games without any printing or input by using NumPy arrays.
+    Each game is a row of card indices and every round is scored exactly as in GameState.step:
+    +1 for a correct guess, -1 for a wrong guess and 0 when the card values match.
+"""
+from __future__ import annotations
+
+from typing import Callable, Optional
+
+import numpy as np
+
+from .card import CARDS, COMPARE_RESULTS
+from .streams import Seed
+
+# The 52 cards in the same order Deck builds them, a card index is a position in this list
+ALL_CARDS = CARDS
+
+# COMPARE_TABLE[current, previous] is current.compare_cards(previous) for every pair of card indices
+COMPARE_TABLE = np.array(COMPARE_RESULTS, dtype=np.int8)
+
+# CARD_VALUES[index] is the numerical value 1-13 of the card at that index
+CARD_VALUES = np.array([card.card_value() for card in ALL_CARDS], dtype=np.int8)
+
+# A strategy takes the (games, rounds played + 1) array of cards drawn so far, the last column being
+# the card the player is guessing from, and returns 1 (higher) or -1 (lower) for every game.
+Strategy = Callable[[np.ndarray], np.ndarray]
+
+
+def always_higher(cards: np.ndarray) -> np.ndarray:
+    """Guesses higher in every game."""
+    return np.ones(len(cards), dtype=np.int8)
+
+
+def midpoint(cards: np.ndarray) -> np.ndarray:
+    """Guesses higher when the previous card is 7 or below, otherwise lower."""
+    return np.where(CARD_VALUES[cards[:, -1]] <= 7, 1, -1).astype(np.int8)
+
+
+def card_counting(cards: np.ndarray) -> np.ndarray:
+    """Guesses higher when the previous card is below the average value of the cards not seen yet, otherwise lower."""
+    seen = CARD_VALUES[cards].astype(np.int64)
+    unseen_total = int(CARD_VALUES.sum()) - seen.sum(axis=1)
+    unseen_cards = len(ALL_CARDS) - cards.shape[1]
+    return np.where(seen[:, -1] * unseen_cards < unseen_total, 1, -1).astype(np.int8)
+
+
+class ScoreDistribution:
+    """
+    A class to represent how many games finished on each final score
+
+    Attributes
+    ----------
+    max_rounds : int
+        How many rounds each game consisted of
+    counts : np.ndarray
+        The number of games for each final score from -max_rounds to max_rounds
+
+    Methods
+    -------
+    scores():
+        Returns the final score each position in counts refers to.
+    games():
+        Returns the total number of games played.
+    mean():
+        Returns the mean final score.
+    variance():
+        Returns the variance of the final score.
+    confidence_interval(z):
+        Returns the lower and upper bound of the confidence interval for the mean final score.
+    """
+    def __init__(self, max_rounds: int, counts: Optional[np.ndarray] = None) -> None:
+        """
+        Constructs all the attributes for a score distribution
+
+        Parameters
+        ----------
+        max_rounds: int
+            How many rounds each game consisted of
+        counts: np.ndarray
+            The number of games for each final score, all zero if not given
+        """
+        self.max_rounds = max_rounds
+        if counts is None:
+            counts = np.zeros(2 * max_rounds + 1, dtype=np.int64)
+        self.counts = counts
+
+    def scores(self) -> np.ndarray:
+        """Returns the final score each position in counts refers to."""
+        return np.arange(-self.max_rounds, self.max_rounds + 1)
+
+    def games(self) -> int:
+        """Returns the total number of games played."""
+        return int(self.counts.sum())
+
+    def mean(self) -> float:
+        """Returns the mean final score."""
+        return float((self.scores() * self.counts).sum() / self.games())
+
+    def variance(self) -> float:
+        """Returns the variance of the final score."""
+        deviation = self.scores() - self.mean()
+        return float((deviation ** 2 * self.counts).sum() / self.games())
+
+    def confidence_interval(self, z: float = 1.96) -> tuple[float, float]:
+        """
+        Returns the lower and upper bound of the confidence interval for the mean final score.
+
+        Parameters
+        ----------
+        z (float): How many standard errors either side of the mean, 1.96 for a 95% interval
+
+        Returns
+        -------
+        interval (tuple[float, float]): The lower and upper bound
+        """
+        mean = self.mean()
+        margin = z * (self.variance() / self.games()) ** 0.5
+        return (mean - margin, mean + margin)
+
+
+def draw_cards(rng: np.random.Generator, games: int, count: int) -> np.ndarray:
+    """
+    Draws the top cards of a freshly shuffled deck for every game.
+
+    Only the first count positions are shuffled, one column at a time, using a vectorised Fisher-Yates shuffle.
+
+    Parameters
+    ----------
+    rng (np.random.Generator): The random number generator to shuffle with
+    games (int): How many decks to shuffle
+    count (int): How many cards to draw from each deck
+
+    Returns
+    -------
+    cards (np.ndarray): A (games, count) uint8 array of card indices
+    """
+    decks = np.tile(np.arange(len(ALL_CARDS), dtype=np.uint8), (games, 1))
+    rows = np.arange(games)
+    for position in range(count):
+        swap = rng.integers(position, len(ALL_CARDS), size=games)
+        picked = decks[rows, swap]
+        decks[rows, swap] = decks[:, position]
+        decks[:, position] = picked
+    return decks[:, :count]
+
+
+def play_games(cards: np.ndarray, strategy: Strategy) -> np.ndarray:
+    """
+    Plays every round of a batch of games and returns the final scores.
+
+    Parameters
+    ----------
+    cards (np.ndarray): A (games, max_rounds + 1) array of card indices in the order they are drawn
+    strategy (Strategy): Returns the guess for every game from the cards drawn so far
+
+    Returns
+    -------
+    scores (np.ndarray): The final score of each game
+    """
+    games, drawn = cards.shape
+    scores = np.zeros(games, dtype=np.int16)
+    for round_number in range(drawn - 1):
+        guess = strategy(cards[:, :round_number + 1])
+        answer = COMPARE_TABLE[cards[:, round_number + 1], cards[:, round_number]]
+        # right guesses give 1 * 1 or -1 * -1, wrong ones give -1 and matching cards give 0
+        scores += answer * guess
+    return scores
+
+
+def simulate(strategy: Strategy = always_higher, max_rounds: int = 3, games: int = 1_000_000, seed: Seed = None, batch_size: int = 100_000) -> ScoreDistribution:
+    """
+    Plays many games without any input or output and returns the distribution of final scores.
+
+    Parameters
+    ----------
+    strategy (Strategy): Returns the guess for every game from the cards drawn so far
+    max_rounds (int): How many rounds a game consists of
+    games (int): How many games to play
+    seed (Seed): Seed or SeedSequence for the random number generator, the same seed always gives the same result
+    batch_size (int): How many games are played at once
+
+    Returns
+    -------
+    distribution (ScoreDistribution): How many games finished on each final score
+    """
+    if not 0 < max_rounds < len(ALL_CARDS):
+        raise ValueError(f"max_rounds must be between 1 and {len(ALL_CARDS) - 1}")
+
+    rng = np.random.default_rng(seed)
+    distribution = ScoreDistribution(max_rounds)
+    remaining = games
+    while remaining > 0:
+        batch = min(batch_size, remaining)
+        scores = play_games(draw_cards(rng, batch, max_rounds + 1), strategy)
+        distribution.counts += np.bincount(scores + max_rounds, minlength=2 * max_rounds + 1)
+        remaining -= batch
+    return distribution
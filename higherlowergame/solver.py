@@ -0,0 +1,256 @@
+"""
+    Exact optimal play for the higher/lower game
+
+    Works out the expected final score of every position in a game and the guess that maximises it.
+    A position is the previous card's value, how many cards of each value are still left in the deck and how many rounds are left.
+    Positions are solved by dynamic programming over the counts of each value, so suits and the order of the cards never need enumerating.
+    A Solver, or a PolicyTable of precomputed positions, advises the terminal game's hints and batch play from a GameState.
+"""
+from __future__ import annotations
+
+import json
+from functools import lru_cache
+from typing import Optional, Sequence, Union
+
+import numpy as np
+
+from .card import CARDS, values
+from .deck import Deck
+from .shoe import Shoe
+from .simulation import CARD_VALUES
+from .state import GameState
+
+# How many cards of each value 1-13 are in a full deck, index 0 is for aces
+FULL_DECK_COUNTS = tuple(sum(card.rank == value for card in CARDS) for value in values.values())
+
+
+def remove_card(counts: tuple, value: int) -> tuple:
+    """Returns the counts with one card of the given value taken out."""
+    return counts[:value - 1] + (counts[value - 1] - 1,) + counts[value:]
+
+
+def best_guess(previous_value: int, counts: Sequence[int]) -> int:
+    """
+    Returns the guess that maximises the expected final score.
+
+    The guess does not change which cards come next, so the best guess is whichever of higher or lower has more cards left.
+    Higher is guessed when they are even.
+
+    Parameters
+    ----------
+    previous_value (int): The value 1-13 of the card the player is guessing from
+    counts (Sequence[int]): How many cards of each value are left in the deck
+
+    Returns
+    -------
+    guess (int): 1 to guess higher or -1 to guess lower
+    """
+    lower = sum(counts[:previous_value - 1])
+    higher = sum(counts[previous_value:])
+    return 1 if higher >= lower else -1
+
+
+class Solver:
+    """
+    A class to calculate the exact expected score of optimal play
+
+    Solved positions are memoised in a least recently used cache so repeated queries are instant and memory stays bounded.
+
+    Attributes
+    ----------
+    cache_size : int
+        The most positions kept in the cache
+
+    Methods
+    -------
+    expected_score(previous_value, counts, rounds_left):
+        Returns the expected score from a position when playing optimally.
+    game_value(max_rounds):
+        Returns the expected final score of a new game played optimally.
+    best_guess_for_deck(deck):
+        Returns the best guess from the current card of a deck.
+    advise(state):
+        Returns the best guess in a game and the points it expects to score.
+    cache_info():
+        Returns the hit, miss and size statistics of the cache.
+    """
+    def __init__(self, cache_size: int = 1_000_000) -> None:
+        """
+        Constructs all the attributes for a solver
+
+        Parameters
+        ----------
+        cache_size: int
+            The most positions kept in the cache
+        """
+        self.cache_size = cache_size
+        self._expected_score = lru_cache(maxsize=cache_size)(self._solve)
+
+    def _solve(self, previous_value: int, counts: tuple, rounds_left: int) -> float:
+        """Solves a position from the positions one round later."""
+        cards_left = sum(counts)
+        if rounds_left == 0 or cards_left == 0:
+            return 0.0
+
+        lower = sum(counts[:previous_value - 1])
+        higher = sum(counts[previous_value:])
+        expected = abs(higher - lower) / cards_left
+
+        if rounds_left > 1:
+            for value, count in enumerate(counts, start=1):
+                if count:
+                    expected += count / cards_left * self._expected_score(value, remove_card(counts, value), rounds_left - 1)
+        return expected
+
+    def expected_score(self, previous_value: int, counts: Sequence[int], rounds_left: int) -> float:
+        """
+        Returns the expected score from a position when playing optimally.
+
+        Parameters
+        ----------
+        previous_value (int): The value 1-13 of the card the player is guessing from
+        counts (Sequence[int]): How many cards of each value are left in the deck
+        rounds_left (int): How many rounds are left to play including this one
+
+        Returns
+        -------
+        expected (float): The expected number of points still to be scored
+        """
+        return self._expected_score(previous_value, tuple(counts), rounds_left)
+
+    def game_value(self, max_rounds: int = 3) -> float:
+        """Returns the expected final score of a new game played optimally."""
+        cards_left = sum(FULL_DECK_COUNTS)
+        return sum(
+            count / cards_left * self.expected_score(value, remove_card(FULL_DECK_COUNTS, value), max_rounds)
+            for value, count in enumerate(FULL_DECK_COUNTS, start=1)
+        )
+
+    @staticmethod
+    def best_guess_for_deck(deck: Union[Deck, Shoe]) -> int:
+        """Returns the best guess from the current card of a deck or shoe using the cards after the current position."""
+        return best_guess(deck.current_card().card_value(), deck.remaining_ranks().counts())
+
+    def advise(self, state: GameState) -> tuple[int, float]:
+        """Returns the best guess from where a game is, 1 for higher and -1 for lower, and the points optimal play expects to score in the rest of the game."""
+        previous_value = state.card().card_value()
+        counts = state.deck.remaining_ranks().counts()
+        return best_guess(previous_value, counts), self.expected_score(previous_value, counts, state.max_rounds - state.round)
+
+    def cache_info(self):
+        """Returns the hit, miss and size statistics of the cache."""
+        return self._expected_score.cache_info()
+
+
+def optimal_strategy(cards: np.ndarray) -> np.ndarray:
+    """
+    Guesses optimally in every game of a simulation batch.
+
+    Counts the values of the cards drawn so far and applies best_guess to every game at once.
+
+    Parameters
+    ----------
+    cards (np.ndarray): A (games, rounds played + 1) array of card indices drawn so far
+
+    Returns
+    -------
+    guess (np.ndarray): 1 to guess higher or -1 to guess lower for every game
+    """
+    seen = CARD_VALUES[cards]
+    previous = seen[:, -1:]
+    seen_lower = (seen < previous).sum(axis=1)
+    seen_higher = (seen > previous).sum(axis=1)
+
+    full_counts = np.array(FULL_DECK_COUNTS)
+    below = np.concatenate(([0], np.cumsum(full_counts)))
+    lower = below[previous[:, 0] - 1] - seen_lower
+    higher = below[-1] - below[previous[:, 0]] - seen_higher
+    return np.where(higher >= lower, 1, -1).astype(np.int8)
+
+
+def _table_key(previous_value: int, counts: Sequence[int], rounds_left: int) -> str:
+    """Returns the key of a position in a policy table, the counts are written as one digit per value."""
+    return f"{previous_value}:{''.join(str(count) for count in counts)}:{rounds_left}"
+
+
+def build_table(max_rounds: int = 3, solver: Optional[Solver] = None) -> dict:
+    """
+    Solves every position reachable in a new game.
+
+    Parameters
+    ----------
+    max_rounds (int): How many rounds a game consists of
+    solver (Solver): The solver to use, a new one if not given
+
+    Returns
+    -------
+    table (dict): The best guess and expected score for the key of every reachable position
+    """
+    solver = solver or Solver()
+    table = {}
+    positions = [(value, remove_card(FULL_DECK_COUNTS, value)) for value in range(1, len(FULL_DECK_COUNTS) + 1)]
+    for rounds_left in range(max_rounds, 0, -1):
+        next_positions = set()
+        for previous_value, counts in positions:
+            table[_table_key(previous_value, counts, rounds_left)] = [
+                best_guess(previous_value, counts),
+                solver.expected_score(previous_value, counts, rounds_left),
+            ]
+            for value, count in enumerate(counts, start=1):
+                if count:
+                    next_positions.add((value, remove_card(counts, value)))
+        positions = next_positions
+    return table
+
+
+def save_table(path: str, max_rounds: int = 3) -> None:
+    """Solves every position reachable in a new game and writes them to a JSON file."""
+    with open(path, "w") as file:
+        json.dump({"max_rounds": max_rounds, "positions": build_table(max_rounds)}, file)
+
+
+class PolicyTable:
+    """
+    A class to look up precomputed optimal play loaded from a file written by save_table
+
+    Attributes
+    ----------
+    max_rounds : int
+        How many rounds the table was built for
+    positions : dict
+        The best guess and expected score for the key of every reachable position
+
+    Methods
+    -------
+    best_guess(previous_value, counts, rounds_left):
+        Returns the stored best guess for a position.
+    expected_score(previous_value, counts, rounds_left):
+        Returns the stored expected score for a position.
+    advise(state):
+        Returns the stored best guess in a game and the points it expects to score.
+    """
+    def __init__(self, path: str) -> None:
+        """Loads a policy table from a JSON file written by save_table."""
+        with open(path) as file:
+            table = json.load(file)
+        self.max_rounds = table["max_rounds"]
+        self.positions = table["positions"]
+
+    def best_guess(self, previous_value: int, counts: Sequence[int], rounds_left: int) -> int:
+        """Returns the stored best guess for a position."""
+        return self.positions[_table_key(previous_value, counts, rounds_left)][0]
+
+    def expected_score(self, previous_value: int, counts: Sequence[int], rounds_left: int) -> float:
+        """Returns the stored expected score for a position."""
+        return self.positions[_table_key(previous_value, counts, rounds_left)][1]
+
+    def advise(self, state: GameState) -> tuple[int, float]:
+        """
+        Returns the stored best guess from where a game is, 1 for higher and -1 for lower, and the points it expects to score in the rest of the game.
+
+        Raises
+        ------
+        KeyError: if the position is not in the table, such as a game of more rounds than the table was built for
+        """
+        guess, expected = self.positions[_table_key(state.card().card_value(), state.deck.remaining_ranks().counts(), state.max_rounds - state.round)]
+        return guess, expected
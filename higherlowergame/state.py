@@ -0,0 +1,178 @@
+"""
+    Game state
+
+    The rules of the Higher/Lower game as a state object without any input or output. Each guess is one step(guess) transition
+    that deals the next card, scores the guess and returns the outcome, so the terminal game, the server and scripted play
+    all share the same rules and only differ in how they show the outcome.
+    A state is saved as a fixed size binary snapshot of the deck order, position, score, round and rounds per game,
+    so games can be paused, moved between server workers or checkpointed in bulk and restored without shuffling.
+"""
+from __future__ import annotations
+
+import struct
+from array import array
+from typing import NamedTuple, Optional
+
+from .card import CARDS, Card
+from .deck import Deck
+
+# deck order, deck position, score, round, rounds per game
+SNAPSHOT = struct.Struct(f"<{len(CARDS)}sBiHH")
+
+
+class GameOver(Exception):
+    """Raised when guessing after the last round of a game."""
+
+
+class RoundOutcome(NamedTuple):
+    """What happened in one round: the card guessed from, the card dealt, the guess and the points it scored."""
+    round: int
+    previous_card: Card
+    card: Card
+    guess: int
+    answer: int
+    points: int
+    score: int
+
+
+class GameState:
+    """
+    A class to represent where a game is, with the rules for moving it on
+
+    Attributes
+    ----------
+    deck : Deck
+        The deck of cards used in the game, the card on top is the one the player is guessing from, only a Deck can be saved in a snapshot
+    max_rounds : int
+        How many rounds a game consists of
+    score : int
+        The player score of the current game
+    round : int
+        How many rounds of the current game have been played
+    over : bool
+        Whether every round of the current game has been played
+
+    Methods
+    -------
+    new_game():
+        Starts a new game with a reshuffled deck.
+    card():
+        Returns the card the player is guessing from.
+    odds():
+        Returns the chance of the next card being higher, lower or matching the card the player is guessing from.
+    step(guess):
+        Deals the next card and scores a guess.
+    snapshot():
+        Returns the state as bytes.
+    load(data):
+        Replaces the state with the one saved in a snapshot.
+    restore(data):
+        Returns a new state from a snapshot.
+    """
+    __slots__ = ("deck", "max_rounds", "score", "round")
+
+    def __init__(self, deck: Optional[Deck] = None, max_rounds: int = 3, score: int = 0, round: int = 0) -> None:
+        """
+        Constructs all the attributes for a game state
+
+        Parameters
+        ----------
+        deck: Deck
+            The deck of cards used in the game, a newly shuffled deck if not given
+        max_rounds: int
+            How many rounds a game consists of
+        score: int
+            The player score of the current game
+        round: int
+            How many rounds of the current game have been played
+        """
+        self.deck = deck if deck is not None else Deck()
+        self.max_rounds = max_rounds
+        self.score = score
+        self.round = round
+
+    @property
+    def over(self) -> bool:
+        """Whether every round of the current game has been played."""
+        return self.round >= self.max_rounds
+
+    def new_game(self) -> None:
+        """Starts a new game with a reshuffled deck and no score."""
+        self.deck.reset_deck()
+        self.score = 0
+        self.round = 0
+
+    def card(self) -> Card:
+        """Returns the card the player is guessing from."""
+        return self.deck.current_card()
+
+    def odds(self) -> tuple[float, float, float]:
+        """Returns the chance of the next card being higher, lower or matching the card the player is guessing from."""
+        return self.deck.odds()
+
+    def step(self, guess: int) -> RoundOutcome:
+        """
+        Deals the next card and scores a guess, 1 point if it was right, -1 if it was wrong and 0 if the cards match.
+
+        Parameters
+        ----------
+        guess (int): 1 for higher and -1 for lower
+
+        Returns
+        -------
+        outcome (RoundOutcome): The round that was played
+
+        Raises
+        ------
+        GameOver: if every round of the game has been played
+        ValueError: if the guess is not 1 or -1
+        """
+        if self.over:
+            raise GameOver(f"All {self.max_rounds} rounds have been played")
+        if guess != 1 and guess != -1:
+            raise ValueError(f"A guess must be 1 (higher) or -1 (lower), not {guess!r}")
+        self.deck.move_to_next_card()
+        previous_card = self.deck.previous_card()
+        card = self.deck.current_card()
+        answer = card.compare_cards(previous_card)
+        points = answer * guess
+        self.score += points
+        outcome = RoundOutcome(self.round, previous_card, card, guess, answer, points, self.score)
+        self.round += 1
+        return outcome
+
+    def snapshot(self) -> bytes:
+        """Returns the deck order, position, score, round and rounds per game packed into SNAPSHOT.size bytes."""
+        return SNAPSHOT.pack(self.deck.order.tobytes(), self.deck.current_position, self.score, self.round, self.max_rounds)
+
+    def load(self, data: bytes) -> None:
+        """
+        Replaces this state with the one saved in a snapshot, reusing the deck.
+
+        Raises
+        ------
+        ValueError: if the data is not a snapshot of a whole deck
+        """
+        if len(data) != SNAPSHOT.size:
+            raise ValueError(f"A snapshot is {SNAPSHOT.size} bytes, not {len(data)}")
+        order, position, score, round_number, max_rounds = SNAPSHOT.unpack(data)
+        if len(set(order)) != len(CARDS) or max(order) >= len(CARDS) or position > len(CARDS):
+            raise ValueError("The snapshot is not of a whole deck")
+        self.deck.order = array("B", order)
+        self.deck.current_position = position
+        self.score = score
+        self.round = round_number
+        self.max_rounds = max_rounds
+
+    @staticmethod
+    def restore(data: bytes) -> GameState:
+        """
+        Returns a new state from a snapshot, without shuffling a deck for it.
+
+        Raises
+        ------
+        ValueError: if the data is not a snapshot of a whole deck
+        """
+        state = GameState(Deck(order=range(len(CARDS))))
+        state.load(data)
+        return state
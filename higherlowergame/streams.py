@@ -0,0 +1,66 @@
+"""
+    Reproducible random number streams
+
+    Every random choice in a simulation can be traced back to one root seed.
+    Seeds for parallel workers are spawned from the root with NumPy's SeedSequence, which guarantees the streams do not overlap,
+    so the same root seed gives the same results on any machine and with any number of workers.
+"""
+from __future__ import annotations
+
+import random
+from typing import Optional, Union
+
+import numpy as np
+
+from .card import CARDS
+
+Seed = Union[None, int, np.random.SeedSequence]
+
+
+def spawn_seeds(seed: Seed, count: int) -> list[np.random.SeedSequence]:
+    """
+    Derives independent seeds for a number of workers from one root seed.
+
+    Parameters
+    ----------
+    seed (Seed): The root seed, a random one is used if None
+    count (int): How many worker seeds to derive
+
+    Returns
+    -------
+    seeds (list[np.random.SeedSequence]): One seed per worker, they can be pickled to send to other processes
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return seed.spawn(count)
+
+
+def spawn_generators(seed: Seed, count: int) -> list[np.random.Generator]:
+    """Returns a NumPy random number generator for each of a number of workers derived from one root seed."""
+    return [np.random.default_rng(worker_seed) for worker_seed in spawn_seeds(seed, count)]
+
+
+def deck_rng(seed: Seed) -> random.Random:
+    """Returns a random.Random seeded from a seed or SeedSequence, to pass to a Deck or Shoe."""
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return random.Random(int.from_bytes(seed.generate_state(4).tobytes(), "little"))
+
+
+def shuffled_decks(count: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """
+    Shuffles many decks at once.
+
+    Each deck is ordered by sorting a row of random numbers, which shuffles every deck with one vectorised call.
+
+    Parameters
+    ----------
+    count (int): How many decks to shuffle
+    rng (np.random.Generator): The random number generator to shuffle with, a new unseeded one if not given
+
+    Returns
+    -------
+    decks (np.ndarray): A (count, 52) uint8 array, each row holds the card indices of one deck in shuffled order
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    return np.argsort(rng.random((count, len(CARDS))), axis=1).astype(np.uint8)
@@ -0,0 +1,100 @@
+import io
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pytest
+
+from ..__main__ import main
+from ..batch import CSV_HEADER, BatchResult, play_batch
+from ..deck import Deck
+from ..game import Game
+from ..leaderboard import Leaderboard
+from ..solver import Solver
+from ..state import GameState
+
+
+class TestBatch(unittest.TestCase):
+    @patch("sys.stdout", new_callable=io.StringIO)
+    @patch("builtins.input")
+    def test_transcript_matches_the_terminal_game(self, mock_input, mock_stdout):
+        """Tests the transcript is what the terminal game shows for the same deck and answers, without the echoed guesses."""
+        answers = ["h", "x", "l", "h", "maybe", "y", "l", "l", "h", "n"]
+        mock_input.side_effect = answers
+        game = Game(show_hints=True)
+        game.deck = Deck(random.Random(3))
+        game.play_game()
+        shown = "".join(line + "\n" for line in mock_stdout.getvalue().splitlines() if line not in ("h", "l", "x"))
+        output = io.StringIO()
+
+        result = play_batch(answers, output, seed=3, show_hints=True)
+
+        assert output.getvalue() == shown
+        assert result == BatchResult(games=2, rounds=6, invalid=2)
+
+    def test_csv_rows(self):
+        """Tests each round is one CSV row, invalid answers are skipped and play stops at n with later lines unread."""
+        output = io.StringIO()
+        lines = iter(["h\n", "?\n", "l\n", "h\n", "y\n", " l \n", "l\n", "l\n", "n\n", "h\n"])
+
+        result = play_batch(lines, output, format="csv", seed=5)
+
+        rows = output.getvalue().splitlines()
+        assert rows[0] + "\n" == CSV_HEADER and len(rows) == 7
+        assert [row.split(",")[:2] for row in rows[1:]] == [["1", "1"], ["1", "2"], ["1", "3"], ["2", "1"], ["2", "2"], ["2", "3"]]
+        assert [row.split(",")[4] for row in rows[1:]] == ["h", "l", "h", "l", "l", "l"]
+        assert rows[2].split(",")[2] == rows[1].split(",")[3]
+        assert result == BatchResult(games=2, rounds=6, invalid=1)
+        assert next(lines) == "h\n"
+
+        replayed = io.StringIO()
+        play_batch(["h", "?", "l", "h", "y", "l", "l", "l", "n"], replayed, format="csv", seed=5)
+        assert replayed.getvalue() == output.getvalue()
+        with pytest.raises(ValueError):
+            play_batch([], io.StringIO(), format="json")
+
+    def test_policy_answers(self):
+        """Tests a p answer plays the guess the policy advises, written to the CSV as h or l."""
+        output = io.StringIO()
+        policy = Solver()
+        state = GameState(Deck(random.Random(7)), max_rounds=3)
+        expected = []
+        while not state.over:
+            guess = policy.advise(state)[0]
+            expected.append("h" if guess == 1 else "l")
+            state.step(guess)
+
+        result = play_batch(["p", "p", "p", "n"], output, format="csv", seed=7, policy=policy)
+
+        assert [row.split(",")[4] for row in output.getvalue().splitlines()[1:]] == expected
+        assert result == BatchResult(games=1, rounds=3, invalid=0)
+
+    def test_many_games_without_recursion(self):
+        """Tests thousands of games play back to back in one call stack, an unfinished last game is not counted."""
+        games = 5000
+        leaderboard = Leaderboard()
+
+        result = play_batch(["h", "l", "h", "y"] * games + ["h", "l"], io.StringIO(), format="csv", leaderboard=leaderboard, player_id=9)
+
+        assert result == BatchResult(games=games, rounds=3 * games + 2, invalid=0)
+        assert len(leaderboard) == 1 and leaderboard.score(9) <= 3
+
+    def test_command_line(self):
+        """Tests --batch reads answers from a file and writes the rounds to --output."""
+        with tempfile.TemporaryDirectory() as directory:
+            answers = os.path.join(directory, "answers.txt")
+            output = os.path.join(directory, "rounds.csv")
+            with open(answers, "w") as file:
+                file.write("h\nh\nh\nn\n")
+
+            with patch("sys.argv", ["higherlowergame", "--batch", answers, "--format", "csv", "--output", output, "--seed", "1"]):
+                main()
+
+            with open(output) as file:
+                assert len(file.read().splitlines()) == 4
+
+
+if __name__ == "__main__":
+    unittest.main()
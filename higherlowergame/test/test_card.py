@@ -1,6 +1,7 @@
+import pickle
 import unittest
 
-from ..card import Card
+from ..card import CARDS, COMPARE_RESULTS, Card
 
 class TestCard(unittest.TestCase):
     def test_initial_card_value(self):
@@ -44,5 +45,29 @@ class TestCard(unittest.TestCase):
         compare = card.compare_cards(previous_card)
         assert compare == 0
 
+    def test_cards_are_shared(self):
+        """Test constructing the same card twice returns the one shared card object without a per-instance dict."""
+        card = Card("Clubs", "8")
+        assert card is Card("Clubs", "8")
+        assert CARDS[card.index] is card
+        assert not hasattr(card, "__dict__")
+
+    def test_invalid_card(self):
+        """Test constructing a card that is not in a standard deck raises a ValueError."""
+        with self.assertRaises(ValueError):
+            Card("Stars", "8")
+
+    def test_pickled_card_is_shared(self):
+        """Test unpickling a card returns the shared card object."""
+        card = Card("Hearts", "Q")
+        assert pickle.loads(pickle.dumps(card)) is card
+
+    def test_compare_results_table(self):
+        """Test the precomputed compare results cover every pair of the 52 cards."""
+        assert len(CARDS) == 52
+        assert len(COMPARE_RESULTS) == 52
+        assert all(len(row) == 52 for row in COMPARE_RESULTS)
+        assert sum(result == 0 for row in COMPARE_RESULTS for result in row) == 13 * 16
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -72,6 +72,59 @@ class TestDeck(unittest.TestCase):
         assert deck.deck != initial_deck
         assert deck.current_position == 0
 
+    def test_deck_order_is_compact(self):
+        """Tests the deck order is kept as one byte per card and matches the list of cards"""
+        deck = Deck()
+
+        assert deck.order.typecode == "B"
+        assert sorted(deck.order) == list(range(52))
+        assert [card.index for card in deck.deck] == list(deck.order)
+
+    def test_remaining_ranks_follow_moves(self):
+        """Tests the count of the remaining values is updated as cards are taken"""
+        deck = Deck()
+        deck.remaining_ranks()
+
+        for _ in range(10):
+            deck.move_to_next_card()
+            expected = [0] * 13
+            for card in deck.deck[deck.current_position + 1:]:
+                expected[card.rank - 1] += 1
+            assert deck.remaining_ranks().counts() == expected
+
+    def test_remaining_ranks_after_reordering(self):
+        """Tests the count of the remaining values is rebuilt when the position is set or the deck is shuffled"""
+        deck = Deck()
+        deck.remaining_ranks()
+
+        deck.current_position = 40
+        assert deck.remaining_ranks().total == 11
+
+        deck.reset_deck()
+        assert deck.remaining_ranks().total == 51
+
+    def test_odds(self):
+        """Tests the odds of the next card compare the current card to the cards after it"""
+        deck = Deck()
+        ace = Card("Clubs", "A")
+        deck.deck = [ace] + [card for card in deck.deck if card is not ace]
+
+        higher, lower, match = deck.odds()
+
+        assert lower == 0
+        assert match == 3 / 51
+        assert higher == 48 / 51
+
+    def test_set_deck(self):
+        """Tests setting the list of cards sets the deck order"""
+        deck = Deck()
+        cards = list(reversed(deck.deck))
+
+        deck.deck = cards
+
+        assert deck.deck == cards
+        assert deck.current_card() is cards[0]
+
 
 
         
@@ -0,0 +1,142 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from ..card import Card
+from ..deck import Deck
+from ..eventlog import HEADER, MAGIC, RECORD, SESSION_BLOCK, VERSION, EventLogReader, EventLogWriter
+from ..game import Game
+from ..server import Session
+
+
+class TestEventLog(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "events.log")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_records_are_buffered(self):
+        """Tests records are only written to the file once the buffer is full."""
+        writer = EventLogWriter(self.path, buffer_records=2)
+        writer.record(1, 0, 5, 9, 1, 1, 1)
+        assert os.path.getsize(self.path) == HEADER.size
+
+        writer.record(1, 1, 9, 2, 1, -1, -1)
+        assert os.path.getsize(self.path) == HEADER.size + 2 * RECORD.size
+        writer.close()
+
+    def test_reader_columns(self):
+        """Tests the reader exposes each field of every record as a column."""
+        with EventLogWriter(self.path) as writer:
+            writer.record(7, 0, 5, 9, 1, 1, 1)
+            writer.record(7, 1, 9, 2, 1, -1, -1)
+        with EventLogWriter(self.path) as writer:
+            writer.record(8, 0, 3, 16, -1, 0, 0)
+
+        with EventLogReader(self.path) as reader:
+            assert len(reader) == 3
+            assert reader.column("session").tolist() == [7, 7, 8]
+            assert reader.column("round").tolist() == [0, 1, 0]
+            assert reader.column("score_change").tolist() == [1, -1, 0]
+            assert reader.column("guess").base is not None
+            assert int(reader.column("score_change").sum()) == 0
+
+    def test_reader_chunks_and_partial_record(self):
+        """Tests a partly written last record is ignored and chunks cover every record."""
+        with EventLogWriter(self.path) as writer:
+            for round_number in range(10):
+                writer.record(1, round_number, 0, 1, 1, 1, 1)
+        with open(self.path, "ab") as file:
+            file.write(b"\x01\x02\x03")
+
+        with EventLogReader(self.path) as reader:
+            chunks = [chunk["round"].tolist() for chunk in reader.chunks(4)]
+
+        assert chunks == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+
+    def test_partial_record_is_cut_off_before_appending(self):
+        """Tests a writer opening a log with a partly written last record drops it, so the records appended after it read back intact."""
+        with EventLogWriter(self.path) as writer:
+            writer.record(writer.next_session(), 0, 5, 9, 1, 1, 1)
+        with open(self.path, "ab") as file:
+            file.write(RECORD.pack(0, 1, 9, 2, 1, -1, -1)[:5])
+
+        with EventLogWriter(self.path) as writer:
+            assert os.path.getsize(self.path) == HEADER.size + RECORD.size
+            session = writer.next_session()
+            writer.record(session, 0, 1, 2, -1, 1, -1)
+            writer.record(session, 1, 2, 3, 1, 1, 1)
+
+        with EventLogReader(self.path) as reader:
+            assert reader.column("session").tolist() == [0, SESSION_BLOCK, SESSION_BLOCK]
+            assert reader.column("round").tolist() == [0, 0, 1]
+            assert reader.column("previous_card").tolist() == [5, 1, 2]
+            assert reader.column("score_change").tolist() == [1, -1, 1]
+
+    def test_not_an_event_log(self):
+        """Tests opening a file that is not an event log raises a ValueError."""
+        with open(self.path, "wb") as file:
+            file.write(b"not an event log")
+
+        with pytest.raises(ValueError):
+            EventLogReader(self.path)
+        with pytest.raises(ValueError):
+            EventLogWriter(self.path)
+
+    def test_session_ids_are_not_reused_across_runs(self):
+        """Tests every writer of a log hands out new session ids, even after a run that was not closed or a log without reserved ids."""
+        with EventLogWriter(self.path) as writer:
+            assert [writer.next_session() for _ in range(3)] == [0, 1, 2]
+        crashed = EventLogWriter(self.path)
+        assert crashed.next_session() == SESSION_BLOCK
+        with EventLogWriter(self.path) as writer:
+            assert writer.next_session() == 2 * SESSION_BLOCK
+            assert Game(writer).session_id == 2 * SESSION_BLOCK + 1
+        crashed.close()
+
+        old_path = os.path.join(self.directory.name, "old.log")
+        with open(old_path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, 0) + RECORD.pack(5, 0, 1, 2, 1, 1, 1) + RECORD.pack(9, 0, 1, 2, 1, 1, 1))
+        with EventLogWriter(old_path) as writer:
+            assert writer.next_session() == 10
+        with EventLogReader(old_path) as reader:
+            assert reader.column("session").tolist() == [5, 9]
+
+    @patch("sys.stdout", new_callable=io.StringIO)
+    @patch("higherlowergame.game.Game.take_guess")
+    def test_play_round_records_outcome(self, mock_take_guess, mock_stdout):
+        """Tests the game records each round's cards, guess, result and score change."""
+        mock_take_guess.return_value = -1
+        with EventLogWriter(self.path) as writer:
+            game = Game(writer, session_id=42)
+            game.deck = Deck()
+            game.deck.deck = [Card("Clubs", "8"), Card("Hearts", "Q")] + [card for card in Deck().deck if card.name not in ("8C", "QH")]
+            game.play_round(0)
+
+        with EventLogReader(self.path) as reader:
+            record = reader.records[0].tolist()
+
+        assert record == (42, 0, Card("Clubs", "8").index, Card("Hearts", "Q").index, -1, 1, -1)
+
+    def test_server_session_records_outcome(self):
+        """Tests server sessions record every round under their session id."""
+        with EventLogWriter(self.path) as writer:
+            session = Session(max_rounds=2, event_log=writer, session_id=3)
+            session.new_game()
+            session.handle("h")
+            session.handle("l")
+
+        with EventLogReader(self.path) as reader:
+            assert reader.column("session").tolist() == [3, 3]
+            assert int(np.asarray(reader.column("score_change")).sum()) == session.score
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -41,6 +41,7 @@ class TestGame(unittest.TestCase):
         game.deck = Deck()
         final_score = 4
         game.score = final_score
+        replay_question.return_value = False
 
         game.play_game()
 
@@ -68,7 +69,7 @@ class TestGame(unittest.TestCase):
         current_card_name = "6S"
         current_card.card_name.return_value = current_card_name
         current_card.compare_cards.return_value = 1
-        mock_deck.current_card.return_value = current_card
+        mock_deck.current_card.side_effect = [first_card, current_card]
 
         deck_intitial_position = 0
         game.deck = mock_deck
@@ -108,7 +109,7 @@ class TestGame(unittest.TestCase):
         current_card_name = "6S"
         current_card.card_name.return_value = current_card_name
         current_card.compare_cards.return_value = -1
-        mock_deck.current_card.return_value = current_card
+        mock_deck.current_card.side_effect = [previous_card, current_card]
 
         game.deck = mock_deck
         deck_intitial_position = 2
@@ -149,7 +150,7 @@ class TestGame(unittest.TestCase):
         current_card_name = "6S"
         current_card.card_name.return_value = current_card_name
         current_card.compare_cards.return_value = 0
-        mock_deck.current_card.return_value = current_card
+        mock_deck.current_card.side_effect = [previous_card, current_card]
 
         game.deck = mock_deck
         deck_intitial_position = 2
@@ -163,6 +164,21 @@ class TestGame(unittest.TestCase):
         assert f"The card's values match" in stdout
         assert game.score == initial_score
 
+    @unittest.mock.patch("sys.stdout", new_callable=io.StringIO)
+    @unittest.mock.patch("higherlowergame.game.Game.take_guess")
+    def test_play_round_hint(self, mock_take_guess, mock_stdout):
+        """Tests the play round method shows the odds of the next card and the solver's best guess before the guess when hints are on"""
+        game = Game(show_hints=True)
+        game.deck = Deck()
+        game.deck.odds = Mock(return_value=(0.5, 0.25, 0.25))
+        mock_take_guess.return_value = 1
+
+        game.play_round(0)
+
+        assert "Hint: the next card is higher 50%, lower 25% and matches 25% of the time" in mock_stdout.getvalue()
+        assert "Hint: the best guess is " in mock_stdout.getvalue()
+        assert Game.hint_message((0.5, 0.25, 0.25), (-1, 0.5)).endswith("Hint: the best guess is lower (l), expecting +0.50 more points this game")
+
     @unittest.mock.patch("builtins.input")
     def test_take_guess_higher(self, mock_input):
         """Test the take guess method returns 1 when guessing higher"""
@@ -0,0 +1,192 @@
+import asyncio
+import io
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from ..game import Game
+from ..leaderboard import Leaderboard, SortedKeys, synthetic_scores
+from ..server import Session, start_server
+
+
+def expected_order(best, arrival):
+    """Returns the players ordered by best score, then by when they reached it."""
+    return sorted(best, key=lambda player: (-best[player], arrival[player]))
+
+
+class TestSortedKeys(unittest.TestCase):
+    def test_matches_a_sorted_list(self):
+        """Tests adding and removing keys across many small blocks keeps ranks and positions those of a sorted list."""
+        rng = random.Random(1)
+        keys = SortedKeys(block_size=4)
+        expected = []
+
+        for _ in range(2000):
+            key = rng.randrange(500)
+            if key in expected:
+                keys.remove(key)
+                expected.remove(key)
+            else:
+                keys.add(key)
+                expected.append(key)
+            expected.sort()
+
+        assert len(keys) == len(expected)
+        assert list(keys.to_array()) == expected
+        assert [keys[position] for position in range(len(expected))] == expected
+        assert list(keys.iterate(10)) == expected[10:]
+        assert all(keys.rank(key) == sum(1 for other in expected if other < key) for key in range(-1, 502, 7))
+        with pytest.raises(KeyError):
+            keys.remove(1000)
+
+
+class TestLeaderboard(unittest.TestCase):
+    def test_matches_a_brute_force_ranking(self):
+        """Tests ranks, top lists, cutoffs and percentiles match those worked out from every player's best score."""
+        rng = random.Random(2)
+        leaderboard = Leaderboard(block_size=4)
+        best, arrival = {}, {}
+
+        for entry in range(3000):
+            player, score = rng.randrange(300), rng.randint(-10, 10)
+            improved = player not in best or score > best[player]
+            assert leaderboard.record(player, score) == improved
+            if improved:
+                best[player], arrival[player] = score, entry
+
+        order = expected_order(best, arrival)
+        assert leaderboard.top(20) == [(player, best[player]) for player in order[:20]]
+        for player in best:
+            assert leaderboard.score(player) == best[player]
+            assert leaderboard.rank(player) == 1 + sum(1 for score in best.values() if score > best[player])
+            assert leaderboard.percentile(player) == 100 * sum(1 for score in best.values() if score < best[player]) / len(best)
+        assert leaderboard.cutoff(100) == best[order[-1]]
+        assert leaderboard.cutoff(10) == best[order[len(order) // 10 - 1]]
+        with pytest.raises(KeyError):
+            leaderboard.rank(1000)
+        with pytest.raises(ValueError):
+            leaderboard.cutoff(0)
+
+    def test_record_many_matches_record(self):
+        """Tests recording batches, small or large enough to rebuild, orders players as recording one score at a time does."""
+        one_at_a_time, batched = Leaderboard(block_size=8), Leaderboard(block_size=8)
+
+        for players, scores in synthetic_scores(5000, 800, max_rounds=5, seed=3, batch_size=700):
+            for player, score in zip(players.tolist(), scores.tolist()):
+                one_at_a_time.record(player, score)
+            batched.record_many(players, scores)
+
+        assert batched.top(len(batched)) == one_at_a_time.top(len(one_at_a_time))
+        assert batched.record_many([], []) == 0
+        with pytest.raises(ValueError):
+            batched.record_many([1, 2], [3])
+
+    def test_save_and_load(self):
+        """Tests a loaded leaderboard has the same order and keeps ranking new scores, and other files are refused."""
+        leaderboard = Leaderboard(block_size=4)
+        for players, scores in synthetic_scores(500, 100, seed=4):
+            leaderboard.record_many(players, scores)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "leaderboard.bin")
+            leaderboard.save(path)
+            loaded = Leaderboard.load(path, block_size=4)
+            with open(path, "r+b") as file:
+                file.truncate(os.path.getsize(path) - 1)
+            with pytest.raises(ValueError):
+                Leaderboard.load(path)
+
+        assert loaded.top(len(loaded)) == leaderboard.top(len(leaderboard))
+        loaded.record(1000, 100)
+        assert loaded.rank(1000) == 1 and len(loaded) == len(leaderboard) + 1
+
+    def test_synthetic_scores_are_repeatable(self):
+        """Tests the same seed makes the same batches of possible scores."""
+        first = list(synthetic_scores(2500, 50, max_rounds=3, seed=5, batch_size=1000))
+        second = list(synthetic_scores(2500, 50, max_rounds=3, seed=5, batch_size=1000))
+
+        assert [len(players) for players, _ in first] == [1000, 1000, 500]
+        assert all(np.array_equal(a, c) and np.array_equal(b, d) for (a, b), (c, d) in zip(first, second))
+        assert all(abs(scores).max() <= 3 and players.max() < 50 for players, scores in first)
+
+    def test_session_records_final_scores(self):
+        """Tests a session records its final score and tells the player their rank before asking to replay."""
+        leaderboard = Leaderboard()
+        leaderboard.record(100, 5)
+        session = Session(max_rounds=1, session_id=7, leaderboard=leaderboard, player_id=70)
+        session.new_game()
+
+        lines = session.handle("h")
+
+        assert lines[1:] == [f"OVER {session.score}", "RANK 2 2", "REPLAY"]
+        assert leaderboard.score(70) == session.score
+
+    def test_players_say_who_they_are(self):
+        """Tests a session ranks final scores under the id the player gives with HELLO, so a returning player keeps their best."""
+        leaderboard = Leaderboard()
+        leaderboard.record(12, 100)
+        session = Session(max_rounds=1, session_id=0, leaderboard=leaderboard, player_id=leaderboard.new_player_id())
+
+        assert session.handle("HELLO -3")[0].startswith("ERROR")
+        assert session.handle("HELLO 12") == ["HELLO 12"]
+        lines = session.handle("h")
+
+        assert "RANK 1 1" in lines
+        assert leaderboard.score(12) == 100 and len(leaderboard) == 1
+
+    def test_new_player_ids_are_below_every_player(self):
+        """Tests anonymous players get negative ids below every player already ranked, so they never take over a saved player's scores."""
+        leaderboard = Leaderboard()
+        assert leaderboard.new_player_id() == -1
+        leaderboard.record(5, 1)
+        leaderboard.record(-4, 2)
+
+        assert leaderboard.new_player_id() == -5
+        assert Game(leaderboard=leaderboard).player_id == -5
+
+    @patch("sys.stdout", new_callable=io.StringIO)
+    @patch("builtins.input")
+    def test_game_records_final_scores(self, mock_input, mock_stdout):
+        """Tests a terminal game records the final score of each game it plays under its player id."""
+        mock_input.side_effect = ["h"] * 3 + ["y"] + ["l"] * 3 + ["n"]
+        leaderboard = Leaderboard()
+        game = Game(leaderboard=leaderboard, player_id=3)
+
+        game.new_game()
+
+        assert len(leaderboard) == 1 and leaderboard.score(3) >= game.score
+        assert mock_stdout.getvalue().count("Your best score ranks 1 of 1") == 2
+
+
+class TestLeaderboardServer(unittest.IsolatedAsyncioTestCase):
+    async def test_connections_without_an_id_are_new_players(self):
+        """Tests every connection that does not say who it is is ranked as a new player, after the players loaded from a saved leaderboard."""
+        leaderboard = Leaderboard()
+        leaderboard.record(-1, 3)
+        server = await start_server(port=0, max_rounds=1, leaderboard=leaderboard)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            for _ in range(2):
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                await reader.readline()
+                await reader.readline()
+                writer.write(b"h\nn\n")
+                await writer.drain()
+                while await reader.readline() != b"BYE\n":
+                    pass
+                writer.close()
+        finally:
+            server.close()
+            await server.wait_closed()
+
+        assert len(leaderboard) == 3
+        assert sorted(player for player, _ in leaderboard.top(3)) == [-3, -2, -1]
+
+
+if __name__ == "__main__":
+    unittest.main()
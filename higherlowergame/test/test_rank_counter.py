@@ -0,0 +1,66 @@
+import unittest
+
+import pytest
+
+from ..rank_counter import RankCounter
+
+
+class TestRankCounter(unittest.TestCase):
+    def test_count_below(self):
+        """Tests the count below a rank is the sum of the counts of every lower rank."""
+        counts = [3, 0, 5, 1, 7, 2, 4, 4, 0, 9, 1, 6, 2]
+        counter = RankCounter(counts)
+
+        for rank in range(len(counts) + 1):
+            assert counter.count_below(rank) == sum(counts[:rank])
+        assert counter.total == sum(counts)
+
+    def test_find(self):
+        """Tests finding each position gives the rank it falls in when the cards are sorted by rank."""
+        counts = [3, 0, 5, 1, 7, 2, 4, 4, 0, 9, 1, 6, 2]
+        counter = RankCounter(counts)
+        ranks = [rank for rank, count in enumerate(counts) for _ in range(count)]
+
+        assert [counter.find(position) for position in range(counter.total)] == ranks
+        with pytest.raises(IndexError):
+            counter.find(counter.total)
+
+    def test_add_and_remove(self):
+        """Tests adding and removing cards keeps the counts below each rank up to date."""
+        counter = RankCounter([4] * 13)
+
+        counter.remove(0)
+        counter.remove(5)
+        counter.add(12, 3)
+
+        assert counter.count(0) == 3
+        assert counter.count_below(6) == 4 * 6 - 2
+        assert counter.total == 52 - 2 + 3
+        assert counter.counts()[12] == 7
+
+    def test_remove_missing_rank(self):
+        """Tests removing a rank with no cards left raises a ValueError."""
+        counter = RankCounter([0, 1])
+
+        with pytest.raises(ValueError):
+            counter.remove(0)
+
+    def test_odds(self):
+        """Tests the odds of a higher, lower and matching rank."""
+        counter = RankCounter.from_ranks([0, 1, 1, 2, 3], 4)
+
+        assert counter.odds(1) == (0.4, 0.2, 0.4)
+        assert RankCounter([0, 0]).odds(1) == (0.0, 0.0, 0.0)
+
+    def test_many_ranks(self):
+        """Tests a counter with far more ranks than a standard deck."""
+        counter = RankCounter([1_000] * 10_000)
+
+        counter.remove(9_999)
+
+        assert counter.count_below(5_000) == 5_000_000
+        assert counter.total == 9_999_999
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+
+from ..loadtest import load_test, percentile
+from ..server import Session, start_server
+
+
+class TestSession(unittest.TestCase):
+    def test_new_game(self):
+        """Tests a new game resets the score and shows the first card."""
+        session = Session(max_rounds=2)
+        session.score = 5
+
+        lines = session.new_game()
+
+        assert session.score == 0
+        assert lines == ["START 2", f"CARD 1 {session.deck.current_card().card_name()}"]
+
+    def test_guess_scores_like_play_round(self):
+        """Tests a guess is scored by comparing the next card to the previous card."""
+        session = Session()
+        session.new_game()
+        first_card = session.deck.current_card()
+        next_card = session.deck.deck[1]
+
+        lines = session.handle("h")
+
+        points = next_card.compare_cards(first_card)
+        assert session.score == points
+        assert lines == [f"RESULT {next_card.card_name()} {points} {points}", f"CARD 2 {next_card.card_name()}"]
+
+    def test_invalid_guess(self):
+        """Tests anything but h or l is rejected without playing the round."""
+        session = Session()
+        session.new_game()
+
+        lines = session.handle("x")
+
+        assert lines[0].startswith("ERROR")
+        assert session.round == 0
+
+    def test_last_round_asks_to_replay(self):
+        """Tests the last round ends the game and asks if the player wants to play again."""
+        session = Session(max_rounds=1)
+        session.new_game()
+
+        lines = session.handle("l")
+
+        assert lines[1:] == [f"OVER {session.score}", "REPLAY"]
+        assert session.handle("?")[0].startswith("ERROR")
+        assert session.handle("y")[0] == "START 1"
+        session.handle("l")
+        assert session.handle("n") == ["BYE"]
+        assert session.finished
+
+
+class TestServer(unittest.IsolatedAsyncioTestCase):
+    async def test_load_test_against_local_server(self):
+        """Tests many clients can play games at once and the turn latency is reported."""
+        server = await start_server(port=0, max_rounds=3)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            report = await load_test(port=port, connections=50, games=2)
+        finally:
+            server.close()
+            await server.wait_closed()
+
+        assert report["connections"] == 50
+        assert report["turns"] == 50 * 2 * 3
+        assert 0 < report["p50_ms"] <= report["p99_ms"]
+
+    def test_percentile(self):
+        """Tests percentiles are taken from the sorted latencies."""
+        latencies = [float(value) for value in range(1, 101)]
+
+        assert percentile(latencies, 50) == 51.0
+        assert percentile(latencies, 99) == 99.0
+        assert percentile([], 99) == 0.0
+
+
+if __name__ == "__main__":
+    unittest.main()
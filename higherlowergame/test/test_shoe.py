@@ -0,0 +1,99 @@
+import unittest
+from collections import Counter
+
+import pytest
+
+from ..card import CARDS
+from ..deck import DeckExhausted
+from ..shoe import Shoe
+
+
+class TestShoe(unittest.TestCase):
+    def test_single_deck_deals_every_card_once(self):
+        """Tests a one deck shoe deals each of the 52 cards exactly once"""
+        shoe = Shoe()
+
+        cards = shoe.deck
+
+        assert len(cards) == 52
+        assert set(cards) == set(CARDS)
+
+    def test_multiple_decks_deal_each_card_per_deck(self):
+        """Tests a shoe of several decks deals each card once per deck"""
+        shoe = Shoe(decks=3)
+
+        counts = Counter(shoe.deck)
+
+        assert shoe.size == 156
+        assert set(counts.values()) == {3}
+
+    def test_move_and_previous_card(self):
+        """Tests moving to the next card keeps the dealt cards in place"""
+        shoe = Shoe(decks=2)
+        first = shoe.current_card()
+
+        shoe.move_to_next_card()
+
+        assert shoe.previous_card() is first
+        assert shoe.current_position == 1
+
+    def test_large_shoe_only_stores_dealt_cards(self):
+        """Tests dealing from a shoe of a million cards only stores the positions that were dealt"""
+        shoe = Shoe(decks=20_000)
+        for _ in range(100):
+            shoe.current_card()
+            shoe.move_to_next_card()
+
+        assert len(shoe._swapped) <= 2 * 101
+
+        shoe.reset_deck()
+        assert shoe.current_position == 0
+        assert len(shoe._swapped) == 0
+
+    def test_move_to_next_card_errors_on_last_card(self):
+        """Tests moving past the last card raises DeckExhausted when there is no cut card"""
+        shoe = Shoe()
+        shoe.current_position = 51
+
+        with pytest.raises(DeckExhausted) as error:
+            shoe.move_to_next_card()
+
+        assert "last card" in str(error.value)
+
+    def test_cut_card_reshuffles(self):
+        """Tests reaching the cut card reshuffles the shoe keeping the top card as the previous card"""
+        shoe = Shoe(cut_card=10)
+        shoe.current_position = 9
+        top = shoe.current_card()
+
+        shoe.move_to_next_card()
+
+        assert shoe.reshuffles == 1
+        assert shoe.current_position == 1
+        assert shoe.previous_card() is top
+        assert set(shoe.deck) == set(CARDS)
+
+    def test_remaining_ranks_follow_deals(self):
+        """Tests the count of the remaining values starts from the full shoe and is updated as cards are dealt"""
+        shoe = Shoe(decks=4)
+        assert shoe.remaining_ranks().total == 4 * 52 - 1
+
+        dealt = Counter([shoe.current_card().rank])
+        for _ in range(30):
+            shoe.move_to_next_card()
+            dealt[shoe.current_card().rank] += 1
+
+        counts = shoe.remaining_ranks().counts()
+        assert all(counts[rank - 1] == 16 - dealt[rank] for rank in range(1, 14))
+        assert abs(sum(shoe.odds()) - 1) < 1e-12
+
+    def test_invalid_shoes(self):
+        """Tests a shoe needs at least one deck and a cut card inside the shoe"""
+        with pytest.raises(ValueError):
+            Shoe(decks=0)
+        with pytest.raises(ValueError):
+            Shoe(cut_card=53)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+
+import numpy as np
+
+from ..simulation import ALL_CARDS, COMPARE_TABLE, ScoreDistribution, always_higher, card_counting, draw_cards, midpoint, play_games, simulate
+
+
+class TestSimulation(unittest.TestCase):
+    def test_compare_table_matches_compare_cards(self):
+        """Tests the compare table gives the same result as compare_cards for a higher, lower and matching pair."""
+        names = [card.card_name() for card in ALL_CARDS]
+        eight_clubs = names.index("8C")
+        six_hearts = names.index("6H")
+        eight_hearts = names.index("8H")
+
+        assert COMPARE_TABLE[eight_clubs, six_hearts] == 1
+        assert COMPARE_TABLE[six_hearts, eight_clubs] == -1
+        assert COMPARE_TABLE[eight_clubs, eight_hearts] == 0
+
+    def test_draw_cards_are_unique_per_game(self):
+        """Tests each game draws distinct cards from a single deck."""
+        cards = draw_cards(np.random.default_rng(0), 1000, 10)
+
+        assert cards.shape == (1000, 10)
+        assert all(len(set(row)) == 10 for row in cards.tolist())
+
+    def test_play_games_scores_like_play_round(self):
+        """Tests the vectorised scoring gives the same score as comparing each Card in turn."""
+        cards = draw_cards(np.random.default_rng(1), 500, 4)
+
+        scores = play_games(cards, midpoint)
+
+        for row, score in zip(cards.tolist(), scores.tolist()):
+            expected = 0
+            for previous, current in zip(row, row[1:]):
+                guess = 1 if ALL_CARDS[previous].card_value() <= 7 else -1
+                answer = ALL_CARDS[current].compare_cards(ALL_CARDS[previous])
+                if answer != 0:
+                    expected += 1 if answer == guess else -1
+            assert score == expected
+
+    def test_simulate_counts_every_game(self):
+        """Tests the score distribution covers every game played and every possible score."""
+        distribution = simulate(always_higher, max_rounds=3, games=25_000, seed=2, batch_size=10_000)
+
+        assert distribution.games() == 25_000
+        assert list(distribution.scores()) == [-3, -2, -1, 0, 1, 2, 3]
+
+    def test_simulate_is_reproducible(self):
+        """Tests the same seed always gives the same distribution."""
+        first = simulate(midpoint, games=10_000, seed=3)
+        second = simulate(midpoint, games=10_000, seed=3)
+
+        assert (first.counts == second.counts).all()
+
+    def test_midpoint_beats_always_higher(self):
+        """Tests guessing from the previous card scores better than always guessing higher."""
+        higher = simulate(always_higher, games=50_000, seed=4)
+        middle = simulate(midpoint, games=50_000, seed=4)
+
+        assert abs(higher.mean()) < 0.05
+        assert middle.mean() > 1
+
+    def test_score_distribution_mean_and_variance(self):
+        """Tests the mean and variance are calculated from the counts."""
+        distribution = ScoreDistribution(1, np.array([1, 0, 1]))
+
+        assert distribution.mean() == 0
+        assert distribution.variance() == 1
+
+    def test_confidence_interval(self):
+        """Tests the confidence interval is z standard errors either side of the mean."""
+        distribution = ScoreDistribution(1, np.array([50, 0, 50]))
+
+        low, high = distribution.confidence_interval(z=2)
+
+        assert abs(low + 0.2) < 1e-12
+        assert abs(high - 0.2) < 1e-12
+
+    def test_card_counting_uses_unseen_cards(self):
+        """Tests card counting guesses against the average of the cards not seen yet."""
+        names = [card.card_name() for card in ALL_CARDS]
+        kings = [names.index(f"K{suit}") for suit in "CDHS"]
+        queens = [names.index(f"Q{suit}") for suit in "CDHS"]
+        seven = names.index("7C")
+
+        assert card_counting(np.array([[seven]])).tolist() == [-1]
+        assert card_counting(np.array([kings + queens + [seven]])).tolist() == [-1]
+        assert card_counting(np.array([[names.index(f"A{suit}") for suit in "CDHS"] + [seven]])).tolist() == [1]
+
+    def test_simulate_rejects_too_many_rounds(self):
+        """Tests a game cannot have more rounds than the deck has cards to draw."""
+        with self.assertRaises(ValueError):
+            simulate(max_rounds=52)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from ..card import CARDS, Card
+from ..deck import Deck
+from ..simulation import draw_cards
+from ..solver import FULL_DECK_COUNTS, PolicyTable, Solver, best_guess, optimal_strategy, remove_card, save_table
+from ..state import GameState
+
+
+class TestSolver(unittest.TestCase):
+    def test_best_guess(self):
+        """Tests the best guess is whichever of higher or lower has more cards left."""
+        assert best_guess(3, FULL_DECK_COUNTS) == 1
+        assert best_guess(11, FULL_DECK_COUNTS) == -1
+        assert best_guess(7, FULL_DECK_COUNTS) == 1
+
+    def test_one_round_matches_counting_every_pair(self):
+        """Tests the expected score of a one round game matches scoring every ordered pair of first and second card."""
+        total = 0
+        pairs = 0
+        for first in Deck().deck:
+            guess = best_guess(first.rank, remove_card(FULL_DECK_COUNTS, first.rank))
+            for second in Deck().deck:
+                if second is not first:
+                    pairs += 1
+                    total += second.compare_cards(first) * guess
+
+        assert abs(Solver().game_value(1) - total / pairs) < 1e-12
+
+    def test_game_value_is_cached(self):
+        """Tests asking for the same position twice is served from the cache."""
+        solver = Solver()
+        first = solver.game_value(3)
+        misses = solver.cache_info().misses
+
+        assert solver.game_value(3) == first
+        assert solver.cache_info().misses == misses
+
+    def test_cache_is_bounded(self):
+        """Tests the cache never holds more positions than its size."""
+        solver = Solver(cache_size=10)
+        solver.game_value(3)
+
+        assert solver.cache_info().currsize <= 10
+
+    def test_best_guess_for_deck(self):
+        """Tests the best guess for a deck only counts the cards after the current position."""
+        deck = Deck()
+        seen = [card for card in deck.deck if card.value in ("J", "Q", "K")]
+        current = Card("Clubs", "7")
+        deck.deck = seen + [current] + [card for card in deck.deck if card not in seen and card is not current]
+        deck.current_position = len(seen)
+
+        assert best_guess(current.rank, FULL_DECK_COUNTS) == 1
+        assert Solver.best_guess_for_deck(deck) == -1
+
+    def test_optimal_strategy_matches_best_guess(self):
+        """Tests the vectorised strategy gives the same guess as best_guess for every game."""
+        cards = draw_cards(np.random.default_rng(5), 200, 6)
+
+        guesses = optimal_strategy(cards)
+
+        for row, guess in zip(cards.tolist(), guesses.tolist()):
+            counts = FULL_DECK_COUNTS
+            for index in row:
+                counts = remove_card(counts, CARDS[index].rank)
+            assert guess == best_guess(CARDS[row[-1]].rank, counts)
+
+    def test_saved_table_matches_solver(self):
+        """Tests a saved policy table gives the same guesses and expected scores as the solver."""
+        solver = Solver()
+        previous = 5
+        counts = remove_card(remove_card(FULL_DECK_COUNTS, 9), previous)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "policy.json")
+            save_table(path, max_rounds=3)
+            table = PolicyTable(path)
+
+        assert table.max_rounds == 3
+        assert table.best_guess(previous, counts, 2) == best_guess(previous, counts)
+        assert abs(table.expected_score(previous, counts, 2) - solver.expected_score(previous, counts, 2)) < 1e-12
+
+    def test_advise_a_game_in_play(self):
+        """Tests the solver and a saved table advise the guess best_guess_for_deck gives and the expected score of the rounds left."""
+        state = GameState(Deck(), max_rounds=3)
+        state.step(1)
+        counts = state.deck.remaining_ranks().counts()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "policy.json")
+            save_table(path, max_rounds=3)
+            table = PolicyTable(path)
+
+        guess, expected = Solver().advise(state)
+        assert guess == Solver.best_guess_for_deck(state.deck)
+        assert expected == Solver().expected_score(state.card().rank, counts, 2)
+        assert table.advise(state) == (guess, table.expected_score(state.card().rank, counts, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
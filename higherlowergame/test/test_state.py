@@ -0,0 +1,85 @@
+import io
+import random
+import unittest
+from unittest.mock import patch
+
+import pytest
+
+from ..card import Card
+from ..deck import Deck
+from ..game import Game
+from ..state import SNAPSHOT, GameOver, GameState
+
+
+class TestGameState(unittest.TestCase):
+    def test_step_scores_each_guess(self):
+        """Tests each step deals the next card and scores the guess, and guessing after the last round is refused."""
+        deck = Deck()
+        deck.deck = [Card("Clubs", "8"), Card("Hearts", "Q"), Card("Spades", "Q"), Card("Clubs", "2")] + deck.deck[4:]
+        state = GameState(deck, max_rounds=3)
+
+        outcomes = [state.step(guess) for guess in (1, 1, 1)]
+
+        assert [(outcome.answer, outcome.points, outcome.score) for outcome in outcomes] == [(1, 1, 1), (0, 0, 1), (-1, -1, 0)]
+        assert [outcome.card.name for outcome in outcomes] == ["QH", "QS", "2C"]
+        assert outcomes[1].previous_card.name == "QH"
+        assert state.over and state.card().name == "2C"
+        with pytest.raises(GameOver):
+            state.step(1)
+
+    def test_invalid_guess_does_not_change_the_state(self):
+        """Tests a guess other than higher or lower is refused before a card is dealt."""
+        state = GameState()
+
+        with pytest.raises(ValueError):
+            state.step(0)
+        assert state.deck.current_position == 0 and state.round == 0
+
+    def test_snapshot_restores_the_same_game(self):
+        """Tests a restored state has the same deck, position, score and round and plays on exactly as the original."""
+        state = GameState(Deck(random.Random(7)), max_rounds=10)
+        for _ in range(4):
+            state.step(1)
+        data = state.snapshot()
+
+        restored = GameState.restore(data)
+
+        assert len(data) == SNAPSHOT.size
+        assert restored.deck.order == state.deck.order
+        assert (restored.deck.current_position, restored.score, restored.round, restored.max_rounds) == (4, state.score, 4, 10)
+        assert [restored.step(-1) for _ in range(6)] == [state.step(-1) for _ in range(6)]
+
+    def test_load_reuses_the_deck(self):
+        """Tests loading a snapshot into an existing state replaces its game without a new deck, and bad snapshots are refused."""
+        saved = GameState(max_rounds=5)
+        saved.step(1)
+        state = GameState()
+        deck = state.deck
+
+        state.load(saved.snapshot())
+
+        assert state.deck is deck and state.card() is saved.card()
+        with pytest.raises(ValueError):
+            state.load(saved.snapshot()[:-1])
+        with pytest.raises(ValueError):
+            state.load(bytes(SNAPSHOT.size))
+
+
+class TestGameLoop(unittest.TestCase):
+    @patch("sys.stdout", new_callable=io.StringIO)
+    @patch("builtins.input")
+    def test_replays_without_recursion(self, mock_input, mock_stdout):
+        """Tests many games can be replayed in one call stack, each starting with no score, until the player answers n."""
+        games = 2000
+        mock_input.side_effect = (["h"] * 3 + ["y"]) * (games - 1) + ["h"] * 3 + ["maybe", "n"]
+        game = Game()
+
+        game.new_game()
+
+        assert mock_stdout.getvalue().count("Game Over") == games
+        assert "Please only answer with 'y' or 'n'" in mock_stdout.getvalue()
+        assert -3 <= game.score <= 3
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+import numpy as np
+
+from ..deck import Deck
+from ..shoe import Shoe
+from ..streams import deck_rng, shuffled_decks, spawn_generators, spawn_seeds
+
+
+class TestStreams(unittest.TestCase):
+    def test_spawned_seeds_are_reproducible_and_independent(self):
+        """Tests the same root seed always spawns the same worker streams and each worker's stream differs."""
+        first = [rng.integers(0, 2**32, size=4).tolist() for rng in spawn_generators(42, 3)]
+        second = [rng.integers(0, 2**32, size=4).tolist() for rng in spawn_generators(42, 3)]
+
+        assert first == second
+        assert len({tuple(stream) for stream in first}) == 3
+
+    def test_spawned_seeds_do_not_depend_on_count(self):
+        """Tests a worker's stream is the same however many workers are spawned."""
+        few = spawn_seeds(7, 2)
+        many = spawn_seeds(7, 8)
+
+        assert (few[1].generate_state(4) == many[1].generate_state(4)).all()
+
+    def test_shuffled_decks(self):
+        """Tests every batched deck is a shuffle of the 52 card indices."""
+        decks = shuffled_decks(1000, np.random.default_rng(0))
+
+        assert decks.shape == (1000, 52)
+        assert decks.dtype == np.uint8
+        assert (np.sort(decks, axis=1) == np.arange(52)).all()
+        assert len({row.tobytes() for row in decks}) == 1000
+
+    def test_shuffled_decks_are_reproducible(self):
+        """Tests the same generator seed gives the same batch of decks."""
+        assert (shuffled_decks(10, np.random.default_rng(1)) == shuffled_decks(10, np.random.default_rng(1))).all()
+
+    def test_deck_with_explicit_generator(self):
+        """Tests decks shuffled by generators with the same seed have the same order."""
+        assert Deck(deck_rng(3)).order == Deck(deck_rng(3)).order
+        assert Shoe(decks=2, rng=deck_rng(3)).deck == Shoe(decks=2, rng=deck_rng(3)).deck
+
+    def test_deck_from_order(self):
+        """Tests a deck can be made from a row of a batch of shuffled decks."""
+        row = shuffled_decks(1, np.random.default_rng(2))[0]
+
+        deck = Deck.from_order(row)
+
+        assert list(deck.order) == row.tolist()
+        assert deck.current_position == 0
+
+
+if __name__ == "__main__":
+    unittest.main()
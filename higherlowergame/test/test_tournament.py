@@ -0,0 +1,29 @@
+import unittest
+
+from ..tournament import STRATEGIES, run_tournament
+
+
+class TestTournament(unittest.TestCase):
+    def test_every_strategy_plays_every_game(self):
+        """Tests each strategy's histogram covers all of its games."""
+        results = run_tournament(games=10_001, shards=4, workers=2)
+
+        assert set(results) == set(STRATEGIES)
+        assert all(distribution.games() == 10_001 for distribution in results.values())
+
+    def test_results_do_not_depend_on_workers(self):
+        """Tests the same root seed gives the same histograms whatever the number of processes."""
+        one = run_tournament(["midpoint"], games=5_000, seed=9, shards=4, workers=1)
+        two = run_tournament(["midpoint"], games=5_000, seed=9, shards=4, workers=2)
+
+        assert (one["midpoint"].counts == two["midpoint"].counts).all()
+
+    def test_optimal_beats_always_higher(self):
+        """Tests the strategies are ranked as expected."""
+        results = run_tournament(["always-higher", "optimal"], games=20_000, shards=2, workers=2)
+
+        assert results["optimal"].confidence_interval()[0] > results["always-higher"].confidence_interval()[1]
+
+
+if __name__ == "__main__":
+    unittest.main()
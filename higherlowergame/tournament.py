@@ -0,0 +1,107 @@
+"""
+    Strategy tournament
+
+    Ranks guessing strategies by playing a very large number of games with each one across a pool of processes.
+    The games for each strategy are split into shards, every shard writes its histogram of final scores straight into
+    a shared memory block so no per-game results are sent back between processes.
+    Each shard's seed is spawned from one root seed, so results are the same whatever the number of processes.
+    To Run: `python -m higherlowergame.tournament --games 10000000`
+"""
+from __future__ import annotations
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Optional, Sequence
+
+import numpy as np
+
+from .simulation import ScoreDistribution, always_higher, card_counting, midpoint, simulate
+from .solver import optimal_strategy
+from .streams import Seed, spawn_seeds
+
+STRATEGIES = {
+    "always-higher": always_higher,
+    "midpoint": midpoint,
+    "card-counting": card_counting,
+    "optimal": optimal_strategy,
+}
+
+
+def play_shard(shared_name: str, shape: tuple, strategy_number: int, shard_number: int, strategy_name: str, max_rounds: int, games: int, seed: np.random.SeedSequence) -> None:
+    """Plays one shard of games in a worker process and writes the score histogram into its row of the shared block."""
+    shared = shared_memory.SharedMemory(name=shared_name)
+    try:
+        histograms = np.ndarray(shape, dtype=np.int64, buffer=shared.buf)
+        distribution = simulate(STRATEGIES[strategy_name], max_rounds, games, seed)
+        histograms[strategy_number, shard_number] = distribution.counts
+        del histograms
+    finally:
+        shared.close()
+
+
+def run_tournament(strategies: Sequence[str] = tuple(STRATEGIES), games: int = 1_000_000, max_rounds: int = 3, seed: Seed = 0, shards: int = 32, workers: Optional[int] = None) -> dict[str, ScoreDistribution]:
+    """
+    Plays the same number of games with each strategy across a pool of processes.
+
+    Parameters
+    ----------
+    strategies (Sequence[str]): The names of the strategies in STRATEGIES to play
+    games (int): How many games to play with each strategy
+    max_rounds (int): How many rounds a game consists of
+    seed (Seed): The root seed every shard's seed is spawned from
+    shards (int): How many pieces each strategy's games are split into
+    workers (int): How many processes to use, one per core if not given
+
+    Returns
+    -------
+    results (dict[str, ScoreDistribution]): The distribution of final scores for each strategy
+    """
+    shape = (len(strategies), shards, 2 * max_rounds + 1)
+    shard_seeds = spawn_seeds(seed, len(strategies) * shards)
+    shared = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * np.dtype(np.int64).itemsize)
+    try:
+        histograms = np.ndarray(shape, dtype=np.int64, buffer=shared.buf)
+        histograms[:] = 0
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            jobs = [
+                pool.submit(
+                    play_shard, shared.name, shape, strategy_number, shard_number, strategy_name, max_rounds,
+                    games // shards + (shard_number < games % shards), shard_seeds[strategy_number * shards + shard_number],
+                )
+                for strategy_number, strategy_name in enumerate(strategies)
+                for shard_number in range(shards)
+            ]
+            for job in jobs:
+                job.result()
+
+        results = {
+            strategy_name: ScoreDistribution(max_rounds, histograms[strategy_number].sum(axis=0))
+            for strategy_number, strategy_name in enumerate(strategies)
+        }
+        del histograms
+    finally:
+        shared.close()
+        shared.unlink()
+    return results
+
+
+def main() -> None:
+    """Runs a tournament between every strategy and prints them ranked by mean final score."""
+    parser = argparse.ArgumentParser(description="Rank Higher/Lower guessing strategies.")
+    parser.add_argument("--games", type=int, default=1_000_000, help="games to play with each strategy")
+    parser.add_argument("--rounds", type=int, default=3, help="rounds in each game")
+    parser.add_argument("--seed", type=int, default=0, help="root seed of every random number stream")
+    parser.add_argument("--workers", type=int, default=None, help="processes to use, one per core if not given")
+    args = parser.parse_args()
+
+    results = run_tournament(games=args.games, max_rounds=args.rounds, seed=args.seed, workers=args.workers)
+    print(f"{'strategy':<15}{'mean':>10}{'variance':>10}{'95% interval':>24}")
+    for name, distribution in sorted(results.items(), key=lambda item: item[1].mean(), reverse=True):
+        low, high = distribution.confidence_interval()
+        print(f"{name:<15}{distribution.mean():>10.4f}{distribution.variance():>10.4f}{f'{low:.4f} to {high:.4f}':>24}")
+
+
+if __name__ == "__main__":
+    main()
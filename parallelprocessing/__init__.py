@@ -0,0 +1,5 @@
+"""
+    Parallel report downloader
+
+    This module downloads traffic reports from the Highways England WebTRIS API using asyncio to make many requests at once.
+"""
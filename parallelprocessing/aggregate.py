@@ -0,0 +1,240 @@
+"""
+    Report aggregation
+
+    Summarises the downloaded rows of each site by day and by month: the total flow of vehicles, their mean speed and speed percentiles.
+    Each partition is parsed straight into NumPy columns and reduced to a row count, a total flow and a histogram of speeds weighted by
+    the vehicles counted at each speed, which is kept in a SQLite database with the size and modification time of the partition.
+    Only partitions that are new or have changed since the last run are loaded again, and daily and monthly summaries are worked out
+    from the stored histograms by grouping them with NumPy, so percentiles over a month are exact without reading its rows.
+    To Run: `python -m parallelprocessing.aggregate --output reports --monthly`
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from .output import read_lines
+from .report_stream import MISSING
+
+SPEED_BINS = 256 # speeds are whole miles per hour, anything faster is counted in the last bin
+PERCENTILES = (50, 85, 95)
+
+# the numbers of each stored row in the order RowBatch.to_ndjson writes them
+COLUMNS = {"timestamp": np.int64, "interval": np.int32, "avg_mph": np.int32, "total_volume": np.int64}
+MISSING_TEXT = str(MISSING).encode()
+NUMBERS_ONLY = bytes(byte if byte in b"0123456789-" else ord(" ") for byte in range(256))
+
+
+class Summary(NamedTuple):
+    """The traffic at a site over a day (yyyy-mm-dd) or month (yyyy-mm), speeds are None when no vehicles were counted with a speed."""
+    site: str
+    period: str
+    rows: int
+    total_flow: int
+    mean_mph: Optional[float]
+    p50_mph: Optional[int]
+    p85_mph: Optional[int]
+    p95_mph: Optional[int]
+
+
+def load_columns(path: str) -> dict[str, np.ndarray]:
+    """
+    Returns the timestamp, interval, avg_mph and total_volume columns of a partition file, with MISSING for blank values.
+    Pages written again after a crash are only counted once.
+
+    The rows are the fixed shape RowBatch.to_ndjson writes, so rather than decoding each line the site is cut from every line,
+    blanks become MISSING, everything but the numbers becomes spaces and NumPy reads the four numbers of each row in one pass.
+
+    Raises
+    ------
+    ValueError: if a row is not in the shape RowBatch.to_ndjson writes
+    """
+    data = read_lines(path)
+    rows = data.count(b"\n")
+    if rows:
+        # a partition holds one site, so every line starts with the same site field
+        data = data.replace(data[:data.index(b'"timestamp"')], b"")
+    values = np.fromstring(data.replace(b"null", MISSING_TEXT).translate(NUMBERS_ONLY), dtype=np.int64, sep=" ") if rows else np.empty(0, np.int64)
+    if len(values) != rows * len(COLUMNS):
+        raise ValueError(f"{path} has rows that are not in the shape the downloader writes")
+    values = values.reshape(rows, len(COLUMNS))
+    return {name: values[:, number].astype(dtype) for number, (name, dtype) in enumerate(COLUMNS.items())}
+
+
+def summarise_columns(columns: dict[str, np.ndarray]) -> tuple[int, int, np.ndarray]:
+    """
+    Returns the rows, the total flow and the vehicle weighted speed histogram of a partition's columns.
+    A period stored more than once, as when a download is run again after a crash, is counted once using the row stored last.
+    """
+    # the first of each timestamp in the reversed columns is the last one stored
+    _, last = np.unique(columns["timestamp"][::-1], return_index=True)
+    speed = columns["avg_mph"][::-1][last]
+    volume = columns["total_volume"][::-1][last]
+    counted = volume != MISSING
+    with_speed = counted & (speed != MISSING)
+    histogram = np.bincount(np.clip(speed[with_speed], 0, SPEED_BINS - 1), weights=volume[with_speed], minlength=SPEED_BINS)
+    return len(last), int(volume[counted].sum()), histogram.astype(np.int64)
+
+
+def speed_statistics(histograms: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the mean speed and the PERCENTILES speeds of each row of a 2d array of speed histograms.
+    Rows without any vehicles have a mean of nan and percentiles of -1.
+    """
+    totals = histograms.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = histograms @ np.arange(histograms.shape[1]) / totals
+    cumulative = np.cumsum(histograms, axis=1)
+    targets = totals[:, None] * (np.array(PERCENTILES) / 100)
+    # the first speed at which the running count of vehicles reaches each share of the total
+    percentiles = np.stack([np.argmax(cumulative >= targets[:, [column]], axis=1) for column in range(len(PERCENTILES))], axis=1)
+    percentiles[totals == 0] = -1
+    return means, percentiles
+
+
+def find_partitions(directory: str) -> dict[tuple[str, str], str]:
+    """Returns the path of every partition file under the output directory by its (site, yyyy-mm-dd date)."""
+    partitions = {}
+    if not os.path.isdir(directory):
+        return partitions
+    for site_entry in os.scandir(directory):
+        if not (site_entry.is_dir() and site_entry.name.startswith("site=")):
+            continue
+        for date_entry in os.scandir(site_entry.path):
+            if not (date_entry.is_dir() and date_entry.name.startswith("date=")):
+                continue
+            for name in ("rows.ndjson.gz", "rows.ndjson"):
+                path = os.path.join(date_entry.path, name)
+                if os.path.exists(path):
+                    partitions[(site_entry.name[len("site="):], date_entry.name[len("date="):])] = path
+    return partitions
+
+
+class SummaryStore:
+    """
+    A class to keep the summary of every stored partition up to date and group them by day or month
+
+    Attributes
+    ----------
+    path : str
+        The path of the SQLite database
+
+    Methods
+    -------
+    update(directory):
+        Summarises the partitions that are new or changed since the last update and forgets removed ones.
+    summaries(period, site):
+        Returns the daily or monthly summary of each site.
+    close():
+        Closes the database.
+    """
+    def __init__(self, path: str = "summaries.sqlite") -> None:
+        """Opens the database, creating it if it does not exist."""
+        self.path = path
+        self._connection = sqlite3.connect(path, timeout=30)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS partitions (site TEXT, date TEXT, modified INTEGER, size INTEGER, rows INTEGER, total_flow INTEGER, "
+            "speeds BLOB, PRIMARY KEY (site, date)) WITHOUT ROWID"
+        )
+        self._connection.commit()
+
+    def update(self, directory: str) -> int:
+        """
+        Summarises the partitions under the output directory that are new or whose size or modification time has changed,
+        and forgets partitions that no longer exist.
+
+        Returns
+        -------
+        updated (int): How many partitions were summarised
+        """
+        known = {(site, date): (modified, size) for site, date, modified, size in self._connection.execute("SELECT site, date, modified, size FROM partitions")}
+        partitions = find_partitions(directory)
+        updated = 0
+        with self._connection:
+            for (site, date), path in sorted(partitions.items()):
+                status = os.stat(path)
+                if known.get((site, date)) == (status.st_mtime_ns, status.st_size):
+                    continue
+                rows, total_flow, speeds = summarise_columns(load_columns(path))
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO partitions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (site, date, status.st_mtime_ns, status.st_size, rows, total_flow, speeds.tobytes()),
+                )
+                updated += 1
+            self._connection.executemany("DELETE FROM partitions WHERE site = ? AND date = ?", [day for day in known if day not in partitions])
+        return updated
+
+    def summaries(self, period: str = "day", site: Optional[str] = None) -> list[Summary]:
+        """
+        Returns the summary of each site for each day or month, in order of site and period.
+
+        Parameters
+        ----------
+        period (str): "day" or "month"
+        site (str): Only summarise this site if given
+
+        Raises
+        ------
+        ValueError: if the period is not day or month
+        """
+        if period not in ("day", "month"):
+            raise ValueError(f"The period must be day or month, not {period}")
+        query = "SELECT site, date, rows, total_flow, speeds FROM partitions"
+        stored = self._connection.execute(query + " WHERE site = ?", (site,)).fetchall() if site is not None else self._connection.execute(query).fetchall()
+        if not stored:
+            return []
+        sites, dates, rows, flows, speeds = zip(*stored)
+        periods = np.array(dates) if period == "day" else np.array([date[:7] for date in dates])
+        keys, groups = np.unique(np.char.add(np.char.add(np.array(sites), "|"), periods), return_inverse=True)
+
+        group_rows = np.zeros(len(keys), np.int64)
+        group_flows = np.zeros(len(keys), np.int64)
+        histograms = np.zeros((len(keys), SPEED_BINS), np.int64)
+        np.add.at(group_rows, groups, np.array(rows, np.int64))
+        np.add.at(group_flows, groups, np.array(flows, np.int64))
+        np.add.at(histograms, groups, np.frombuffer(b"".join(speeds), np.int64).reshape(-1, SPEED_BINS))
+        means, percentiles = speed_statistics(histograms)
+
+        summaries = []
+        for key, count, flow, mean, speed_percentiles in zip(keys, group_rows, group_flows, means, percentiles):
+            key_site, key_period = str(key).split("|", 1)
+            speeds_known = speed_percentiles[0] >= 0
+            summaries.append(Summary(
+                key_site, key_period, int(count), int(flow), float(mean) if speeds_known else None,
+                *(int(speed) if speeds_known else None for speed in speed_percentiles),
+            ))
+        return summaries
+
+    def close(self) -> None:
+        """Closes the database."""
+        self._connection.close()
+
+    def __enter__(self) -> SummaryStore:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def main() -> None:
+    """Updates the summaries of the stored reports and prints them."""
+    parser = argparse.ArgumentParser(description="Summarise downloaded WebTRIS reports by site and day or month.")
+    parser.add_argument("--output", default="reports", help="the directory the reports were downloaded to")
+    parser.add_argument("--summaries", default="summaries.sqlite", help="the database the summaries are kept in")
+    parser.add_argument("--monthly", action="store_true", help="summarise by month rather than by day")
+    parser.add_argument("--site", default=None, help="only print this site")
+    args = parser.parse_args()
+
+    with SummaryStore(args.summaries) as store:
+        print(f"Summarised {store.update(args.output)} new or changed partitions")
+        print("site\tperiod\trows\ttotal_flow\tmean_mph\tp50_mph\tp85_mph\tp95_mph")
+        for summary in store.summaries("month" if args.monthly else "day", args.site):
+            print("\t".join("" if value is None else f"{value:.1f}" if isinstance(value, float) else str(value) for value in summary))
+
+
+if __name__ == "__main__":
+    main()
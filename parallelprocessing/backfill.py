@@ -0,0 +1,203 @@
+"""
+    Sharded report backfill
+
+    Downloads the reports of many sites over many date ranges, splitting the (site, day) reports between a pool of processes
+    so parsing and compressing rows is spread over every core. Each process runs its own event loop and connection pool.
+    Every day belongs to exactly one shard, so the shards write separate partitions of the same output directory, which is
+    the merged output, and share the checkpoint and cache databases. Each shard sends its progress to the parent process,
+    which prints the combined totals.
+    To Run: `python -m parallelprocessing.backfill --sites 2 5 --dates 2021-08 2021-10-01:2021-10-15`
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Callable, NamedTuple, Optional, Sequence
+
+from .connection import ConnectorSettings, add_connection_arguments, connection_settings
+from .parallel_processing import REPORT_API, RetryPolicy, WorkUnit, download
+from .report_stream import Report
+
+
+class BackfillSettings(NamedTuple):
+    """
+    How every shard downloads its days, requests_per_second is shared between the shards.
+    The checkpoint can be the downloader's own, its pages are kept apart from those of the downloader's smaller default page size.
+    """
+    report_api: str = REPORT_API
+    output: str = "reports"
+    max_concurrent: int = 10
+    requests_per_second: Optional[float] = None
+    checkpoint: Optional[str] = "checkpoint.sqlite"
+    page_size: int = 1000
+    cache: Optional[str] = "http_cache"
+    retry: RetryPolicy = RetryPolicy()
+    connection: ConnectorSettings = ConnectorSettings()
+
+
+class ShardResult(NamedTuple):
+    """What one shard downloaded."""
+    shard: int
+    days: int
+    pages: int
+    rows: int
+    cache_hits: int
+    cache_revalidated: int
+    cache_misses: int
+
+
+def parse_date_range(text: str) -> list[date]:
+    """
+    Returns every day of a date range given as a month (2021-08), a day (2021-08-01) or two days joined by a colon (2021-08-01:2021-08-15).
+
+    Raises
+    ------
+    ValueError: if the range is not in one of those forms or ends before it starts
+    """
+    if ":" in text:
+        first_text, last_text = text.split(":", 1)
+        first = datetime.strptime(first_text, "%Y-%m-%d").date()
+        last = datetime.strptime(last_text, "%Y-%m-%d").date()
+    elif text.count("-") == 1:
+        first = datetime.strptime(text, "%Y-%m").date()
+        last = (first.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    else:
+        first = last = datetime.strptime(text, "%Y-%m-%d").date()
+    if last < first:
+        raise ValueError(f"The date range {text} ends before it starts")
+    return [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
+
+
+def backfill_days(sites: Sequence[str], ranges: Sequence[str]) -> list[tuple[str, str]]:
+    """Returns every (site, date) day to download, with the date as ddmmyyyy, once each in order."""
+    dates = []
+    for text in ranges:
+        dates.extend(parse_date_range(text))
+    dates = sorted(set(dates))
+    return [(site, day.strftime("%d%m%Y")) for site in dict.fromkeys(sites) for day in dates]
+
+
+def shard_days(days: Sequence[tuple[str, str]], shards: int) -> list[list[tuple[str, str]]]:
+    """Splits the days between at most shards shards, dealing them out in turn so every shard gets a similar mix of sites and dates."""
+    return [list(days[shard::shards]) for shard in range(min(shards, len(days)))]
+
+
+def run_shard(shard: int, days: list[tuple[str, str]], settings: BackfillSettings, progress, progress_interval: float = 1.0) -> ShardResult:
+    """
+    Downloads one shard's days in a worker process with its own event loop, putting (shard, pages, rows) on the progress queue as it goes.
+
+    Parameters
+    ----------
+    shard (int): The number of the shard
+    days (list[tuple[str, str]]): The (site, date) days to download
+    settings (BackfillSettings): How to download them, requests_per_second is already this shard's share
+    progress: A queue shared with the parent process
+    progress_interval (float): The fewest seconds between progress updates
+
+    Returns
+    -------
+    result (ShardResult): What the shard downloaded
+    """
+    counts = {"pages": 0, "rows": 0, "sent": time.monotonic()}
+
+    def on_page(unit: WorkUnit, report: Optional[Report]) -> None:
+        counts["pages"] += 1
+        counts["rows"] += report.rows if report is not None else 0
+        if time.monotonic() - counts["sent"] >= progress_interval:
+            progress.put((shard, counts["pages"], counts["rows"]))
+            counts["sent"] = time.monotonic()
+
+    summary = asyncio.run(download(
+        days, settings.report_api, settings.output, settings.max_concurrent, settings.requests_per_second,
+        settings.checkpoint, settings.retry, settings.page_size, settings.cache, on_page, settings.connection,
+    ))
+    progress.put((shard, summary.pages, summary.rows))
+    return ShardResult(shard, len(days), summary.pages, summary.rows, summary.cache_hits, summary.cache_revalidated, summary.cache_misses)
+
+
+def backfill(sites: Sequence[str], ranges: Sequence[str], processes: Optional[int] = None, settings: BackfillSettings = BackfillSettings(), progress_interval: float = 1.0, report: Callable[[str], None] = print) -> list[ShardResult]:
+    """
+    Downloads the reports of every site over every date range across a pool of processes.
+
+    Parameters
+    ----------
+    sites (Sequence[str]): The site ids
+    ranges (Sequence[str]): The date ranges, see parse_date_range
+    processes (int): How many processes to use, one per core if not given
+    settings (BackfillSettings): How every shard downloads its days
+    progress_interval (float): The fewest seconds between progress lines
+    report (Callable[[str], None]): Called with each progress line
+
+    Returns
+    -------
+    results (list[ShardResult]): What each shard downloaded
+    """
+    days = backfill_days(sites, ranges)
+    shards = shard_days(days, processes or os.cpu_count() or 1)
+    if not shards:
+        return []
+    if settings.requests_per_second:
+        settings = settings._replace(requests_per_second=settings.requests_per_second / len(shards))
+    report(f"Backfilling {len(days)} days of reports for {len(set(sites))} sites in {len(shards)} processes to {settings.output}")
+
+    # spawned workers start clean rather than copying the parent's event loop and threads
+    context = multiprocessing.get_context("spawn")
+    totals = {}
+    with context.Manager() as manager, ProcessPoolExecutor(len(shards), mp_context=context) as pool:
+        progress = manager.Queue()
+        futures = [pool.submit(run_shard, number, shard, settings, progress, progress_interval) for number, shard in enumerate(shards)]
+        while not all(future.done() for future in futures):
+            try:
+                shard, pages, rows = progress.get(timeout=progress_interval)
+                totals[shard] = (pages, rows)
+            except queue.Empty:
+                continue
+            finished = sum(future.done() for future in futures)
+            report(f"Progress: {sum(pages for pages, _ in totals.values())} pages, {sum(rows for _, rows in totals.values())} rows, {finished}/{len(shards)} shards done")
+        results = [future.result() for future in futures]
+
+    report(f"Backfill complete: {sum(result.pages for result in results)} pages, {sum(result.rows for result in results)} rows, "
+           f"cache hits: {sum(result.cache_hits for result in results)}, revalidated: {sum(result.cache_revalidated for result in results)}, "
+           f"misses: {sum(result.cache_misses for result in results)}")
+    return results
+
+
+def main() -> None:
+    """Backfills the reports of the given sites and date ranges."""
+    parser = argparse.ArgumentParser(description="Download WebTRIS reports for many sites and date ranges across processes.")
+    parser.add_argument("--sites", nargs="+", required=True, help="the site ids to download")
+    parser.add_argument("--dates", nargs="+", required=True, help="date ranges as 2021-08, 2021-08-01 or 2021-08-01:2021-08-15")
+    parser.add_argument("--processes", type=int, default=None, help="processes to use, one per core if not given")
+    parser.add_argument("--output", default="reports", help="the directory to write the partitioned rows to")
+    parser.add_argument("--report-api", default=REPORT_API, help="the report url template, such as the mock server's")
+    parser.add_argument("--max-concurrent", type=int, default=10, help="the most requests in flight in each process")
+    parser.add_argument("--requests-per-second", type=float, default=None, help="the most requests started per second across every process")
+    parser.add_argument("--page-size", type=int, default=1000, help="rows requested in each page")
+    parser.add_argument("--checkpoint", default="checkpoint.sqlite", help="the checkpoint database")
+    parser.add_argument("--no-checkpoint", action="store_true", help="download every page without a checkpoint")
+    parser.add_argument("--cache", default="http_cache", help="the response cache directory")
+    parser.add_argument("--no-cache", action="store_true", help="do not cache responses")
+    add_connection_arguments(parser)
+    args = parser.parse_args()
+
+    settings = BackfillSettings(
+        report_api=args.report_api,
+        output=args.output,
+        max_concurrent=args.max_concurrent,
+        requests_per_second=args.requests_per_second,
+        checkpoint=None if args.no_checkpoint else args.checkpoint,
+        page_size=args.page_size,
+        cache=None if args.no_cache else args.cache,
+        connection=connection_settings(args),
+    )
+    backfill(args.sites, args.dates, args.processes, settings)
+
+
+if __name__ == "__main__":
+    main()
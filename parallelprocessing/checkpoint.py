@@ -0,0 +1,122 @@
+"""
+    Download checkpoint manifest
+
+    Records every (site, date, page) that has been downloaded and stored in a SQLite database,
+    so a download that is interrupted can be run again and skip the pages it already has.
+    The last page of each day's report is recorded once it is known, so a re-run knows which pages exist without asking again.
+    Page numbers only mean something for one page size, so every page is recorded with the page size it was requested with
+    and a checkpoint only sees the pages of its own page size.
+"""
+from __future__ import annotations
+
+import sqlite3
+from typing import Iterable, Optional
+
+
+class Checkpoint:
+    """
+    A class to record which work units have been completed
+
+    Attributes
+    ----------
+    path : str
+        The path of the SQLite database
+    page_size : int
+        How many rows each recorded page holds
+
+    Methods
+    -------
+    is_complete(site, date, page):
+        Returns whether a page has been completed.
+    mark_complete(site, date, page):
+        Records that a page has been completed.
+    mark_all_complete(units):
+        Records that many pages have been completed.
+    remaining(units):
+        Returns the work units that have not been completed.
+    completed_pages(site, date):
+        Returns the pages of a day that have been completed.
+    last_page(site, date):
+        Returns the last page of a day's report if it is known.
+    mark_last_page(site, date, page):
+        Records the last page of a day's report.
+    close():
+        Closes the database.
+    """
+    def __init__(self, path: str, page_size: int = 10) -> None:
+        """
+        Opens the database, creating it if it does not exist, to record pages of page_size rows.
+
+        Raises
+        ------
+        ValueError: if the database was written before pages were recorded with their page size
+        """
+        self.path = path
+        self.page_size = page_size
+        self._connection = sqlite3.connect(path, timeout=30)
+        columns = {column for _, column, *_ in self._connection.execute("PRAGMA table_info(completed)")}
+        if columns and "page_size" not in columns:
+            self._connection.close()
+            raise ValueError(f"{path} does not record the page size of its pages, remove it to start the download again")
+        # WAL keeps each commit cheap while still surviving the process being killed
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS completed (site TEXT, date TEXT, page_size INTEGER, page INTEGER, "
+            "PRIMARY KEY (site, date, page_size, page)) WITHOUT ROWID"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS last_pages (site TEXT, date TEXT, page_size INTEGER, page INTEGER, "
+            "PRIMARY KEY (site, date, page_size)) WITHOUT ROWID"
+        )
+        self._connection.commit()
+
+    def is_complete(self, site: str, date: str, page: int) -> bool:
+        """Returns whether a page has been completed."""
+        row = self._connection.execute(
+            "SELECT 1 FROM completed WHERE site = ? AND date = ? AND page_size = ? AND page = ?", (site, date, self.page_size, page)
+        ).fetchone()
+        return row is not None
+
+    def mark_complete(self, site: str, date: str, page: int) -> None:
+        """Records that a page has been completed."""
+        self._connection.execute("INSERT OR IGNORE INTO completed VALUES (?, ?, ?, ?)", (site, date, self.page_size, page))
+        self._connection.commit()
+
+    def mark_all_complete(self, units: Iterable[tuple]) -> None:
+        """Records that many pages, (site, date, page) tuples, have been completed in one transaction."""
+        self._connection.executemany("INSERT OR IGNORE INTO completed VALUES (?, ?, ?, ?)", [(site, date, self.page_size, page) for site, date, page in units])
+        self._connection.commit()
+
+    def remaining(self, units: Iterable[tuple]) -> list:
+        """Returns the work units, (site, date, page) tuples, that have not been completed in their original order."""
+        completed = set(self._connection.execute("SELECT site, date, page FROM completed WHERE page_size = ?", (self.page_size,)))
+        return [unit for unit in units if tuple(unit) not in completed]
+
+    def completed_pages(self, site: str, date: str) -> set[int]:
+        """Returns the pages of a day that have been completed."""
+        return {page for page, in self._connection.execute(
+            "SELECT page FROM completed WHERE site = ? AND date = ? AND page_size = ?", (site, date, self.page_size)
+        )}
+
+    def last_page(self, site: str, date: str) -> Optional[int]:
+        """Returns the last page of a day's report, 0 if the day has no pages, or None if it is not known yet."""
+        row = self._connection.execute(
+            "SELECT page FROM last_pages WHERE site = ? AND date = ? AND page_size = ?", (site, date, self.page_size)
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def mark_last_page(self, site: str, date: str, page: int) -> None:
+        """Records the last page of a day's report."""
+        self._connection.execute("INSERT OR REPLACE INTO last_pages VALUES (?, ?, ?, ?)", (site, date, self.page_size, page))
+        self._connection.commit()
+
+    def close(self) -> None:
+        """Closes the database."""
+        self._connection.close()
+
+    def __enter__(self) -> Checkpoint:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
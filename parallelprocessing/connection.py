@@ -0,0 +1,90 @@
+"""
+    Connection pool settings for report downloads
+
+    Every process downloading reports opens one ClientSession whose connector keeps connections alive between requests,
+    caches DNS lookups and caps the connections open to each host. The settings can be set from code or the command line.
+"""
+from __future__ import annotations
+
+import argparse
+from typing import NamedTuple, Optional
+
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+
+
+class ConnectorSettings(NamedTuple):
+    """
+    How a session connects to the report api
+
+    Attributes
+    ----------
+    limit : int
+        The most connections open at once, 0 for no limit
+    limit_per_host : int
+        The most connections open to one host at once, 0 for no limit
+    keepalive_timeout : float
+        Seconds an idle connection is kept open to be reused
+    dns_cache_ttl : int | None
+        Seconds a DNS lookup is reused, None to cache lookups forever
+    use_dns_cache : bool
+        Whether DNS lookups are cached at all
+    total_timeout : float | None
+        Seconds a whole request, including reading the body, may take
+    connect_timeout : float | None
+        Seconds to wait for a connection from the pool, including opening a new one
+    read_timeout : float | None
+        Seconds to wait for each read from the server
+    """
+    limit: int = 100
+    limit_per_host: int = 0
+    keepalive_timeout: float = 30.0
+    dns_cache_ttl: Optional[int] = 300
+    use_dns_cache: bool = True
+    total_timeout: Optional[float] = 300.0
+    connect_timeout: Optional[float] = 30.0
+    read_timeout: Optional[float] = 60.0
+
+    def connector(self) -> TCPConnector:
+        """Returns a connector with these settings, it must be created inside the running event loop."""
+        return TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_cache_ttl,
+            use_dns_cache=self.use_dns_cache,
+        )
+
+    def timeout(self) -> ClientTimeout:
+        """Returns the request timeouts."""
+        return ClientTimeout(total=self.total_timeout, connect=self.connect_timeout, sock_read=self.read_timeout)
+
+    def session(self) -> ClientSession:
+        """Returns a session using a connector and timeouts with these settings."""
+        return ClientSession(connector=self.connector(), timeout=self.timeout())
+
+
+def add_connection_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds command line options for each connector setting."""
+    defaults = ConnectorSettings()
+    parser.add_argument("--connection-limit", type=int, default=defaults.limit, help="the most connections open at once, 0 for no limit")
+    parser.add_argument("--limit-per-host", type=int, default=defaults.limit_per_host, help="the most connections open to one host, 0 for no limit")
+    parser.add_argument("--keepalive", type=float, default=defaults.keepalive_timeout, help="seconds an idle connection is kept open")
+    parser.add_argument("--dns-ttl", type=int, default=defaults.dns_cache_ttl, help="seconds a DNS lookup is reused")
+    parser.add_argument("--no-dns-cache", action="store_true", help="look up the host for every new connection")
+    parser.add_argument("--timeout", type=float, default=defaults.total_timeout, help="seconds a whole request may take")
+    parser.add_argument("--connect-timeout", type=float, default=defaults.connect_timeout, help="seconds to wait for a connection")
+    parser.add_argument("--read-timeout", type=float, default=defaults.read_timeout, help="seconds to wait for each read")
+
+
+def connection_settings(args: argparse.Namespace) -> ConnectorSettings:
+    """Returns the connector settings given on the command line by the options add_connection_arguments added."""
+    return ConnectorSettings(
+        limit=args.connection_limit,
+        limit_per_host=args.limit_per_host,
+        keepalive_timeout=args.keepalive,
+        dns_cache_ttl=args.dns_ttl,
+        use_dns_cache=not args.no_dns_cache,
+        total_timeout=args.timeout,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+    )
@@ -0,0 +1,271 @@
+"""
+    On-disk HTTP response cache
+
+    Stores response bodies compressed in files named by a hash of the url and query, with their ETag and Last-Modified headers
+    and when they were last used kept in a SQLite index. Reports for dates long past never change, so they are served straight
+    from the cache, recent reports are revalidated with a conditional request that the server answers with 304 if nothing changed.
+    The least recently used responses are removed once the cache grows past its size limit, which is checked against a running
+    total of the cached bytes rather than summing the index on every insert.
+    Bodies are compressed and decompressed a chunk at a time, so a large response is never held in memory whole. The index can be
+    used from several threads, so bodies can be compressed and committed in a worker thread while the event loop reads the cache.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import date, timedelta
+from typing import Iterator, Mapping, NamedTuple, Optional
+
+EVICT_TO = 0.9 # the share of max_bytes eviction brings the cache down to, so a full cache is not evicted from on every insert
+
+
+class CachedResponse(NamedTuple):
+    """A cached response body with the headers needed to revalidate it."""
+    path: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+    def chunks(self, size: int = 64 * 1024) -> Iterator[bytes]:
+        """Yields the decompressed body a chunk at a time."""
+        decompressor = zlib.decompressobj()
+        with open(self.path, "rb") as file:
+            while True:
+                data = file.read(size)
+                if not data:
+                    break
+                yield decompressor.decompress(data)
+        yield decompressor.flush()
+
+    def read(self) -> str:
+        """Returns the whole decompressed body."""
+        return b"".join(self.chunks()).decode()
+
+    def conditional_headers(self) -> dict[str, str]:
+        """Returns the headers asking the server to answer 304 if the response has not changed."""
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def cache_key(url: str, params: Mapping[str, str]) -> str:
+    """Returns the hash naming the cache entry of a url and query, the order of the query parameters does not matter."""
+    query = "&".join(f"{name}={params[name]}" for name in sorted(params))
+    return hashlib.sha256(f"{url}?{query}".encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    A class to cache HTTP responses on disk
+
+    Attributes
+    ----------
+    directory : str
+        The directory holding the cached bodies and the index
+    max_bytes : int
+        The most compressed bytes to keep before the least recently used responses are removed
+    revalidate_days : int
+        Responses for dates less than this many days ago are revalidated before use
+    hits : int
+        Responses served from the cache without a request
+    revalidated : int
+        Responses served from the cache after the server said they had not changed
+    misses : int
+        Responses that had to be downloaded
+
+    Methods
+    -------
+    is_settled(day):
+        Returns whether the data for a day will no longer change.
+    get(url, params):
+        Returns the cached response for a request if there is one.
+    open_entry(url, params):
+        Returns a writer that stores a response body a chunk at a time.
+    put(url, params, body, etag, last_modified):
+        Stores a response, removing the least recently used ones if the cache is too big.
+    size():
+        Returns the compressed bytes in the cache, as this process has counted them.
+    close():
+        Closes the index.
+    """
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024, revalidate_days: int = 7) -> None:
+        """
+        Opens the cache, creating the directory and index if they do not exist
+
+        Parameters
+        ----------
+        directory: str
+            The directory holding the cached bodies and the index
+        max_bytes: int
+            The most compressed bytes to keep
+        revalidate_days: int
+            Responses for dates less than this many days ago are revalidated before use
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.revalidate_days = revalidate_days
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(os.path.join(directory, "index.sqlite"), timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, size INTEGER, last_used REAL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._connection.commit()
+        self._size = self._stored_size()
+
+    def _path(self, key: str) -> str:
+        """Returns the path of the file holding a cached body."""
+        return os.path.join(self.directory, key[:2], key)
+
+    def is_settled(self, day: date) -> bool:
+        """Returns whether the data for a day will no longer change, so its responses can be used without revalidating them."""
+        return day < date.today() - timedelta(days=self.revalidate_days)
+
+    def get(self, url: str, params: Mapping[str, str]) -> Optional[CachedResponse]:
+        """Returns the cached response for a request, marking it as used, or None if it is not cached."""
+        key = cache_key(url, params)
+        with self._lock:
+            row = self._connection.execute("SELECT etag, last_modified, size FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if not os.path.exists(self._path(key)):
+                # the body was removed outside the cache, so forget it
+                self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._connection.commit()
+                self._size -= row[2]
+                return None
+            self._connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._connection.commit()
+        return CachedResponse(self._path(key), row[0], row[1])
+
+    def open_entry(self, url: str, params: Mapping[str, str]) -> CacheEntryWriter:
+        """Returns a writer that stores the response to a request a chunk at a time, it replaces any cached response once committed."""
+        key = cache_key(url, params)
+        return CacheEntryWriter(self, key, self._path(key))
+
+    def _commit_entry(self, key: str, etag: Optional[str], last_modified: Optional[str], size: int) -> None:
+        """Records a stored body in the index and removes the least recently used responses if the cache is too big."""
+        with self._lock:
+            replaced = self._connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)", (key, etag, last_modified, size, time.time()))
+            self._size += size - (replaced[0] if replaced is not None else 0)
+            if self._size > self.max_bytes:
+                self._evict()
+            self._connection.commit()
+
+    def put(self, url: str, params: Mapping[str, str], body: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """
+        Stores a response, removing the least recently used ones if the cache is bigger than max_bytes.
+
+        Parameters
+        ----------
+        url (str): The url requested without the query
+        params (Mapping[str, str]): The query parameters
+        body (str): The response body
+        etag (str): The ETag header of the response, if any
+        last_modified (str): The Last-Modified header of the response, if any
+        """
+        entry = self.open_entry(url, params)
+        entry.write(body.encode())
+        entry.commit(etag, last_modified)
+
+    def size(self) -> int:
+        """Returns the compressed bytes in the cache, counted when it was opened and kept up to date as responses are added and removed."""
+        return self._size
+
+    def _stored_size(self) -> int:
+        """Returns the compressed bytes of every response in the index."""
+        return self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _evict(self) -> None:
+        """
+        Removes the least recently used responses until the cache is no bigger than EVICT_TO of max_bytes.
+        The total is counted again from the index first, as other processes sharing the cache may have added or removed responses,
+        which happens at most once every (1 - EVICT_TO) * max_bytes of inserts.
+        """
+        self._size = self._stored_size()
+        target = int(self.max_bytes * EVICT_TO)
+        if self._size <= self.max_bytes:
+            return
+        for key, size in self._connection.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            if self._size <= target:
+                break
+            self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            self._size -= size
+
+    def close(self) -> None:
+        """Closes the index."""
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self) -> ResponseCache:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class CacheEntryWriter:
+    """
+    A class to store a response body in the cache a chunk at a time
+
+    The body is compressed into a temporary file that replaces the cached body when committed, so a reader never sees half a body.
+    write and commit compress and touch the disk, so the downloader calls them in a worker thread, one call at a time.
+
+    Methods
+    -------
+    write(data):
+        Compresses and stores the next chunk of the body.
+    commit(etag, last_modified):
+        Finishes the body and adds it to the cache.
+    discard():
+        Removes the partly stored body.
+    """
+    def __init__(self, cache: ResponseCache, key: str, path: str) -> None:
+        """Opens the temporary file for a body."""
+        self._cache = cache
+        self._key = key
+        self._path = path
+        self._compressor = zlib.compressobj()
+        self._size = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path + ".tmp", "wb")
+
+    def write(self, data: bytes) -> None:
+        """Compresses and stores the next chunk of the body."""
+        compressed = self._compressor.compress(data)
+        self._size += len(compressed)
+        self._file.write(compressed)
+
+    def commit(self, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """Finishes the body and adds it to the cache with the headers needed to revalidate it."""
+        compressed = self._compressor.flush()
+        self._size += len(compressed)
+        self._file.write(compressed)
+        self._file.close()
+        os.replace(self._path + ".tmp", self._path)
+        self._cache._commit_entry(self._key, etag, last_modified, self._size)
+
+    def discard(self) -> None:
+        """Removes the partly stored body, the cache keeps any body it had before."""
+        self._file.close()
+        try:
+            os.remove(self._path + ".tmp")
+        except FileNotFoundError:
+            pass
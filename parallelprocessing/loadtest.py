@@ -0,0 +1,117 @@
+"""
+    Load test for the report api
+
+    Sends many report requests at once through a session with the given connector settings and reports the requests per second,
+    latency percentiles and status codes. By default it starts the local stand-in server with the given latency and error rate,
+    so connection pool settings can be compared reproducibly without the network.
+    To Run: `python -m parallelprocessing.loadtest --requests 5000 --concurrency 100 --latency 0.01`
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import math
+import time
+from collections import Counter
+from typing import Optional
+
+from aiohttp import ClientError, ClientSession
+
+from .connection import ConnectorSettings, add_connection_arguments, connection_settings
+from .mock_server import ROWS_PER_DAY, start_mock_server
+
+
+def percentile(latencies: list[float], percent: float) -> float:
+    """Returns the latency below which the given percent of the sorted latencies fall."""
+    if not latencies:
+        return 0.0
+    position = min(len(latencies) - 1, int(round(percent / 100 * (len(latencies) - 1))))
+    return latencies[position]
+
+
+async def request_worker(session: ClientSession, report_api: str, numbers: itertools.count, requests: int, page_size: int, latencies: list[float], statuses: Counter) -> None:
+    """Sends requests until the shared count of requests reaches the total, spreading them over the days and pages of August 2021."""
+    pages = math.ceil(ROWS_PER_DAY / page_size)
+    while True:
+        number = next(numbers)
+        if number >= requests:
+            return
+        day = f"{number // pages % 31 + 1:02d}082021"
+        query = {"sites": "2", "page": str(number % pages + 1), "page_size": str(page_size)}
+        started = time.perf_counter()
+        try:
+            async with session.get(report_api.format(start=day, end=day), params=query) as response:
+                await response.read()
+                statuses[response.status] += 1
+        except (ClientError, asyncio.TimeoutError) as error:
+            statuses[type(error).__name__] += 1
+        latencies.append(time.perf_counter() - started)
+
+
+async def load_test(report_api: Optional[str] = None, requests: int = 1000, concurrency: int = 50, page_size: int = 96, connection: ConnectorSettings = ConnectorSettings(), latency: float = 0.0, error_rate: float = 0.0) -> dict:
+    """
+    Sends requests with many in flight at once and reports the throughput and latency.
+
+    Parameters
+    ----------
+    report_api (str): The report url template to test, the stand-in server is started if not given
+    requests (int): How many requests to send
+    concurrency (int): How many requests to have in flight at once, the connector limits may allow fewer
+    page_size (int): Rows asked for in each request
+    connection (ConnectorSettings): The connection pool settings to test
+    latency (float): Seconds the stand-in server waits before answering
+    error_rate (float): The share of requests the stand-in server fails
+
+    Returns
+    -------
+    results (dict): requests, seconds, requests_per_second, p50_ms, p90_ms, p99_ms, max_ms and the count of each status
+    """
+    runner = None
+    if report_api is None:
+        runner, report_api = await start_mock_server(latency=latency, error_rate=error_rate)
+    latencies = []
+    statuses = Counter()
+    try:
+        numbers = itertools.count()
+        async with connection.session() as session:
+            started = time.perf_counter()
+            await asyncio.gather(*(request_worker(session, report_api, numbers, requests, page_size, latencies, statuses) for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p90_ms": percentile(latencies, 90) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+        "statuses": dict(statuses),
+    }
+
+
+def main() -> None:
+    """Runs a load test and prints the results."""
+    parser = argparse.ArgumentParser(description="Load test the WebTRIS report api or a local stand-in for it.")
+    parser.add_argument("--report-api", default=None, help="the report url template to test, a local stand-in server is started if not given")
+    parser.add_argument("--requests", type=int, default=1000, help="requests to send")
+    parser.add_argument("--concurrency", type=int, default=50, help="requests in flight at once")
+    parser.add_argument("--page-size", type=int, default=96, help="rows asked for in each request")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the stand-in server waits before answering")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests the stand-in server fails")
+    add_connection_arguments(parser)
+    args = parser.parse_args()
+
+    results = asyncio.run(load_test(args.report_api, args.requests, args.concurrency, args.page_size, connection_settings(args), args.latency, args.error_rate))
+    print(f"{results['requests']} requests in {results['seconds']:.2f}s, {results['requests_per_second']:.0f} requests/s")
+    print(f"latency p50 {results['p50_ms']:.1f}ms, p90 {results['p90_ms']:.1f}ms, p99 {results['p99_ms']:.1f}ms, max {results['max_ms']:.1f}ms")
+    print("statuses " + ", ".join(f"{status}: {count}" for status, count in sorted(results["statuses"].items(), key=str)))
+
+
+if __name__ == "__main__":
+    main()
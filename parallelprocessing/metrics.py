@@ -0,0 +1,232 @@
+"""
+    Download instrumentation
+
+    Counts what the downloader does as it happens: how long each request and each store takes in fixed bucket histograms,
+    the status of every response, bytes and rows received, retries, and how many requests are in flight or waiting in the queue.
+    Recording a value is a few additions and a bisect, so the metrics stay on in production. They can be printed as a progress line
+    or written as a Prometheus text or JSON snapshot. Slow requests with few in flight point at the network or server,
+    throttling and server errors at the server, and slow stores at the disk.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from bisect import bisect_left
+from collections import Counter
+from typing import Callable, Optional, Sequence, Union
+
+# bucket upper bounds in seconds, from 1ms to 1 minute
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """
+    A class to count values into fixed buckets
+
+    Attributes
+    ----------
+    bounds : tuple[float, ...]
+        The upper bound of each bucket, values above the last go in an overflow bucket
+    counts : list[int]
+        How many values fell in each bucket, overflow last
+    total : float
+        The sum of every value
+    count : int
+        How many values have been counted
+
+    Methods
+    -------
+    observe(value):
+        Counts a value.
+    quantile(fraction):
+        Returns the bucket bound below which the fraction of values fall.
+    """
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS) -> None:
+        """Constructs an empty histogram with buckets up to each bound."""
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Counts a value."""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, fraction: float) -> float:
+        """Returns the upper bound of the bucket holding the given fraction of values, inf if it is the overflow bucket and 0 if empty."""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+class DownloadMetrics:
+    """
+    A class to record what a download is doing
+
+    Attributes
+    ----------
+    request_seconds : Histogram
+        How long each request took, from sending it to reading the whole body
+    store_seconds : Histogram
+        How long each page took to hand to the writer, including waiting for full buffers to be written
+    statuses : Counter
+        How many responses had each status, or each error for requests that failed without one
+    retries : int
+        How many requests were tried again
+    response_bytes : int
+        Body bytes received
+    pages : int
+        Pages downloaded and stored
+    rows : int
+        Rows stored
+    in_flight : int
+        Requests waiting for the server
+    queued : int
+        Pages waiting for a worker
+    concurrency_limit : float
+        How many requests the adaptive limiter currently allows in flight
+    started : float
+        When recording started, in time.monotonic seconds
+
+    Methods
+    -------
+    request_started():
+        Records a request being sent.
+    request_finished(status, seconds, size):
+        Records a request being answered or failing.
+    stored(seconds, rows):
+        Records a page being stored.
+    progress_line(overall):
+        Returns one line summarising progress, with the rates since the last line or since the start.
+    snapshot():
+        Returns every metric as a dict.
+    prometheus():
+        Returns every metric in the Prometheus text format.
+    write_snapshot(path):
+        Writes the metrics to a file, as JSON if it ends in .json, otherwise as Prometheus text.
+    """
+    def __init__(self) -> None:
+        """Constructs metrics with nothing recorded."""
+        self.request_seconds = Histogram()
+        self.store_seconds = Histogram()
+        self.statuses = Counter()
+        self.retries = 0
+        self.response_bytes = 0
+        self.pages = 0
+        self.rows = 0
+        self.in_flight = 0
+        self.queued = 0
+        self.concurrency_limit = 0.0
+        self.started = time.monotonic()
+        self._last_line = (self.started, 0, 0)
+
+    def request_started(self) -> None:
+        """Records a request being sent."""
+        self.in_flight += 1
+
+    def request_finished(self, status: Union[int, str], seconds: float, size: int = 0) -> None:
+        """Records a request's status, or the name of the error it failed with, how long it took and the size of its body."""
+        self.in_flight -= 1
+        self.statuses[status] += 1
+        self.request_seconds.observe(seconds)
+        self.response_bytes += size
+
+    def stored(self, seconds: float, rows: int) -> None:
+        """Records a page being stored, with how long it took and how many rows it had."""
+        self.store_seconds.observe(seconds)
+        self.pages += 1
+        self.rows += rows
+
+    def progress_line(self, overall: bool = False) -> str:
+        """Returns one line with the totals, the rates since the last line, or since the start if overall, the latency percentiles and what is waiting."""
+        now = time.monotonic()
+        last_time, last_requests, last_bytes = (self.started, 0, 0) if overall else self._last_line
+        requests = self.request_seconds.count
+        elapsed = max(now - last_time, 1e-9)
+        self._last_line = (now, requests, self.response_bytes)
+        throttled = self.statuses.get(429, 0)
+        server_errors = sum(count for status, count in self.statuses.items() if isinstance(status, int) and status >= 500)
+        return (
+            f"{self.pages} pages, {self.rows} rows, {(requests - last_requests) / elapsed:.1f} requests/s, "
+            f"{(self.response_bytes - last_bytes) / elapsed / 1e6:.2f} MB/s, "
+            f"request p50 {self.request_seconds.quantile(0.5) * 1000:.0f}ms p99 {self.request_seconds.quantile(0.99) * 1000:.0f}ms, "
+            f"store p99 {self.store_seconds.quantile(0.99) * 1000:.0f}ms, "
+            f"{self.in_flight} in flight of {self.concurrency_limit:.0f}, {self.queued} queued, "
+            f"{self.retries} retries, {throttled} throttled, {server_errors} server errors"
+        )
+
+    def snapshot(self) -> dict:
+        """Returns every metric as a dict that can be written as JSON."""
+        def histogram(values: Histogram) -> dict:
+            return {"bounds": list(values.bounds), "counts": list(values.counts), "sum": values.total, "count": values.count}
+
+        return {
+            "uptime_seconds": time.monotonic() - self.started,
+            "request_seconds": histogram(self.request_seconds),
+            "store_seconds": histogram(self.store_seconds),
+            "statuses": {str(status): count for status, count in self.statuses.items()},
+            "retries": self.retries,
+            "response_bytes": self.response_bytes,
+            "pages": self.pages,
+            "rows": self.rows,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "concurrency_limit": self.concurrency_limit,
+        }
+
+    def prometheus(self, prefix: str = "report_download") -> str:
+        """Returns every metric in the Prometheus text exposition format."""
+        lines = []
+
+        def histogram(name: str, help_text: str, values: Histogram) -> None:
+            lines.extend((f"# HELP {prefix}_{name} {help_text}", f"# TYPE {prefix}_{name} histogram"))
+            cumulative = 0
+            for bound, count in zip(values.bounds, values.counts):
+                cumulative += count
+                lines.append(f'{prefix}_{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_{name}_bucket{{le="+Inf"}} {values.count}')
+            lines.append(f"{prefix}_{name}_sum {values.total}")
+            lines.append(f"{prefix}_{name}_count {values.count}")
+
+        def single(name: str, kind: str, help_text: str, value: float) -> None:
+            lines.extend((f"# HELP {prefix}_{name} {help_text}", f"# TYPE {prefix}_{name} {kind}", f"{prefix}_{name} {value}"))
+
+        histogram("request_seconds", "Seconds from sending a report request to reading its body.", self.request_seconds)
+        histogram("store_seconds", "Seconds to hand a page's rows to the writer.", self.store_seconds)
+        lines.extend((f"# HELP {prefix}_responses_total Responses by status, or by error for requests without one.", f"# TYPE {prefix}_responses_total counter"))
+        for status, count in sorted(self.statuses.items(), key=lambda item: str(item[0])):
+            lines.append(f'{prefix}_responses_total{{status="{status}"}} {count}')
+        single("retries_total", "counter", "Requests tried again.", self.retries)
+        single("response_bytes_total", "counter", "Report body bytes received.", self.response_bytes)
+        single("pages_total", "counter", "Pages downloaded and stored.", self.pages)
+        single("rows_total", "counter", "Rows stored.", self.rows)
+        single("in_flight_requests", "gauge", "Requests waiting for the server.", self.in_flight)
+        single("queued_pages", "gauge", "Pages waiting for a worker.", self.queued)
+        single("concurrency_limit", "gauge", "Requests the adaptive limiter allows in flight.", self.concurrency_limit)
+        return "\n".join(lines) + "\n"
+
+    def write_snapshot(self, path: str) -> None:
+        """Writes the metrics to a file, as JSON if the path ends in .json, otherwise as Prometheus text, replacing it whole."""
+        text = json.dumps(self.snapshot(), indent=2) if path.endswith(".json") else self.prometheus()
+        with open(path + ".tmp", "w") as file:
+            file.write(text)
+        os.replace(path + ".tmp", path)
+
+
+async def report_progress(metrics: DownloadMetrics, interval: float, report: Callable[[str], None] = print, snapshot_path: Optional[str] = None) -> None:
+    """Reports a progress line, and writes a snapshot if snapshot_path is given, every interval seconds until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        report(f"Progress: {metrics.progress_line()}")
+        if snapshot_path is not None:
+            metrics.write_snapshot(snapshot_path)
@@ -0,0 +1,195 @@
+"""
+    Local stand-in for the WebTRIS reports API
+
+    Serves synthetic reports in the same shape as the Highways England WebTRIS API so the downloader can be run and measured
+    without the network. Each site has one row for every 15 minutes of every day in the requested range.
+    The server can add latency to every response, throttle with 429 responses when too many requests are in flight,
+    fail a share of requests with 503 responses, refuse the first requests with given statuses such as 401 or 404 and counts the requests it has seen and the most it has handled at once.
+    Like WebTRIS, the header of each page gives the total rows in the report and a link to the next page, either can be left out
+    to check the downloader copes with less paging metadata. Every page has an ETag and a request whose If-None-Match matches it is answered 304.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import random
+from datetime import datetime, timedelta
+from typing import Any, Iterable, Optional
+
+from aiohttp import web
+
+REPORT_PATH = "/api/v1/reports/{start}/to/{end}/Monthly"
+ROWS_PER_DAY = 96
+
+
+def app_key(name: str, kind: type) -> Any:
+    """Returns a typed key for the application's state, or the name itself on aiohttp releases before 3.9 that have no web.AppKey."""
+    return web.AppKey(name, kind) if hasattr(web, "AppKey") else name
+
+
+LATENCY = app_key("latency", float)
+CAPACITY = app_key("capacity", object) # an int, or None for no limit
+ERROR_RATE = app_key("error_rate", float)
+ERRORS = app_key("errors", random.Random)
+METADATA = app_key("metadata", str)
+REFUSALS = app_key("refusals", list)
+STATS = app_key("stats", dict) # the request counts
+
+
+def report_rows(site: str, start: str, end: str, first_row: int, count: int) -> list[dict]:
+    """
+    Returns synthetic report rows for a site and date range.
+
+    The values are generated from the site, date and time so the same request always returns the same rows.
+
+    Parameters
+    ----------
+    site (str): The site id
+    start (str): The first day of the report as ddmmyyyy
+    end (str): The last day of the report as ddmmyyyy
+    first_row (int): The number of the first row to return, counting from 0
+    count (int): How many rows to return at most
+
+    Returns
+    -------
+    rows (list[dict]): The report rows
+    """
+    first_day = datetime.strptime(start, "%d%m%Y")
+    total_rows = ((datetime.strptime(end, "%d%m%Y") - first_day).days + 1) * ROWS_PER_DAY
+    rows = []
+    for row_number in range(first_row, min(first_row + count, total_rows)):
+        period_end = first_day + timedelta(minutes=15 * row_number + 14)
+        values = random.Random(f"{site}:{period_end.isoformat()}")
+        rows.append({
+            "Site Name": f"Site {site}",
+            "Report Date": period_end.strftime("%Y-%m-%dT00:00:00"),
+            "Time Period Ending": period_end.strftime("%H:%M:%S"),
+            "Time Interval": str(row_number % ROWS_PER_DAY),
+            "Avg mph": str(values.randint(40, 70)),
+            "Total Volume": str(values.randint(0, 400)),
+        })
+    return rows
+
+
+async def handle_report(request: web.Request) -> web.Response:
+    """Returns one page of a report in the WebTRIS format, or 204 with no body after the last page."""
+    stats = request.app[STATS]
+    stats["requests"] += 1
+    if request.app[REFUSALS]:
+        return web.Response(status=request.app[REFUSALS].pop(0))
+    capacity = request.app[CAPACITY]
+    if capacity is not None and stats["in_flight"] >= capacity:
+        stats["throttled"] += 1
+        return web.Response(status=429)
+    if request.app[ERROR_RATE] and request.app[ERRORS].random() < request.app[ERROR_RATE]:
+        stats["errors"] += 1
+        return web.Response(status=503)
+
+    stats["in_flight"] += 1
+    stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+    try:
+        if request.app[LATENCY]:
+            await asyncio.sleep(request.app[LATENCY])
+        return report_response(request)
+    finally:
+        stats["in_flight"] -= 1
+
+
+def report_response(request: web.Request) -> web.Response:
+    """Builds the response for one page of a report."""
+    start = request.match_info["start"]
+    end = request.match_info["end"]
+    site = request.query.get("sites", "1")
+    page = int(request.query.get("page", "1"))
+    page_size = int(request.query.get("page_size", "10"))
+
+    rows = report_rows(site, start, end, (page - 1) * page_size, page_size)
+    if not rows:
+        return web.Response(status=204)
+
+    metadata = request.app[METADATA]
+    if metadata == "none":
+        return json_page(request, {"Rows": rows})
+
+    total_rows = ((datetime.strptime(end, "%d%m%Y") - datetime.strptime(start, "%d%m%Y")).days + 1) * ROWS_PER_DAY
+    links = []
+    if page * page_size < total_rows:
+        next_page = request.url.update_query({"page": str(page + 1)})
+        links.append({"href": str(next_page), "rel": "nextPage"})
+
+    header = {"start_date": start, "end_date": end, "links": links}
+    if metadata == "full":
+        header["row_count"] = total_rows
+    return json_page(request, {"Header": header, "Rows": rows})
+
+
+def json_page(request: web.Request, page: dict) -> web.Response:
+    """Returns a page as json with an ETag, or 304 with no body if the request already has the same page."""
+    body = json.dumps(page)
+    etag = '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+    if request.headers.get("If-None-Match") == etag:
+        request.app[STATS]["not_modified"] += 1
+        return web.Response(status=304, headers={"ETag": etag})
+    return web.Response(text=body, content_type="application/json", headers={"ETag": etag})
+
+
+def create_app(latency: float = 0.0, capacity: Optional[int] = None, error_rate: float = 0.0, seed: int = 0, metadata: str = "full", refusals: Iterable[int] = ()) -> web.Application:
+    """
+    Creates the stand-in web application.
+
+    Parameters
+    ----------
+    latency (float): Seconds to wait before answering each request
+    capacity (int): How many requests can be in flight before the server answers 429 Too Many Requests, no limit if not given
+    error_rate (float): The share of requests answered with 503 Service Unavailable
+    seed (int): Seed for choosing which requests fail
+    metadata (str): The paging metadata in each page, "full" for the total rows and next page link, "links" for only the link or "none"
+    refusals (Iterable[int]): The statuses to answer the first requests with, one request each, before serving reports
+
+    Returns
+    -------
+    app (web.Application): The application, app[STATS] holds the request counts
+    """
+    app = web.Application()
+    app[LATENCY] = latency
+    app[CAPACITY] = capacity
+    app[ERROR_RATE] = error_rate
+    app[ERRORS] = random.Random(seed)
+    app[METADATA] = metadata
+    app[REFUSALS] = list(refusals)
+    app[STATS] = {"requests": 0, "throttled": 0, "errors": 0, "not_modified": 0, "in_flight": 0, "max_in_flight": 0}
+    app.router.add_get(REPORT_PATH, handle_report)
+    return app
+
+
+async def start_mock_server(host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, capacity: Optional[int] = None, error_rate: float = 0.0, metadata: str = "full",
+                            refusals: Iterable[int] = ()) -> tuple[web.AppRunner, str]:
+    """
+    Starts the stand-in server in the running event loop.
+
+    Parameters
+    ----------
+    host (str): The host to listen on
+    port (int): The port to listen on, 0 picks a free port
+    latency (float): Seconds to wait before answering each request
+    capacity (int): How many requests can be in flight before the server answers 429 Too Many Requests, no limit if not given
+    error_rate (float): The share of requests answered with 503 Service Unavailable
+    metadata (str): The paging metadata in each page, "full", "links" or "none"
+    refusals (Iterable[int]): The statuses to answer the first requests with, one request each, before serving reports
+
+    Returns
+    -------
+    runner (web.AppRunner): Call cleanup() on it to stop the server, runner.app[STATS] holds the request counts
+    report_api (str): The report url template to give the downloader in place of REPORT_API
+    """
+    runner = web.AppRunner(create_app(latency, capacity, error_rate, metadata=metadata, refusals=refusals))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://{host}:{port}" + REPORT_PATH
+
+
+if __name__ == "__main__":
+    web.run_app(create_app(), host="127.0.0.1", port=8080)
@@ -0,0 +1,404 @@
+"""
+    Partitioned report output
+
+    Writes report rows given as newline-delimited JSON, one file per site and day in site=<site>/date=<yyyy-mm-dd> directories
+    so tools that understand Hive style partitions can read a single site or day without scanning the rest.
+    Rows are buffered in memory per partition and written in large batches, compressing each batch as a gzip member in a thread pool
+    so the event loop keeps downloading while it is compressed. Appended gzip members read back as one gzip file.
+    Next to each partition a sidecar index records where every page's rows are, the byte offset and length of the batch holding them
+    and their place within it, so ReportReader can memory map a partition and return one page or whole days without scanning the files.
+    Rows are appended before the checkpoint marks their page complete, so a page can be written again after a crash. The index keeps
+    every write of a page and readers of whole days leave out all but the last one.
+"""
+from __future__ import annotations
+
+import asyncio
+import gzip
+import io
+import json
+import mmap
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import BinaryIO, Callable, Hashable, Iterator, NamedTuple, Optional, Union
+
+# page, part of the page, batch offset, batch length, start of the part in the uncompressed batch, part length
+INDEX_RECORD = struct.Struct("<IIQIII")
+
+
+def partition_path(directory: str, site: str, date: str, compress: bool = True) -> str:
+    """Returns the path of the file holding the rows of a site for a day given as ddmmyyyy."""
+    day = datetime.strptime(date, "%d%m%Y").strftime("%Y-%m-%d")
+    return os.path.join(directory, f"site={site}", f"date={day}", "rows.ndjson.gz" if compress else "rows.ndjson")
+
+
+def index_path(path: str) -> str:
+    """Returns the path of the sidecar index of a partition file."""
+    return path + ".idx"
+
+
+def append_batch(path: str, data: bytes, compress: bool, segments: Optional[list[tuple[int, int, int, int]]] = None) -> None:
+    """
+    Appends a batch of lines to a file, as one gzip member if compress is True. Runs in a worker thread.
+    Each (page, part, start, length) segment of the batch is then appended to the sidecar index with the batch's offset and length.
+    """
+    if compress:
+        data = gzip.compress(data, compresslevel=6)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "ab") as file:
+        offset = file.tell()
+        file.write(data)
+    if segments:
+        with open(index_path(path), "ab") as index:
+            index.write(b"".join(INDEX_RECORD.pack(page, part, offset, len(data), start, length) for page, part, start, length in segments))
+
+
+class PartitionedWriter:
+    """
+    A class to write report rows as newline-delimited JSON partitioned by site and day
+
+    Attributes
+    ----------
+    directory : str
+        The directory holding the partitions
+    compress : bool
+        Whether the files are gzip compressed
+    buffer_bytes : int
+        How many bytes of rows a partition buffers before they are written
+    on_flush : Callable[[list], None] | None
+        Called with the tags of the rows once they are written to disk, if set
+    index : bool
+        Whether the place of each page's rows is recorded in the partition's sidecar index
+
+    Methods
+    -------
+    write(site, date, data, tag, page):
+        Buffers JSON lines for a site and day, writing the partition's buffer once it is full.
+    write_file(site, date, file, tag, page):
+        Buffers the JSON lines in a file for a site and day, writing the partition's buffer whenever it is full.
+    flush():
+        Writes every buffered row.
+    close():
+        Writes every buffered row and stops the compression threads.
+    """
+    def __init__(self, directory: str, compress: bool = True, buffer_bytes: int = 1024 * 1024, on_flush: Optional[Callable[[list], None]] = None, threads: int = 2, index: bool = True) -> None:
+        """
+        Constructs all the attributes for a partitioned writer
+
+        Parameters
+        ----------
+        directory: str
+            The directory holding the partitions, created if it does not exist
+        compress: bool
+            Whether the files are gzip compressed
+        buffer_bytes: int
+            How many bytes of rows a partition buffers before they are written
+        on_flush: Callable[[list], None]
+            Called with the tags of the rows once they are written to disk
+        threads: int
+            How many threads compress and write batches
+        index: bool
+            Whether the place of each page's rows is recorded in the partition's sidecar index
+        """
+        self.directory = directory
+        self.compress = compress
+        self.buffer_bytes = buffer_bytes
+        self.on_flush = on_flush
+        self.index = index
+        self._buffers = {}
+        self._tags = {}
+        self._segments = {}
+        self._locks = {}
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="report-writer")
+        os.makedirs(directory, exist_ok=True)
+
+    async def write(self, site: str, date: str, data: bytes, tag: Optional[Hashable] = None, page: Optional[int] = None) -> None:
+        """
+        Buffers JSON lines for a site and day, writing the partition's buffer once it holds buffer_bytes.
+
+        Parameters
+        ----------
+        site (str): The site the rows are for
+        date (str): The day the rows are for as ddmmyyyy
+        data (bytes): Whole JSON lines
+        tag (Hashable): Passed to on_flush once the rows are on disk, such as the page they came from
+        page (int): The page the rows came from, recorded in the index so it can be read back alone
+        """
+        await self.write_file(site, date, io.BytesIO(data), tag, page=page)
+
+    async def write_file(self, site: str, date: str, file: BinaryIO, tag: Optional[Hashable] = None, chunk_size: int = 64 * 1024, page: Optional[int] = None) -> None:
+        """
+        Buffers the JSON lines in a file for a site and day a chunk at a time, from the file's current position to its end.
+
+        Lines from one call are never interleaved with lines from another call for the same partition.
+
+        Parameters
+        ----------
+        site (str): The site the rows are for
+        date (str): The day the rows are for as ddmmyyyy
+        file (BinaryIO): The file holding whole JSON lines, such as a page's spool
+        tag (Hashable): Passed to on_flush once the rows are on disk, such as the page they came from
+        chunk_size (int): How many bytes are read from the file at a time
+        page (int): The page the rows came from, recorded in the index so it can be read back alone
+        """
+        partition = (site, date)
+        async with self._locks.setdefault(partition, asyncio.Lock()):
+            # a page split over several batches is indexed as one numbered part per batch
+            part = 0
+            start = len(self._buffers.get(partition, b""))
+            while True:
+                data = file.read(chunk_size)
+                if not data:
+                    break
+                # flush before adding more so the buffer holding the end of the file is flushed with the tag
+                buffered = len(self._buffers.get(partition, b""))
+                if buffered >= self.buffer_bytes:
+                    if buffered > start:
+                        self._add_segment(partition, page, part, start, buffered)
+                        part += 1
+                    await self._flush_locked(partition)
+                    start = 0
+                self._buffers.setdefault(partition, bytearray()).extend(data)
+            buffered = len(self._buffers.get(partition, b""))
+            if buffered > start:
+                self._add_segment(partition, page, part, start, buffered)
+            if tag is not None:
+                self._tags.setdefault(partition, []).append(tag)
+            if len(self._buffers.get(partition, b"")) >= self.buffer_bytes:
+                await self._flush_locked(partition)
+
+    def _add_segment(self, partition: tuple[str, str], page: Optional[int], part: int, start: int, end: int) -> None:
+        """Records that bytes start to end of a partition's buffer are a part of a page, if the page is known and indexed."""
+        if page is not None and self.index:
+            self._segments.setdefault(partition, []).append((page, part, start, end - start))
+
+    async def _flush_locked(self, partition: tuple[str, str]) -> None:
+        """Writes one partition's buffer in the thread pool, the caller must hold the partition's lock so batches stay in order."""
+        data = bytes(self._buffers.pop(partition, b""))
+        tags = self._tags.pop(partition, [])
+        segments = self._segments.pop(partition, [])
+        if data:
+            path = partition_path(self.directory, *partition, compress=self.compress)
+            await asyncio.get_running_loop().run_in_executor(self._executor, append_batch, path, data, self.compress, segments)
+        if tags and self.on_flush is not None:
+            self.on_flush(tags)
+
+    async def _flush_partition(self, partition: tuple[str, str]) -> None:
+        """Writes one partition's buffer once no other write to it is in progress."""
+        async with self._locks.setdefault(partition, asyncio.Lock()):
+            await self._flush_locked(partition)
+
+    async def flush(self) -> None:
+        """Writes every buffered row."""
+        for partition in set(self._buffers) | set(self._tags):
+            await self._flush_partition(partition)
+
+    async def close(self) -> None:
+        """Writes every buffered row and stops the compression threads."""
+        await self.flush()
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self) -> PartitionedWriter:
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+
+def read_partition(path: str) -> list[dict]:
+    """Returns every row in a partition file, once even if its page was written again."""
+    return [json.loads(line) for line in read_lines(path).splitlines()]
+
+
+def read_lines(path: str) -> bytes:
+    """Returns the JSON lines of a partition file, leaving out the rows of pages that were written again."""
+    with open(path, "rb") as file:
+        data = file.read()
+    return bytes(without_rewritten_pages(data, read_entries(path, missing_ok=True), path.endswith(".gz")))
+
+
+class IndexEntry(NamedTuple):
+    """Where one part of a page's rows is in a partition file."""
+    page: int
+    part: int
+    offset: int
+    size: int
+    start: int
+    length: int
+
+
+def read_entries(path: str, missing_ok: bool = False) -> list[IndexEntry]:
+    """Returns every record in a partition file's index in the order they were written, none if missing_ok and there is no index."""
+    try:
+        with open(index_path(path), "rb") as file:
+            data = file.read()
+    except FileNotFoundError:
+        if missing_ok:
+            return []
+        raise
+    # a record cut short by a crash while it was appended is ignored
+    return list(map(IndexEntry._make, INDEX_RECORD.iter_unpack(data[:len(data) - len(data) % INDEX_RECORD.size])))
+
+
+def read_index(path: str) -> dict[int, list[IndexEntry]]:
+    """Returns the parts of each page in a partition file's index, in order. A page written again, such as after a crash, replaces its earlier parts."""
+    return group_pages(read_entries(path))
+
+
+def group_pages(entries: list[IndexEntry]) -> dict[int, list[IndexEntry]]:
+    """Returns the parts of the last write of each page in index records."""
+    pages = {}
+    for entry in entries:
+        if entry.part == 0:
+            pages[entry.page] = []
+        pages.setdefault(entry.page, []).append(entry)
+    return pages
+
+
+def without_rewritten_pages(data: Union[mmap.mmap, bytes], entries: list[IndexEntry], compress: bool) -> Union[memoryview, bytes]:
+    """
+    Returns the JSON lines of a partition file's contents without the parts of pages that a later write of the page replaced.
+
+    Only the batches holding replaced parts are decompressed on their own, the runs of batches between them are read as they are,
+    so an uncompressed partition with no page written twice is returned as a memoryview of data without copying.
+    Rows written without a page are always kept.
+    """
+    kept = {entry for parts in group_pages(entries).values() for entry in parts}
+    replaced = {}
+    for entry in entries:
+        if entry not in kept:
+            replaced.setdefault((entry.offset, entry.size), []).append((entry.start, entry.length))
+    view = memoryview(data)
+    if not replaced:
+        return gzip.decompress(view) if compress else view
+    chunks = []
+    position = 0
+    for (offset, size), parts in sorted(replaced.items()):
+        if offset > position:
+            chunks.append(gzip.decompress(view[position:offset]) if compress else view[position:offset])
+        batch = gzip.decompress(view[offset:offset + size]) if compress else view[offset:offset + size]
+        start = 0
+        for part_start, length in sorted(parts):
+            chunks.append(batch[start:part_start])
+            start = part_start + length
+        chunks.append(batch[start:])
+        position = offset + size
+    if position < len(view):
+        chunks.append(gzip.decompress(view[position:]) if compress else view[position:])
+    return b"".join(chunks)
+
+
+class ReportReader:
+    """
+    A class to read single pages and days from partitioned report output through memory maps
+
+    Each partition file is mapped once and its index read once, on first use, so later writes to it are not seen.
+    A page is found from the index without reading any other part of the file. Uncompressed pages and days are returned
+    as memoryviews of the map without copying and must be released before the reader is closed, compressed ones are decompressed to bytes.
+
+    Attributes
+    ----------
+    directory : str
+        The directory holding the partitions
+    compress : bool
+        Whether the files are gzip compressed
+
+    Methods
+    -------
+    page(site, date, page):
+        Returns the JSON lines of one page.
+    day(site, date):
+        Returns the JSON lines of a whole day, with each page once.
+    days(site, first, last):
+        Yields the JSON lines of every stored day from first to last.
+    close():
+        Unmaps every file.
+    """
+    def __init__(self, directory: str, compress: bool = True) -> None:
+        """Constructs a reader of the partitions in directory, written compressed or not."""
+        self.directory = directory
+        self.compress = compress
+        self._maps = {}
+        self._indexes = {}
+        self._entries = {}
+        self._member = (None, None, b"")
+
+    def _map(self, site: str, date: str) -> tuple[str, mmap.mmap]:
+        """Returns the path of a partition file and a read only map of it, mapping it on first use."""
+        path = partition_path(self.directory, site, date, self.compress)
+        if path not in self._maps:
+            with open(path, "rb") as file:
+                self._maps[path] = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return path, self._maps[path]
+
+    def _batch(self, path: str, mapped: mmap.mmap, entry: IndexEntry) -> Union[memoryview, bytes]:
+        """Returns the uncompressed batch holding a part of a page, keeping the last one decompressed as neighbouring pages share it."""
+        batch = memoryview(mapped)[entry.offset:entry.offset + entry.size]
+        if not self.compress:
+            return batch
+        if self._member[:2] != (path, entry.offset):
+            with batch:
+                self._member = (path, entry.offset, gzip.decompress(batch))
+        return self._member[2]
+
+    def page(self, site: str, date: str, page: int) -> Union[memoryview, bytes]:
+        """
+        Returns the JSON lines of one page of a site's report for a day given as ddmmyyyy.
+
+        Raises
+        ------
+        FileNotFoundError: if nothing was stored for the site and day
+        KeyError: if the page has no rows stored
+        """
+        path, mapped = self._map(site, date)
+        if path not in self._indexes:
+            self._indexes[path] = read_index(path)
+        parts = [self._batch(path, mapped, entry)[entry.start:entry.start + entry.length] for entry in self._indexes[path][page]]
+        return parts[0] if len(parts) == 1 else b"".join(parts)
+
+    def day(self, site: str, date: str) -> Union[memoryview, bytes]:
+        """
+        Returns the JSON lines of every page of a site's report for a day given as ddmmyyyy.
+
+        A page written more than once, such as after a crash before it was checkpointed, is returned only as its last write.
+        An uncompressed day is a memoryview of the map unless pages were left out, when it is copied to bytes.
+
+        Raises
+        ------
+        FileNotFoundError: if nothing was stored for the site and day
+        """
+        path, mapped = self._map(site, date)
+        if path not in self._entries:
+            self._entries[path] = read_entries(path, missing_ok=True)
+        return without_rewritten_pages(mapped, self._entries[path], self.compress)
+
+    def days(self, site: str, first: str, last: str) -> Iterator[tuple[str, Union[memoryview, bytes]]]:
+        """Yields each day from first to last, given as ddmmyyyy, that has rows stored for the site with its JSON lines."""
+        day = datetime.strptime(first, "%d%m%Y")
+        end = datetime.strptime(last, "%d%m%Y")
+        while day <= end:
+            date = day.strftime("%d%m%Y")
+            if os.path.exists(partition_path(self.directory, site, date, self.compress)):
+                yield date, self.day(site, date)
+            day += timedelta(days=1)
+
+    def close(self) -> None:
+        """Unmaps every file, every memoryview returned must have been released."""
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps.clear()
+        self._indexes.clear()
+        self._entries.clear()
+        self._member = (None, None, b"")
+
+    def __enter__(self) -> ReportReader:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def parse_rows(data: Union[memoryview, bytes]) -> list[dict]:
+    """Returns the rows in JSON lines returned by a ReportReader."""
+    return [json.loads(line) for line in bytes(data).splitlines()]
@@ -1,56 +1,440 @@
 """
-This file downloads a month's worth of reports (pages 1-100 per day for one site) from the Highways England to demostrate using asyncio in python
+This file downloads a month's worth of reports (every page of each day for one site) from the Highways England to demostrate using asyncio in python
 I chose asyncio over multiprocessing as most of the time is spent on waiting for the io requests not on cup intensive processing.
 Threads would also have been a option but asyncio using async await seemed the simplet way to implement making multiple requests un python in a way that was familiar to async await with promises in node.js 
 It also seemed much easier to make async loops for each day and page compared to threads with Semaphore acting as a limit on concurrent api calls
 """
-from aiohttp import ClientSession
-import aiofiles
+from __future__ import annotations
+from typing import Callable, Iterable, NamedTuple, Optional
+from aiohttp import ClientError, ClientSession
 import asyncio
+import math
+import random
+import time
+from datetime import datetime
+from tempfile import SpooledTemporaryFile
+
+from .checkpoint import Checkpoint
+from .connection import ConnectorSettings
+from .http_cache import CachedResponse, ResponseCache
+from .metrics import DownloadMetrics, report_progress
+from .output import PartitionedWriter
+from .report_stream import Report, ReportStreamParser, new_spool
+from .rate_limit import AdaptiveLimiter
 
 
 REPORT_API = "https://webtris.highwaysengland.co.uk/api/v1/reports/{start}/to/{end}/Monthly"
+API_MAX_PAGE_SIZE = 10000 # the most rows the reports api returns in one page
+CHUNK_SIZE = 64 * 1024 # how many bytes of a response are parsed at a time
+
+class TransientError(Exception):
+    """Raised when a request fails in a way that may succeed if it is tried again, such as being throttled or a server error."""
+
+class RequestRefused(Exception):
+    """Raised when the server refuses a request with a status such as 401, 403 or 404, which trying again straight away will not fix."""
+
+class RetryPolicy(NamedTuple):
+    """How many times to try a request and how long to wait between tries."""
+    attempts: int = 5
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+
+    def delay(self, attempt: int) -> float:
+        """Returns a random wait of up to base_delay doubled for every failed attempt, capped at max_delay."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+async def store_report(writer: PartitionedWriter, site: str, date: str, report: Report, tag=None, metrics: Optional[DownloadMetrics] = None, page: Optional[int] = None):
+    """
+    Writes the rows of a report to the site and day's partition and closes its spool, tag is passed on to the writer's on_flush once they are on disk.
+    The writer buffers them with the other pages of the day and writes them as newline-delimited JSON in large compressed batches.
+    The page the report is, if given, is recorded in the partition's index so it can be read back alone.
+    The time taken, which includes waiting for full buffers to be written, is recorded in metrics if given.
+    """
+    started = time.monotonic()
+    try:
+        await writer.write_file(site, date, report.spool, tag, page=page)
+    finally:
+        report.spool.close()
+    if metrics is not None:
+        metrics.stored(time.monotonic() - started, report.rows)
+
+def report_parser(site: str) -> tuple[ReportStreamParser, SpooledTemporaryFile]:
+    """Returns a parser for a page of a site's report and the spool it writes the page's rows to as JSON lines."""
+    spool = new_spool()
+    return ReportStreamParser(site, lambda batch: spool.write(batch.to_ndjson())), spool
+
+def read_cached_report(site: str, cached: CachedResponse) -> Report:
+    """Parses a cached page a chunk at a time."""
+    parser, spool = report_parser(site)
+    try:
+        for chunk in cached.chunks(CHUNK_SIZE):
+            parser.feed(chunk)
+        parser.close()
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return Report(parser.header, parser.rows, spool)
+
+async def download_report(limiter: AdaptiveLimiter, session: ClientSession, start: str, end:str, site:str, page:str, page_size:str, report_api: str = REPORT_API, cache: Optional[ResponseCache] = None, metrics: Optional[DownloadMetrics] = None) -> Optional[Report]:#
+    """
+    Calls the api to download a report and returns it parsed, or None if the server answers 204 as there are no more rows. The status and latency are recorded in the limiter,
+    or a failure if the request timed out or could not connect,
+    and with the body size, or the error if the request failed, in metrics if given.
+    The body is parsed a chunk at a time as it arrives, with the rows typed into column batches and spooled as JSON lines, so memory use does not grow with the page size.
+    With a cache, reports ending on a settled day are returned from it without a request and other cached reports are revalidated with a conditional request.
+
+    Raises
+    ------
+    TransientError: if the server throttled the request or had an error
+    RequestRefused: if the server answered with any other status, such as 401 or 404
+    ValueError: if the body is not a valid report
+    """
+    url = report_api.format(start=start, end=end)
+    query = {"sites":site, "page":page, "page_size":str(page_size)}
+
+    cached = cache.get(url, query) if cache is not None else None
+    if cached is not None and cache.is_settled(datetime.strptime(end, "%d%m%Y").date()):
+        cache.hits += 1
+        return read_cached_report(site, cached)
+    headers = cached.conditional_headers() if cached is not None else None
+
+    async with limiter:
+        started = time.monotonic()
+        status, size = None, 0
+        if metrics is not None:
+            metrics.request_started()
+        try:
+            async with session.get(url, params=query, headers=headers) as response:
+                status = response.status
+                limiter.record(response.status, time.monotonic() - started)
+                if response.status == 304 and cached is not None:
+                    cache.revalidated += 1
+                    return read_cached_report(site, cached)
+                elif response.status == 200:
+                    entry = cache.open_entry(url, query) if cache is not None else None
+                    parser, spool = report_parser(site)
+                    # compressing and committing the cached body is done in a worker thread while the event loop parses and serves other requests
+                    loop = asyncio.get_running_loop()
+                    written = None
+                    try:
+                        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                            size += len(chunk)
+                            if entry is not None:
+                                written = loop.run_in_executor(None, entry.write, chunk)
+                            parser.feed(chunk)
+                            if entry is not None:
+                                await written
+                        parser.close()
+                    except BaseException:
+                        spool.close()
+                        if entry is not None:
+                            if written is not None:
+                                await asyncio.gather(written, return_exceptions=True)
+                            entry.discard()
+                        raise
+                    if entry is not None:
+                        cache.misses += 1
+                        await loop.run_in_executor(None, entry.commit, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+                    spool.seek(0)
+                    return Report(parser.header, parser.rows, spool)
+                elif response.status == 204:
+                    return None
+                elif response.status == 429 or response.status >= 500:
+                    raise TransientError(f"{url} page {page} returned {response.status}")
+                else:
+                    raise RequestRefused(f"{url} page {page} returned {response.status}")
+        except BaseException as error:
+            # a request that timed out or could not connect got no response to record, but is as strong a sign the server is struggling
+            if status is None and isinstance(error, (ClientError, asyncio.TimeoutError)):
+                limiter.failed()
+            # a throttled, failed or refused status is counted as itself, anything else by the error that stopped the request
+            if not isinstance(error, (TransientError, RequestRefused)):
+                status = type(error).__name__
+            raise
+        finally:
+            if metrics is not None:
+                metrics.request_finished(status, time.monotonic() - started, size)
+
+async def download_report_with_retry(limiter: AdaptiveLimiter, session: ClientSession, start: str, end:str, site:str, page:str, page_size:str, report_api: str = REPORT_API, retry: RetryPolicy = RetryPolicy(), cache: Optional[ResponseCache] = None, metrics: Optional[DownloadMetrics] = None):
+    """
+    Downloads a report, trying again after a jittered exponential backoff if the request fails in a way that may succeed later, counting each retry in metrics if given.
+
+    Raises
+    ------
+    TransientError, ClientError, asyncio.TimeoutError: the last error if every attempt failed
+    """
+    for attempt in range(retry.attempts):
+        try:
+            return await download_report(limiter, session, start, end, site, page, page_size, report_api, cache, metrics)
+        except (TransientError, ClientError, asyncio.TimeoutError):
+            if attempt + 1 == retry.attempts:
+                raise
+            if metrics is not None:
+                metrics.retries += 1
+            await asyncio.sleep(retry.delay(attempt))
+
+async def download_and_store_reports(limiter: AdaptiveLimiter, session: ClientSession, writer: PartitionedWriter, start: str, end:str, site:str, page:str, page_size:str, report_api: str = REPORT_API, retry: RetryPolicy = RetryPolicy(), cache: Optional[ResponseCache] = None, metrics: Optional[DownloadMetrics] = None) -> Optional[Report]:
+    """Downloads the report and stores its rows if there is a result, returning the report or None."""
+    report = await download_report_with_retry(limiter, session, start, end, site, page, page_size, report_api, retry, cache, metrics)
+    if report != None:
+        await store_report(writer, site, start, report, WorkUnit(site, start, int(page)), metrics, int(page))
+    return report
+
+class WorkUnit(NamedTuple):
+    """One page of the report for one site and day."""
+    site: str
+    date: str
+    page: int
+
+class Pager:
+    """
+    A class to work out which pages of each day's report to download from the paging metadata of the pages already downloaded
+
+    When a page gives the total rows in the report every page left is scheduled at once. When it only links to the next page,
+    or has no metadata but has rows, the next page is scheduled. A day ends at a page without a next link or at the first empty page.
+    A page that failed is not followed, so the day is left unfinished for the next run.
+
+    Attributes
+    ----------
+    page_size : int
+        How many rows are requested in each page
+    checkpoint : Checkpoint | None
+        Where completed pages and the last page of each day are recorded, if set
+    last_pages : dict[tuple[str, str], int]
+        The last page of each (site, date) report once it is known
 
-async def store_report(file, json: str):
-    """Writes the json reports to a file."""
-    await file.write(json)
-
-async def download_report(sem: asyncio.Semaphore, session: ClientSession, start: str, end:str, site:str, page:str, page_size:str):#
-    """Calls the api to download a report and returns the json if a valid response is returned, else None."""
-    url = REPORT_API.format(start=start, end=end)
-    query = {"sites":site, "page":page, "page_size":page_size}
-     
-    async with sem:
-        async with session.get(url, params=query) as response:
-            if response.status == 200:
-                return str(response.json)
+    Methods
+    -------
+    first_units(days):
+        Returns the work units to start each day's download with.
+    follow(unit, report):
+        Returns the work units to download after a unit from the report returned for it.
+    """
+    def __init__(self, page_size: int = 10, checkpoint: Optional[Checkpoint] = None) -> None:
+        """
+        Constructs all the attributes for a pager
+
+        Parameters
+        ----------
+        page_size: int
+            How many rows are requested in each page
+        checkpoint: Checkpoint
+            Where completed pages and the last page of each day are recorded, every day starts from page 1 if not given
+
+        Raises
+        ------
+        ValueError: if the page size is not between 1 and API_MAX_PAGE_SIZE
+        """
+        if not 1 <= page_size <= API_MAX_PAGE_SIZE:
+            raise ValueError(f"The page size must be between 1 and {API_MAX_PAGE_SIZE}")
+        self.page_size = page_size
+        self.checkpoint = checkpoint
+        self.last_pages = {}
+        self._scheduled = set()
+
+    def _schedule(self, site: str, date: str, pages: Iterable[int]) -> list[WorkUnit]:
+        """Returns a work unit for each page that has not already been scheduled and marks them as scheduled."""
+        units = [WorkUnit(site, date, page) for page in pages if WorkUnit(site, date, page) not in self._scheduled]
+        self._scheduled.update(units)
+        return units
+
+    def _set_last_page(self, site: str, date: str, page: int) -> None:
+        """Records the last page of a day's report."""
+        self.last_pages[(site, date)] = page
+        if self.checkpoint is not None:
+            self.checkpoint.mark_last_page(site, date, page)
+
+    def first_units(self, days: Iterable[tuple[str, str]]) -> list[WorkUnit]:
+        """
+        Returns the work units to start the download of each (site, date) day with.
+
+        Without a checkpoint that is page 1 of every day. With one, every page not yet completed is returned for days whose last page
+        is known, otherwise the first page not yet completed, skipping days that are finished.
+        """
+        units = []
+        for site, date in days:
+            if self.checkpoint is None:
+                units.extend(self._schedule(site, date, [1]))
+                continue
+            completed = self.checkpoint.completed_pages(site, date)
+            # completed pages count as scheduled so following a page never asks for them again
+            self._scheduled.update(WorkUnit(site, date, page) for page in completed)
+            last_page = self.checkpoint.last_page(site, date)
+            if last_page is not None:
+                self.last_pages[(site, date)] = last_page
+                units.extend(self._schedule(site, date, range(1, last_page + 1)))
             else:
-                return None
-
-async def download_and_store_reports(sem: asyncio.Semaphore, session: ClientSession, file, start: str, end:str, site:str, page:str, page_size:str):
-    """Downloads the report json and stored them if there is a result."""
-    result_json = await download_report(sem, session, start, end, site, page, page_size)
-    if result_json != None:
-        await store_report(file, result_json)
-
-async def dowload_reports_for_day(sem: asyncio.Semaphore, session: ClientSession, file, date: str, site: str):
-    """Downloads pages 1 to 100 for all reports for given day."""
-    page_size = 10
-    for page in range(1, 100):
-        await download_and_store_reports(sem, session, file, date, date,  site, str(page), page_size)
-
-async def main():
-    """Download a months for of reports for a specific site."""
-    max_concurrent = 10
-    sem = asyncio.Semaphore(max_concurrent) # limit how many api requests can happen at once
+                first_missing = 1
+                while first_missing in completed:
+                    first_missing += 1
+                units.extend(self._schedule(site, date, [first_missing]))
+        return units
+
+    def follow(self, unit: WorkUnit, report: Optional[Report]) -> list[WorkUnit]:
+        """
+        Returns the work units to download after a unit from the report returned for it.
+
+        Parameters
+        ----------
+        unit (WorkUnit): The page that was downloaded
+        report (Report): The page that was returned, None if the server answered 204 as the page is past the end of the day
+
+        Returns
+        -------
+        units (list[WorkUnit]): The pages of the same day to download next, which have not been scheduled before
+        """
+        day = (unit.site, unit.date)
+        if day in self.last_pages:
+            return []
+        if report is None:
+            # the pages are followed in order without a total, so the day ended on the page before
+            self._set_last_page(unit.site, unit.date, unit.page - 1)
+            return []
+
+        header = report.header or {}
+        if header.get("row_count") is not None:
+            last_page = math.ceil(header["row_count"] / self.page_size)
+            self._set_last_page(unit.site, unit.date, last_page)
+            return self._schedule(unit.site, unit.date, range(unit.page + 1, last_page + 1))
+        if "links" in header:
+            if any(link.get("rel") == "nextPage" for link in header["links"]):
+                return self._schedule(unit.site, unit.date, [unit.page + 1])
+            self._set_last_page(unit.site, unit.date, unit.page)
+            return []
+        if report.rows:
+            return self._schedule(unit.site, unit.date, [unit.page + 1])
+        self._set_last_page(unit.site, unit.date, unit.page - 1)
+        return []
+
+async def download_worker(queue: asyncio.Queue, limiter: AdaptiveLimiter, session: ClientSession, writer: PartitionedWriter, pager: Pager, report_api: str, retry: RetryPolicy, cache: Optional[ResponseCache], on_page: Optional[Callable[[WorkUnit, Optional[Report]], None]] = None, metrics: Optional[DownloadMetrics] = None):
+    """
+    Takes work units from the queue and downloads and stores each one, queueing the pages that follow it, until the worker is cancelled.
+    Pages with rows are marked complete in the checkpoint by the writer once the rows are on disk, empty pages straight away.
+    A page that fails, such as one the server refuses with 401 or 404, is neither followed nor marked complete, so the next run downloads it again.
+    on_page is called with each unit and its report once it is stored, if given. The queue depth and the limiter's limit are kept up to date in metrics if given.
+    """
+    while True:
+        unit = await queue.get()
+        try:
+            if metrics is not None:
+                metrics.queued = queue.qsize()
+                metrics.concurrency_limit = limiter.limit
+            report = await download_and_store_reports(limiter, session, writer, unit.date, unit.date, unit.site, str(unit.page), pager.page_size, report_api, retry, cache, metrics)
+            for next_unit in pager.follow(unit, report):
+                queue.put_nowait(next_unit)
+            if metrics is not None:
+                metrics.queued = queue.qsize()
+            if report is None and pager.checkpoint is not None:
+                pager.checkpoint.mark_complete(*unit)
+            if on_page is not None:
+                on_page(unit, report)
+        except Exception as error:
+            print(f"Failed to download {unit}: {error!r}")
+        finally:
+            queue.task_done()
+
+async def download_all(session: ClientSession, writer: PartitionedWriter, days: Iterable[tuple[str, str]], max_concurrent: int = 10, page_size: int = 10, report_api: str = REPORT_API, limiter: AdaptiveLimiter = None, checkpoint: Optional[Checkpoint] = None, retry: RetryPolicy = RetryPolicy(), cache: Optional[ResponseCache] = None, on_page: Optional[Callable[[WorkUnit, Optional[Report]], None]] = None, metrics: Optional[DownloadMetrics] = None):
+    """
+    Downloads and stores every page of the report of every (site, date) day using max_concurrent workers, the limiter decides how many of them can have a request in flight at once.
+    Every (site, day, page) is put on a queue the workers take from, so many requests are always in flight, and the limiter backs off when the server throttles or slows down.
+    The pager only queues the pages that exist, from the row counts or next links of the pages already downloaded.
+    Pages already completed in the checkpoint are skipped and each completed page is recorded in it, responses are kept in the cache if one is given.
+    Requests, stores and the queue are recorded in metrics if given.
+    The writer's on_flush should mark pages complete in the checkpoint, as main does, so pages are only recorded once their rows are on disk.
+
+    Raises
+    ------
+    ValueError: if the page size is not between 1 and API_MAX_PAGE_SIZE or not the checkpoint's page size
+    """
+    if checkpoint is not None and checkpoint.page_size != page_size:
+        raise ValueError(f"The checkpoint records pages of {checkpoint.page_size} rows, not {page_size}")
+    pager = Pager(page_size, checkpoint)
+    if limiter is None:
+        limiter = AdaptiveLimiter(maximum=max_concurrent) # limit how many api requests can happen at once
+    queue = asyncio.Queue()
+    for unit in pager.first_units(days):
+        queue.put_nowait(unit)
+
+    if metrics is not None:
+        metrics.queued = queue.qsize()
+    workers = [asyncio.create_task(download_worker(queue, limiter, session, writer, pager, report_api, retry, cache, on_page, metrics)) for _ in range(max_concurrent)]
+    try:
+        await queue.join()
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+class DownloadSummary(NamedTuple):
+    """What a download did."""
+    pages: int
+    rows: int
+    cache_hits: int
+    cache_revalidated: int
+    cache_misses: int
+    metrics: DownloadMetrics
+
+async def download(days: Iterable[tuple[str, str]], report_api: str = REPORT_API, output: str = "reports", max_concurrent: int = 10, requests_per_second: float = None, checkpoint: Optional[str] = "checkpoint.sqlite", retry: RetryPolicy = RetryPolicy(), page_size: int = 10, cache: Optional[str] = "http_cache", on_page: Optional[Callable[[WorkUnit, Optional[Report]], None]] = None, connection: ConnectorSettings = ConnectorSettings(),
+                   progress_interval: Optional[float] = None, metrics_path: Optional[str] = None, report: Callable[[str], None] = print) -> DownloadSummary:
+    """
+    Download the reports of every (site, date) day, with date as ddmmyyyy, into the output directory with its own connection pool set up from connection,
+    at most max_concurrent requests in flight and requests_per_second started per second.
+    Each request asks for page_size rows, up to API_MAX_PAGE_SIZE, so larger pages need fewer requests.
+    Pages recorded in the checkpoint database by an earlier run with the same page size are skipped, every page is downloaded if checkpoint is None.
+    Responses are cached in the cache directory, so downloading the same days again needs few or no requests, nothing is cached if cache is None.
+    Every request and store is recorded in the summary's metrics. A progress line is reported every progress_interval seconds if given,
+    and the metrics are written to metrics_path with it and once the download ends, as JSON if it ends in .json and Prometheus text otherwise.
+    """
+    limiter = AdaptiveLimiter(maximum=max_concurrent, requests_per_second=requests_per_second)
+    metrics = DownloadMetrics()
+    counts = {"pages": 0, "rows": 0}
+
+    def count_page(unit: WorkUnit, report: Optional[Report]) -> None:
+        counts["pages"] += 1
+        counts["rows"] += report.rows if report is not None else 0
+        if on_page is not None:
+            on_page(unit, report)
+
+    completed = Checkpoint(checkpoint, page_size) if checkpoint is not None else None
+    responses = ResponseCache(cache) if cache is not None else None
+    progress = asyncio.create_task(report_progress(metrics, progress_interval, report, metrics_path)) if progress_interval else None
+    try:
+        async with connection.session() as session:
+            on_flush = completed.mark_all_complete if completed is not None else None
+            async with PartitionedWriter(output, on_flush=on_flush) as writer:
+                await download_all(session, writer, days, max_concurrent, page_size, report_api, limiter, completed, retry, responses, count_page, metrics)
+    finally:
+        if progress is not None:
+            progress.cancel()
+            await asyncio.gather(progress, return_exceptions=True)
+        if completed is not None:
+            completed.close()
+        if responses is not None:
+            responses.close()
+        if metrics_path is not None:
+            metrics.write_snapshot(metrics_path)
+    if responses is None:
+        return DownloadSummary(counts["pages"], counts["rows"], 0, 0, 0, metrics)
+    return DownloadSummary(counts["pages"], counts["rows"], responses.hits, responses.revalidated, responses.misses, metrics)
+
+async def main(report_api: str = REPORT_API, output: str = "reports", days: range = range(1,31), max_concurrent: int = 10, requests_per_second: float = None, checkpoint: Optional[str] = "checkpoint.sqlite", retry: RetryPolicy = RetryPolicy(), page_size: int = 10, cache: Optional[str] = "http_cache", connection: ConnectorSettings = ConnectorSettings(),
+               progress_interval: Optional[float] = 5.0, metrics_path: Optional[str] = None):
+    """
+    Download a months for of reports for a specific site into the output directory, see download for the other settings.
+    A progress line is printed every progress_interval seconds and a final one when the download ends.
+    Use parallelprocessing.backfill for many sites and date ranges.
+    """
     site = "2"
+    dates = [f"{day:02d}082021" for day in days]
 
-    print("Downloading report data to output.txt")
-    async with ClientSession() as session:
-        async with aiofiles.open("output.txt", mode="a") as file:
-            for day in range(1,31):
-                dateStr = f"{day:02d}082021"
-                await dowload_reports_for_day(sem, session, file, dateStr, site)
+    print(f"Downloading report data to {output}")
+    summary = await download([(site, date) for date in dates], report_api, output, max_concurrent, requests_per_second, checkpoint, retry, page_size, cache,
+                             connection=connection, progress_interval=progress_interval, metrics_path=metrics_path)
+    print(f"Downloaded: {summary.metrics.progress_line(overall=True)}")
+    if cache is not None:
+        print(f"Cache hits: {summary.cache_hits}, revalidated: {summary.cache_revalidated}, misses: {summary.cache_misses}")
     print("Download complete")
 
-asyncio.run(main())
+if __name__ == "__main__":
+    asyncio.run(main())
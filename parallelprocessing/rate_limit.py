@@ -0,0 +1,175 @@
+"""
+    Rate limiting for report downloads
+
+    The adaptive limiter changes how many requests may be in flight from how the server responds, ramping up one request at a time
+    while latency is stable and halving on throttling (429), server errors (5xx), requests that time out or fail to connect,
+    or latency rising well above the best seen (AIMD).
+    The token bucket caps the requests started per second, whatever the number in flight.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    A class to limit how many requests are started per second
+
+    Attributes
+    ----------
+    rate : float
+        How many tokens are added per second
+    capacity : float
+        The most tokens the bucket holds, how many requests can start at once after a quiet spell
+
+    Methods
+    -------
+    acquire():
+        Waits until a token is available and takes it.
+    """
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        """
+        Constructs all the attributes for a token bucket, which starts full
+
+        Parameters
+        ----------
+        rate: float
+            How many requests may start per second
+        capacity: float
+            The most requests that can start at once, 1 if not given
+        """
+        if rate <= 0:
+            raise ValueError("The rate must be above 0")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else 1.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Waits until a token is available and takes it, requests are let through in the order they asked."""
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._tokens = 1.0
+                self._updated = time.monotonic()
+            self._tokens -= 1
+
+
+class AdaptiveLimiter:
+    """
+    A class to limit how many requests are in flight, adapting the limit to how the server responds
+
+    Use `async with limiter:` around each request and call record() with the response status and latency, or failed() if no response arrived.
+
+    Attributes
+    ----------
+    limit : float
+        How many requests may currently be in flight
+    minimum : int
+        The lowest the limit can fall to
+    maximum : int
+        The highest the limit can rise to
+    backoff : float
+        What the limit is multiplied by when the server is struggling
+    latency_tolerance : float
+        How many times the lowest latency seen a response can take before it counts as the server struggling
+    bucket : TokenBucket | None
+        Limits how many requests start per second, if set
+    in_flight : int
+        How many requests are in flight
+
+    Methods
+    -------
+    record(status, latency):
+        Adjusts the limit from the status and latency of a response.
+    failed():
+        Backs off for a request that timed out or could not connect.
+    """
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 64, backoff: float = 0.5, latency_tolerance: float = 2.0, requests_per_second: Optional[float] = None) -> None:
+        """
+        Constructs all the attributes for an adaptive limiter
+
+        Parameters
+        ----------
+        initial: int
+            How many requests may be in flight to start with
+        minimum: int
+            The lowest the limit can fall to
+        maximum: int
+            The highest the limit can rise to
+        backoff: float
+            What the limit is multiplied by when the server is struggling
+        latency_tolerance: float
+            How many times the lowest latency seen a response can take before it counts as the server struggling
+        requests_per_second: float
+            The most requests to start per second, no limit if not given
+        """
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.bucket = TokenBucket(requests_per_second) if requests_per_second else None
+        self.in_flight = 0
+        self._best_latency = None
+        self._latency = None
+        self._since_backoff = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self) -> AdaptiveLimiter:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        if self.bucket is not None:
+            await self.bucket.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def record(self, status: int, latency: float) -> None:
+        """
+        Adjusts the limit from the status and latency of a response.
+
+        Throttling, server errors and slow responses multiply the limit by the backoff, at most once per limit's worth of responses
+        so one burst of failures only backs off once. Otherwise the limit rises by one for every limit's worth of responses.
+
+        Parameters
+        ----------
+        status (int): The HTTP status of the response
+        latency (float): Seconds the response took
+        """
+        self._best_latency = latency if self._best_latency is None else min(self._best_latency, latency)
+        # smooth the latency so one slow response does not count as the server struggling
+        self._latency = latency if self._latency is None else 0.8 * self._latency + 0.2 * latency
+        self._since_backoff += 1
+
+        struggling = status == 429 or status >= 500 or self._latency > self._best_latency * self.latency_tolerance
+        if struggling:
+            self._back_off()
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def failed(self) -> None:
+        """
+        Backs off for a request that got no response, such as one that timed out or could not connect.
+
+        These count as the server struggling like a 5xx response, but their latency is left out of the smoothed latency as it is only how long the request was given.
+        """
+        self._since_backoff += 1
+        self._back_off()
+
+    def _back_off(self) -> None:
+        """Multiplies the limit by the backoff unless it already backed off within the last limit's worth of responses."""
+        if self._since_backoff >= self.limit:
+            self.limit = max(self.minimum, self.limit * self.backoff)
+            self._since_backoff = 0
+            self._latency = self._best_latency
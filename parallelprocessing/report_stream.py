@@ -0,0 +1,287 @@
+"""
+    Incremental report parsing
+
+    Parses a WebTRIS report page as its bytes arrive, so a page never has to be held in memory whole.
+    The top level object is walked key by key, small values such as the Header are decoded whole, and each row of the Rows array
+    is decoded on its own and converted into typed columns of a fixed size batch, handed on whenever the batch fills.
+    Rows are written as JSON lines into a spool that stays in memory while small and moves to a temporary file when large,
+    so the memory used by each request in flight is bounded whatever the page size.
+"""
+from __future__ import annotations
+
+import codecs
+import json
+import tempfile
+from array import array
+from datetime import datetime, timezone
+from typing import Callable, NamedTuple, Optional
+
+MISSING = -1 # stored for a speed or volume the report left blank
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+class RowBatch:
+    """
+    A class to hold report rows as typed columns backed by arrays
+
+    Attributes
+    ----------
+    site : str
+        The site the rows are for
+    capacity : int
+        How many rows the batch holds before it is full
+    timestamp : array
+        Seconds since the epoch, in UTC, at the end of each row's time period
+    interval : array
+        The number of each row's 15 minute period within its day
+    avg_mph : array
+        The average speed of each row, MISSING if blank
+    total_volume : array
+        The number of vehicles of each row, MISSING if blank
+
+    Methods
+    -------
+    append(row):
+        Adds a row as decoded from the report.
+    full():
+        Returns whether the batch holds capacity rows.
+    to_ndjson():
+        Returns the rows as JSON lines.
+    clear():
+        Removes every row.
+    """
+    def __init__(self, site: str, capacity: int = 1024) -> None:
+        """
+        Constructs the empty columns of a batch
+
+        Parameters
+        ----------
+        site: str
+            The site the rows are for
+        capacity: int
+            How many rows the batch holds before it is full
+        """
+        self.site = site
+        self.capacity = capacity
+        self.timestamp = array("q")
+        self.interval = array("H")
+        self.avg_mph = array("h")
+        self.total_volume = array("i")
+        self._days = {}
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def _day_start(self, report_date: str) -> int:
+        """Returns the epoch seconds at the start of a report date, remembering each date as every page repeats them."""
+        start = self._days.get(report_date)
+        if start is None:
+            start = int(datetime.strptime(report_date[:10], "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp())
+            self._days[report_date] = start
+        return start
+
+    def append(self, row: dict) -> None:
+        """
+        Adds a row as decoded from the report.
+
+        Raises
+        ------
+        ValueError, KeyError: if the row is missing a field or a field is not a number
+        """
+        hours, minutes, seconds = row["Time Period Ending"].split(":")
+        self.timestamp.append(self._day_start(row["Report Date"]) + int(hours) * 3600 + int(minutes) * 60 + int(seconds))
+        self.interval.append(int(row["Time Interval"]))
+        self.avg_mph.append(int(row["Avg mph"]) if row.get("Avg mph") else MISSING)
+        self.total_volume.append(int(row["Total Volume"]) if row.get("Total Volume") else MISSING)
+
+    def full(self) -> bool:
+        """Returns whether the batch holds capacity rows."""
+        return len(self.timestamp) >= self.capacity
+
+    def to_ndjson(self) -> bytes:
+        """Returns the rows as JSON lines with the site, timestamp, interval, avg_mph and total_volume of each, blank values as null."""
+        site = json.dumps(self.site)
+        lines = []
+        for timestamp, interval, speed, volume in zip(self.timestamp, self.interval, self.avg_mph, self.total_volume):
+            speed = "null" if speed == MISSING else speed
+            volume = "null" if volume == MISSING else volume
+            lines.append(f'{{"site":{site},"timestamp":{timestamp},"interval":{interval},"avg_mph":{speed},"total_volume":{volume}}}\n')
+        return "".join(lines).encode()
+
+    def clear(self) -> None:
+        """Removes every row, keeping the columns' memory to be reused."""
+        del self.timestamp[:]
+        del self.interval[:]
+        del self.avg_mph[:]
+        del self.total_volume[:]
+
+
+class ReportStreamParser:
+    """
+    A class to parse a report page incrementally from chunks of its body
+
+    Attributes
+    ----------
+    header : dict
+        The Header of the page, empty until it has been parsed or if the page has none
+    rows : int
+        How many rows have been parsed
+
+    Methods
+    -------
+    feed(data):
+        Parses the next chunk of the body.
+    close():
+        Parses what is left of the body and hands on the last rows.
+    """
+    def __init__(self, site: str, on_batch: Callable[[RowBatch], None], batch_rows: int = 1024) -> None:
+        """
+        Constructs a parser for one page
+
+        Parameters
+        ----------
+        site: str
+            The site the page is for
+        on_batch: Callable[[RowBatch], None]
+            Called with each full batch of rows and the last rows, the batch is cleared and reused once it returns
+        batch_rows: int
+            How many rows are handed on at a time
+        """
+        self.header = {}
+        self.rows = 0
+        self.on_batch = on_batch
+        self._batch = RowBatch(site, batch_rows)
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._position = 0
+        self._state = "start"
+        self._key = None
+
+    def feed(self, data: bytes) -> None:
+        """Parses the next chunk of the body, keeping only the part of the body not parsed yet."""
+        self._buffer = self._buffer[self._position:] + self._text.decode(data)
+        self._position = 0
+        self._parse(final=False)
+
+    def close(self) -> None:
+        """
+        Parses what is left of the body and hands on the last rows.
+
+        Raises
+        ------
+        ValueError: if the body is not a complete JSON object
+        """
+        self._buffer = self._buffer[self._position:] + self._text.decode(b"", final=True)
+        self._position = 0
+        self._parse(final=True)
+        if self._state != "done":
+            raise ValueError("The report ended before the end of its JSON object")
+        if len(self._batch):
+            self._hand_on()
+
+    def _hand_on(self) -> None:
+        """Passes the batch on and empties it."""
+        self.on_batch(self._batch)
+        self._batch.clear()
+
+    def _skip_whitespace(self) -> Optional[str]:
+        """Moves past whitespace and returns the next character, or None if the buffer has run out."""
+        buffer = self._buffer
+        position = self._position
+        while position < len(buffer) and buffer[position] in _WHITESPACE:
+            position += 1
+        self._position = position
+        return buffer[position] if position < len(buffer) else None
+
+    def _decode(self, final: bool):
+        """Decodes the JSON value at the position, returning (True, value) or (False, None) if more of the body is needed."""
+        try:
+            value, end = _decoder.raw_decode(self._buffer, self._position)
+        except json.JSONDecodeError:
+            if final:
+                raise ValueError(f"The report is not valid JSON at character {self._position}") from None
+            return False, None
+        # a number cut off by the end of a chunk still decodes, so only trust values followed by more of the body
+        if end == len(self._buffer) and not final:
+            return False, None
+        self._position = end
+        return True, value
+
+    def _parse(self, final: bool) -> None:
+        """Moves through the buffer as far as the complete values in it allow."""
+        while True:
+            character = self._skip_whitespace()
+            if character is None:
+                return
+            state = self._state
+            if state == "start":
+                if character != "{":
+                    raise ValueError("A report must be a JSON object")
+                self._position += 1
+                self._state = "key"
+            elif state == "key":
+                if character == "}":
+                    self._position += 1
+                    self._state = "done"
+                    continue
+                decoded, key = self._decode(final)
+                if not decoded:
+                    return
+                self._key = key
+                self._state = "colon"
+            elif state == "colon":
+                if character != ":":
+                    raise ValueError(f"Expected ':' after {self._key!r}")
+                self._position += 1
+                self._state = "value"
+            elif state == "value":
+                if self._key == "Rows" and character == "[":
+                    self._position += 1
+                    self._state = "row"
+                    continue
+                decoded, value = self._decode(final)
+                if not decoded:
+                    return
+                if self._key == "Header":
+                    self.header = value
+                self._state = "next_key"
+            elif state == "row":
+                if character == "]":
+                    self._position += 1
+                    self._state = "next_key"
+                    continue
+                if character == ",":
+                    self._position += 1
+                    continue
+                decoded, row = self._decode(final)
+                if not decoded:
+                    return
+                self._batch.append(row)
+                self.rows += 1
+                if self._batch.full():
+                    self._hand_on()
+            elif state == "next_key":
+                if character == ",":
+                    self._position += 1
+                    self._state = "key"
+                elif character == "}":
+                    self._position += 1
+                    self._state = "done"
+                else:
+                    raise ValueError(f"Expected ',' or '}}' after {self._key!r}")
+            else:
+                raise ValueError("The report has data after its JSON object")
+
+
+class Report(NamedTuple):
+    """A parsed report page, its rows are JSON lines in the spool."""
+    header: dict
+    rows: int
+    spool: Optional[tempfile.SpooledTemporaryFile]
+
+
+def new_spool(max_memory: int = 256 * 1024) -> tempfile.SpooledTemporaryFile:
+    """Returns a spool for a page's rows that moves from memory to a temporary file once it holds max_memory bytes."""
+    return tempfile.SpooledTemporaryFile(max_size=max_memory)
@@ -0,0 +1,137 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from ..aggregate import SPEED_BINS, Summary, SummaryStore, load_columns, speed_statistics, summarise_columns
+from ..mock_server import start_mock_server
+from ..output import partition_path
+from ..report_stream import MISSING
+from ..parallel_processing import main
+
+
+def ndjson(site, rows):
+    """Returns (timestamp, avg_mph, total_volume) rows as the JSON lines the downloader stores."""
+    return "".join(
+        f'{{"site":"{site}","timestamp":{timestamp},"interval":0,"avg_mph":{"null" if speed is None else speed},'
+        f'"total_volume":{"null" if volume is None else volume}}}\n'
+        for timestamp, speed, volume in rows
+    ).encode()
+
+
+class TestAggregate(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.directory.name, "reports")
+        self.summaries = os.path.join(self.directory.name, "summaries.sqlite")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def store(self, site, date, rows, mode="wb"):
+        path = partition_path(self.output, site, date, compress=False)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, mode) as file:
+            file.write(ndjson(site, rows))
+
+    def test_load_columns(self):
+        """Tests the stored rows are read into columns with blanks as MISSING, whatever digits the site holds, and rows of another shape are refused."""
+        rows = [(1627776000, 40, 10), (1627776900, None, 12), (1627777800, 61, None)]
+        self.store("M25-4012", "01082021", rows)
+        path = partition_path(self.output, "M25-4012", "01082021", compress=False)
+
+        columns = load_columns(path)
+
+        assert columns["timestamp"].tolist() == [row[0] for row in rows]
+        assert columns["interval"].tolist() == [0, 0, 0]
+        assert columns["avg_mph"].tolist() == [40, MISSING, 61]
+        assert columns["total_volume"].tolist() == [10, 12, MISSING]
+        with open(path, "ab") as file:
+            file.write(b'{"site":"M25-4012","timestamp":1,"avg_mph":2}\n')
+        with self.assertRaises(ValueError):
+            load_columns(path)
+
+    def test_blank_and_repeated_rows(self):
+        """Tests blank speeds and volumes are left out and a period stored twice counts once, using the row stored last."""
+        columns = {
+            "timestamp": np.array([1, 2, 3, 1]),
+            "avg_mph": np.array([40, -1, 60, 50]),
+            "total_volume": np.array([5, 7, -1, 10]),
+        }
+
+        rows, total_flow, histogram = summarise_columns(columns)
+
+        assert (rows, total_flow) == (3, 17)
+        assert histogram[50] == 10 and histogram.sum() == 10
+
+    def test_speed_statistics_match_the_vehicles(self):
+        """Tests the mean and percentiles from a histogram match those of the vehicle speeds it counts."""
+        speeds = np.random.default_rng(0).integers(20, 80, 1000)
+        histograms = np.vstack([np.bincount(speeds, minlength=SPEED_BINS), np.zeros(SPEED_BINS, np.int64)])
+
+        means, percentiles = speed_statistics(histograms)
+
+        ordered = np.sort(speeds)
+        assert abs(means[0] - speeds.mean()) < 1e-9
+        # the speed of the vehicle at each percentile, counting from the slowest
+        assert list(percentiles[0]) == [ordered[int(np.ceil(q / 100 * len(speeds))) - 1] for q in (50, 85, 95)]
+        assert np.isnan(means[1]) and list(percentiles[1]) == [-1, -1, -1]
+
+    def test_only_new_or_changed_partitions_are_summarised(self):
+        """Tests each update loads only the partitions that changed, and days and months are grouped from the stored summaries."""
+        self.store("2", "01082021", [(1, 40, 10), (2, 60, 10)])
+        self.store("2", "02082021", [(3, 50, 20)])
+        self.store("3", "01092021", [(4, None, 5)])
+
+        with SummaryStore(self.summaries) as store:
+            assert store.update(self.output) == 3
+            assert store.update(self.output) == 0
+            self.store("2", "02082021", [(4, 70, 20)], mode="ab")
+            assert store.update(self.output) == 1
+
+            assert store.summaries("day", site="2") == [
+                Summary("2", "2021-08-01", 2, 20, 50.0, 40, 60, 60),
+                Summary("2", "2021-08-02", 2, 40, 60.0, 50, 70, 70),
+            ]
+            assert store.summaries("month") == [
+                Summary("2", "2021-08", 4, 60, 3400 / 60, 50, 70, 70),
+                Summary("3", "2021-09", 1, 5, None, None, None, None),
+            ]
+
+            os.remove(partition_path(self.output, "3", "01092021", compress=False))
+            assert store.update(self.output) == 0
+            assert [summary.site for summary in store.summaries("month")] == ["2"]
+            with self.assertRaises(ValueError):
+                store.summaries("week")
+
+        with SummaryStore(self.summaries) as store:
+            assert store.update(self.output) == 0
+
+
+class TestAggregateDownload(unittest.IsolatedAsyncioTestCase):
+    @patch("sys.stdout", new_callable=io.StringIO)
+    async def test_summarises_downloaded_reports(self, mock_stdout):
+        """Tests the partitions the downloader writes are summarised with every row counted."""
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "reports")
+            runner, report_api = await start_mock_server()
+            try:
+                await main(report_api=report_api, output=output, days=range(1, 3), checkpoint=None, cache=None)
+            finally:
+                await runner.cleanup()
+
+            with SummaryStore(os.path.join(directory, "summaries.sqlite")) as store:
+                assert store.update(output) == 2
+                days = store.summaries("day")
+                month = store.summaries("month")
+
+        assert [(summary.period, summary.rows) for summary in days] == [("2021-08-01", 96), ("2021-08-02", 96)]
+        assert month[0].rows == 2 * 96
+        assert month[0].total_flow == sum(summary.total_flow for summary in days)
+
+
+if __name__ == "__main__":
+    unittest.main()
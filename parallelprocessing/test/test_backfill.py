@@ -0,0 +1,83 @@
+import asyncio
+import io
+import os
+import tempfile
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+from ..backfill import BackfillSettings, backfill, backfill_days, parse_date_range, shard_days
+from ..mock_server import STATS, start_mock_server
+from ..output import partition_path, read_partition
+from ..parallel_processing import main
+
+
+class TestBackfillDays(unittest.TestCase):
+    def test_parse_date_range(self):
+        """Tests months, single days and ranges of days are expanded to every day."""
+        assert parse_date_range("2021-02") == [date(2021, 2, day) for day in range(1, 29)]
+        assert parse_date_range("2021-12")[-1] == date(2021, 12, 31)
+        assert parse_date_range("2021-08-05") == [date(2021, 8, 5)]
+        assert parse_date_range("2021-08-30:2021-09-02") == [date(2021, 8, 30), date(2021, 8, 31), date(2021, 9, 1), date(2021, 9, 2)]
+        with self.assertRaises(ValueError):
+            parse_date_range("2021-09-02:2021-08-30")
+
+    def test_days_are_split_between_shards(self):
+        """Tests every day of every site is in exactly one shard and the shards are the same size to within one day."""
+        days = backfill_days(["2", "5", "2"], ["2021-08-01:2021-08-05", "2021-08-04:2021-08-06"])
+        shards = shard_days(days, 4)
+
+        assert len(days) == 2 * 6
+        assert sorted(day for shard in shards for day in shard) == sorted(days)
+        assert {len(shard) for shard in shards} == {3}
+        assert len(shard_days(days[:2], 4)) == 2
+
+
+class TestBackfill(unittest.IsolatedAsyncioTestCase):
+    async def test_shards_download_every_day_into_one_output(self):
+        """Tests a backfill across processes stores every day of every site once and totals the shards' progress."""
+        runner, report_api = await start_mock_server()
+        lines = []
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                settings = BackfillSettings(
+                    report_api=report_api, output=os.path.join(directory, "reports"), page_size=48,
+                    checkpoint=os.path.join(directory, "checkpoint.sqlite"), cache=None,
+                )
+                # the mock server runs on this event loop, so the blocking backfill runs in a thread
+                results = await asyncio.get_running_loop().run_in_executor(None, lambda: backfill(["2", "5"], ["2021-08-01:2021-08-03"], 2, settings, 0.05, lines.append))
+
+                for site in ("2", "5"):
+                    for day in ("01082021", "02082021", "03082021"):
+                        rows = read_partition(partition_path(settings.output, site, day))
+                        assert sorted(row["interval"] for row in rows) == list(range(96))
+                        assert {row["site"] for row in rows} == {site}
+        finally:
+            await runner.cleanup()
+
+        assert sorted(result.days for result in results) == [3, 3]
+        assert sum(result.pages for result in results) == 6 * 2
+        assert sum(result.rows for result in results) == 6 * 96
+        assert runner.app[STATS]["requests"] == 6 * 2
+        assert lines[-1].startswith("Backfill complete: 12 pages, 576 rows")
+
+    @patch("sys.stdout", new_callable=io.StringIO)
+    async def test_shares_a_checkpoint_with_the_downloader(self, mock_stdout):
+        """Tests a backfill with its default page size downloads every row of days the downloader already finished with its smaller pages in the same checkpoint."""
+        runner, report_api = await start_mock_server()
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                checkpoint = os.path.join(directory, "checkpoint.sqlite")
+                await main(report_api=report_api, output=os.path.join(directory, "downloaded"), days=range(1, 2), checkpoint=checkpoint, cache=None)
+                settings = BackfillSettings(report_api=report_api, output=os.path.join(directory, "reports"), checkpoint=checkpoint, cache=None)
+                results = await asyncio.get_running_loop().run_in_executor(None, lambda: backfill(["2"], ["2021-08-01"], 1, settings, 0.05, lambda line: None))
+
+                assert len(read_partition(partition_path(settings.output, "2", "01082021"))) == 96
+        finally:
+            await runner.cleanup()
+
+        assert results[0].rows == 96
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from ..checkpoint import Checkpoint
+from ..mock_server import STATS, start_mock_server
+from ..output import partition_path, read_partition
+from ..parallel_processing import RetryPolicy, WorkUnit, main
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "checkpoint.sqlite")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_completed_units_are_remembered(self):
+        """Tests completed units are recorded and survive reopening the checkpoint."""
+        with Checkpoint(self.path) as checkpoint:
+            checkpoint.mark_complete("2", "01082021", 1)
+            checkpoint.mark_complete("2", "01082021", 1)
+
+        with Checkpoint(self.path) as checkpoint:
+            assert checkpoint.is_complete("2", "01082021", 1)
+            assert not checkpoint.is_complete("2", "01082021", 2)
+
+    def test_remaining_units(self):
+        """Tests only units that have not been completed remain, in their original order."""
+        units = [WorkUnit("2", "01082021", page) for page in range(1, 5)]
+        with Checkpoint(self.path) as checkpoint:
+            checkpoint.mark_complete("2", "01082021", 2)
+
+            assert checkpoint.remaining(units) == [units[0], units[2], units[3]]
+
+    def test_last_pages_are_remembered(self):
+        """Tests the last page of a day is unknown until it is recorded and survives reopening the checkpoint."""
+        with Checkpoint(self.path) as checkpoint:
+            assert checkpoint.last_page("2", "01082021") is None
+            checkpoint.mark_complete("2", "01082021", 1)
+            checkpoint.mark_complete("2", "01082021", 3)
+            checkpoint.mark_last_page("2", "01082021", 4)
+
+        with Checkpoint(self.path) as checkpoint:
+            assert checkpoint.last_page("2", "01082021") == 4
+            assert checkpoint.completed_pages("2", "01082021") == {1, 3}
+
+    def test_retry_delay_is_capped_and_jittered(self):
+        """Tests the retry delay is random, grows with each attempt and never passes the cap."""
+        retry = RetryPolicy(attempts=10, base_delay=1.0, max_delay=8.0)
+
+        delays = [retry.delay(attempt) for attempt in range(10) for _ in range(20)]
+
+        assert all(0 <= delay <= 8.0 for delay in delays)
+        assert all(delay <= 1.0 for delay in delays[:20])
+        assert len(set(delays)) > 100
+
+    def test_pages_are_kept_apart_by_page_size(self):
+        """Tests pages recorded for one page size are not seen by a checkpoint of another, and older checkpoints are refused."""
+        with Checkpoint(self.path, page_size=10) as checkpoint:
+            checkpoint.mark_all_complete([("2", "01082021", page) for page in range(1, 11)])
+            checkpoint.mark_last_page("2", "01082021", 10)
+
+        with Checkpoint(self.path, page_size=1000) as checkpoint:
+            assert checkpoint.last_page("2", "01082021") is None
+            assert checkpoint.completed_pages("2", "01082021") == set()
+            assert checkpoint.remaining([WorkUnit("2", "01082021", 1)]) == [WorkUnit("2", "01082021", 1)]
+            assert not checkpoint.is_complete("2", "01082021", 1)
+        with Checkpoint(self.path, page_size=10) as checkpoint:
+            assert checkpoint.last_page("2", "01082021") == 10
+
+        old_path = os.path.join(self.directory.name, "old.sqlite")
+        with sqlite3.connect(old_path) as connection:
+            connection.execute("CREATE TABLE completed (site TEXT, date TEXT, page INTEGER)")
+        with self.assertRaises(ValueError):
+            Checkpoint(old_path)
+
+
+class TestResumableDownload(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.directory.name, "reports")
+        self.checkpoint = os.path.join(self.directory.name, "checkpoint.sqlite")
+
+    async def asyncTearDown(self):
+        self.directory.cleanup()
+
+    @patch("sys.stdout", new_callable=io.StringIO)
+    async def test_rerun_skips_completed_pages(self, mock_stdout):
+        """Tests a second run only requests the pages the first run did not complete."""
+        with Checkpoint(self.checkpoint) as checkpoint:
+            for page in range(1, 6):
+                checkpoint.mark_complete("2", "01082021", page)
+
+        runner, report_api = await start_mock_server()
+        try:
+            await main(report_api=report_api, output=self.output, days=range(1, 2), checkpoint=self.checkpoint, cache=None)
+            first_run = runner.app[STATS]["requests"]
+            await main(report_api=report_api, output=self.output, days=range(1, 2), checkpoint=self.checkpoint, cache=None)
+        finally:
+            await runner.cleanup()
+
+        # the first missing page gives the total rows, so only pages 6 to 10 are requested
+        assert first_run == 10 - 5
+        assert runner.app[STATS]["requests"] == first_run
+        with Checkpoint(self.checkpoint) as checkpoint:
+            assert checkpoint.last_page("2", "01082021") == 10
+
+    @patch("sys.stdout", new_callable=io.StringIO)
+    async def test_rerun_with_another_page_size_downloads_every_row(self, mock_stdout):
+        """Tests a run with larger pages after a finished run with small pages downloads the whole day again rather than skipping it."""
+        runner, report_api = await start_mock_server()
+        try:
+            await main(report_api=report_api, output=self.output, days=range(1, 2), checkpoint=self.checkpoint, cache=None, page_size=10)
+            first_run = runner.app[STATS]["requests"]
+            await main(report_api=report_api, output=os.path.join(self.directory.name, "large"), days=range(1, 2), checkpoint=self.checkpoint, cache=None, page_size=1000)
+        finally:
+            await runner.cleanup()
+
+        assert runner.app[STATS]["requests"] == first_run + 1
+        assert len(read_partition(partition_path(os.path.join(self.directory.name, "large"), "2", "01082021"))) == 96
+        with Checkpoint(self.checkpoint, page_size=1000) as checkpoint:
+            assert checkpoint.last_page("2", "01082021") == 1
+
+    @patch("sys.stdout", new_callable=io.StringIO)
+    async def test_server_errors_are_retried(self, mock_stdout):
+        """Tests pages that fail with server errors are retried until every page is complete."""
+        runner, report_api = await start_mock_server(error_rate=0.3)
+        try:
+            await main(report_api=report_api, output=self.output, days=range(1, 2), checkpoint=self.checkpoint, cache=None, retry=RetryPolicy(attempts=20, base_delay=0.001, max_delay=0.01))
+        finally:
+            await runner.cleanup()
+
+        stats = runner.app[STATS]
+        assert stats["errors"] > 0
+        assert stats["requests"] == 10 + stats["errors"]
+        with Checkpoint(self.checkpoint) as checkpoint:
+            assert checkpoint.remaining([WorkUnit("2", "01082021", page) for page in range(1, 11)]) == []
+
+
+    @patch("sys.stdout", new_callable=io.StringIO)
+    async def test_refused_pages_are_left_for_the_next_run(self, mock_stdout):
+        """Tests a page the server refuses with 404 or 401 does not end its day, so the next run downloads the whole day."""
+        for status in (404, 401):
+            checkpoint_path = os.path.join(self.directory.name, f"checkpoint-{status}.sqlite")
+            output = os.path.join(self.directory.name, f"reports-{status}")
+            runner, report_api = await start_mock_server(refusals=[status])
+            try:
+                await main(report_api=report_api, output=output, days=range(1, 2), checkpoint=checkpoint_path, cache=None)
+                with Checkpoint(checkpoint_path) as checkpoint:
+                    assert checkpoint.last_page("2", "01082021") is None
+                    assert checkpoint.completed_pages("2", "01082021") == set()
+                await main(report_api=report_api, output=output, days=range(1, 2), checkpoint=checkpoint_path, cache=None)
+            finally:
+                await runner.cleanup()
+
+            assert runner.app[STATS]["requests"] == 1 + 10
+            assert f"returned {status}" in mock_stdout.getvalue()
+            assert len(read_partition(partition_path(output, "2", "01082021"))) == 96
+            with Checkpoint(checkpoint_path) as checkpoint:
+                assert checkpoint.last_page("2", "01082021") == 10
+
+
+if __name__ == "__main__":
+    unittest.main()
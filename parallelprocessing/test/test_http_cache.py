@@ -0,0 +1,117 @@
+import io
+import os
+import tempfile
+import unittest
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from ..http_cache import EVICT_TO, ResponseCache, cache_key
+from ..mock_server import STATS, start_mock_server
+from ..parallel_processing import main
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "cache")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_responses_are_stored_with_their_headers(self):
+        """Tests a stored response is returned with its validators and survives reopening the cache."""
+        with ResponseCache(self.path) as cache:
+            assert cache.get("http://localhost/report", {"page": "1"}) is None
+            cache.put("http://localhost/report", {"page": "1", "sites": "2"}, '{"Rows": []}', '"abc"', "Sun, 01 Aug 2021 00:00:00 GMT")
+
+        with ResponseCache(self.path) as cache:
+            cached = cache.get("http://localhost/report", {"sites": "2", "page": "1"})
+
+        assert cached.read() == '{"Rows": []}'
+        assert cached.conditional_headers() == {"If-None-Match": '"abc"', "If-Modified-Since": "Sun, 01 Aug 2021 00:00:00 GMT"}
+        assert cache_key("http://localhost/report", {"a": "1", "b": "2"}) == cache_key("http://localhost/report", {"b": "2", "a": "1"})
+
+    def test_least_recently_used_responses_are_evicted(self):
+        """Tests the cache removes the least recently used responses once it is bigger than its limit, down to room for two bodies of about 680 bytes."""
+        body = os.urandom(600).hex()
+        with ResponseCache(self.path, max_bytes=1600) as cache:
+            cache.put("http://localhost/report", {"page": "1"}, body)
+            cache.put("http://localhost/report", {"page": "2"}, body)
+            cache.get("http://localhost/report", {"page": "1"})
+            cache.put("http://localhost/report", {"page": "3"}, body)
+
+            assert cache.get("http://localhost/report", {"page": "2"}) is None
+            assert cache.get("http://localhost/report", {"page": "1"}) is not None
+            assert cache.get("http://localhost/report", {"page": "3"}) is not None
+            assert cache.size() <= 1600 * EVICT_TO
+
+    def test_size_is_kept_without_summing_the_index(self):
+        """Tests the size is a running total that replaced and missing bodies are taken off, and inserts only count the index again when evicting."""
+        body = os.urandom(300).hex()
+        with ResponseCache(self.path, max_bytes=20_000) as cache:
+            statements = []
+            cache._connection.set_trace_callback(statements.append)
+            for page in range(100):
+                cache.put("http://localhost/report", {"page": str(page)}, body)
+            cache.put("http://localhost/report", {"page": "99"}, body)
+
+            sums = sum("SUM(size)" in statement for statement in statements)
+            assert 0 < sums <= 100 // 10
+            assert cache.size() == cache._stored_size() <= 20_000
+            os.remove(cache.get("http://localhost/report", {"page": "99"}).path)
+            assert cache.get("http://localhost/report", {"page": "99"}) is None
+            assert cache.size() == cache._stored_size()
+
+        with ResponseCache(self.path, max_bytes=20_000) as cache:
+            assert cache.size() == cache._stored_size() > 0
+
+    def test_only_old_days_are_settled(self):
+        """Tests days older than the revalidation window are settled and recent days are not."""
+        with ResponseCache(self.path, revalidate_days=7) as cache:
+            assert cache.is_settled(date.today() - timedelta(days=30))
+            assert not cache.is_settled(date.today() - timedelta(days=2))
+
+
+class TestCachedDownload(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.directory.name, "reports")
+        self.cache = os.path.join(self.directory.name, "cache")
+
+    async def asyncTearDown(self):
+        self.directory.cleanup()
+
+    @patch("sys.stdout", new_callable=io.StringIO)
+    async def test_settled_days_are_served_from_the_cache(self, mock_stdout):
+        """Tests downloading past days a second time makes no requests."""
+        runner, report_api = await start_mock_server()
+        try:
+            await main(report_api=report_api, output=self.output, days=range(1, 3), checkpoint=None, cache=self.cache)
+            first_run = runner.app[STATS]["requests"]
+            await main(report_api=report_api, output=self.output, days=range(1, 3), checkpoint=None, cache=self.cache)
+        finally:
+            await runner.cleanup()
+
+        assert first_run == 2 * 10
+        assert runner.app[STATS]["requests"] == first_run
+        assert "Cache hits: 20, revalidated: 0, misses: 0" in mock_stdout.getvalue()
+
+    @patch("sys.stdout", new_callable=io.StringIO)
+    async def test_recent_days_are_revalidated(self, mock_stdout):
+        """Tests cached responses for days that may still change are revalidated and the server answers 304."""
+        runner, report_api = await start_mock_server()
+        try:
+            with patch("parallelprocessing.http_cache.ResponseCache.is_settled", return_value=False):
+                await main(report_api=report_api, output=self.output, days=range(1, 3), checkpoint=None, cache=self.cache)
+                await main(report_api=report_api, output=self.output, days=range(1, 3), checkpoint=None, cache=self.cache)
+        finally:
+            await runner.cleanup()
+
+        stats = runner.app[STATS]
+        assert stats["requests"] == 2 * 2 * 10
+        assert stats["not_modified"] == 2 * 10
+        assert "Cache hits: 0, revalidated: 20, misses: 0" in mock_stdout.getvalue()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import argparse
+import unittest
+
+from ..connection import ConnectorSettings, add_connection_arguments, connection_settings
+from ..loadtest import load_test, percentile
+from ..mock_server import STATS, start_mock_server
+
+
+class TestLoadTest(unittest.IsolatedAsyncioTestCase):
+    def test_percentile(self):
+        """Tests percentiles are picked from sorted latencies."""
+        latencies = [float(value) for value in range(1, 101)]
+
+        assert percentile(latencies, 50) == 51.0
+        assert percentile(latencies, 99) == 99.0
+        assert percentile([], 99) == 0.0
+
+    def test_connection_settings_from_the_command_line(self):
+        """Tests the connection options fill in the connector settings, with the defaults when not given."""
+        parser = argparse.ArgumentParser()
+        add_connection_arguments(parser)
+
+        settings = connection_settings(parser.parse_args(["--limit-per-host", "8", "--no-dns-cache", "--timeout", "10"]))
+
+        assert settings == ConnectorSettings()._replace(limit_per_host=8, use_dns_cache=False, total_timeout=10.0)
+        assert settings.timeout().total == 10.0
+
+    async def test_reports_throughput_latency_and_statuses(self):
+        """Tests every request is counted by status with its latency."""
+        results = await load_test(requests=200, concurrency=20, error_rate=0.25)
+
+        assert results["requests"] == 200
+        assert set(results["statuses"]) == {200, 503}
+        assert sum(results["statuses"].values()) == 200
+        assert results["requests_per_second"] > 0
+        assert 0 < results["p50_ms"] <= results["p90_ms"] <= results["p99_ms"] <= results["max_ms"]
+
+    async def test_connections_per_host_are_limited(self):
+        """Tests the connector's per host limit caps the requests the server sees at once, however many are sent."""
+        runner, report_api = await start_mock_server(latency=0.01)
+        try:
+            results = await load_test(report_api, requests=60, concurrency=30, connection=ConnectorSettings(limit_per_host=3))
+        finally:
+            await runner.cleanup()
+
+        assert results["statuses"] == {200: 60}
+        assert runner.app[STATS]["max_in_flight"] == 3
+
+
+if __name__ == "__main__":
+    unittest.main()
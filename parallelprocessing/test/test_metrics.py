@@ -0,0 +1,92 @@
+import json
+import os
+import tempfile
+import unittest
+
+from ..metrics import DownloadMetrics, Histogram
+from ..mock_server import STATS, start_mock_server
+from ..parallel_processing import RetryPolicy, download
+
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram_buckets_and_quantiles(self):
+        """Tests values are counted in the first bucket whose bound they do not exceed and quantiles are read from the buckets."""
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+
+        assert histogram.counts == [2, 1, 1]
+        assert histogram.count == 4
+        assert histogram.quantile(0.5) == 0.1
+        assert histogram.quantile(0.75) == 1.0
+        assert histogram.quantile(1.0) == float("inf")
+        assert Histogram().quantile(0.5) == 0.0
+
+    def test_requests_are_counted_by_status(self):
+        """Tests statuses and error names are counted and in flight requests go back down when they finish."""
+        metrics = DownloadMetrics()
+        for status in (200, 200, 503, "TimeoutError"):
+            metrics.request_started()
+            metrics.request_finished(status, 0.01, 100 if status == 200 else 0)
+
+        assert metrics.statuses == {200: 2, 503: 1, "TimeoutError": 1}
+        assert metrics.in_flight == 0
+        assert metrics.response_bytes == 200
+        assert "1 server errors" in metrics.progress_line()
+
+    def test_prometheus_text(self):
+        """Tests histograms are written with cumulative buckets and statuses as labels."""
+        metrics = DownloadMetrics()
+        metrics.request_started()
+        metrics.request_finished(200, 0.003, 10)
+        metrics.stored(0.02, 96)
+
+        text = metrics.prometheus()
+
+        assert 'report_download_request_seconds_bucket{le="0.0025"} 0' in text
+        assert 'report_download_request_seconds_bucket{le="0.005"} 1' in text
+        assert 'report_download_request_seconds_bucket{le="+Inf"} 1' in text
+        assert 'report_download_responses_total{status="200"} 1' in text
+        assert "report_download_rows_total 96" in text
+        assert "# TYPE report_download_in_flight_requests gauge" in text
+
+
+class TestDownloadMetrics(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.directory.name, "reports")
+
+    async def asyncTearDown(self):
+        self.directory.cleanup()
+
+    async def test_download_records_every_request_and_store(self):
+        """Tests a download counts every request, retry and stored page, reports progress and writes its snapshot."""
+        snapshot = os.path.join(self.directory.name, "metrics.json")
+        lines = []
+        runner, report_api = await start_mock_server(latency=0.01, error_rate=0.2)
+        try:
+            summary = await download(
+                [("2", "01082021"), ("2", "02082021")], report_api, self.output, checkpoint=None, cache=None,
+                retry=RetryPolicy(attempts=20, base_delay=0.001, max_delay=0.01),
+                progress_interval=0.01, metrics_path=snapshot, report=lines.append,
+            )
+        finally:
+            await runner.cleanup()
+
+        metrics = summary.metrics
+        stats = runner.app[STATS]
+        assert metrics.request_seconds.count == stats["requests"]
+        assert metrics.statuses[200] == 2 * 10
+        assert metrics.statuses[503] == stats["errors"] == metrics.retries
+        assert metrics.pages == metrics.store_seconds.count == 2 * 10
+        assert metrics.rows == summary.rows == 2 * 96
+        assert metrics.in_flight == 0
+        assert lines and lines[0].startswith("Progress: ")
+        with open(snapshot) as file:
+            written = json.load(file)
+        assert written["pages"] == 2 * 10
+        assert written["request_seconds"]["count"] == stats["requests"]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+import gzip
+import io
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from ..checkpoint import Checkpoint
+from ..mock_server import start_mock_server
+from ..output import PartitionedWriter, ReportReader, index_path, parse_rows, partition_path, read_partition
+from ..parallel_processing import main
+
+
+class TestPartitionedWriter(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.directory.name, "reports")
+
+    async def asyncTearDown(self):
+        self.directory.cleanup()
+
+    async def test_rows_are_partitioned_by_site_and_day(self):
+        """Tests rows are written as json lines to a gzip file for each site and day."""
+        async with PartitionedWriter(self.output) as writer:
+            await writer.write("2", "01082021", b'{"avg_mph":50}\n{"avg_mph":60}\n')
+            await writer.write("3", "01082021", b'{"avg_mph":40}\n')
+
+        path = partition_path(self.output, "2", "01082021")
+        assert path == os.path.join(self.output, "site=2", "date=2021-08-01", "rows.ndjson.gz")
+        with gzip.open(path, "rt") as file:
+            assert file.read() == '{"avg_mph":50}\n{"avg_mph":60}\n'
+        assert read_partition(partition_path(self.output, "3", "01082021")) == [{"avg_mph": 40}]
+
+    async def test_batches_are_appended_in_order(self):
+        """Tests a full buffer is written straight away and later batches are appended after it."""
+        flushed = []
+        async with PartitionedWriter(self.output, compress=False, buffer_bytes=30, on_flush=flushed.extend) as writer:
+            await writer.write("2", "01082021", b'{"row":1}\n{"row":2}\n{"row":3}\n', tag=1)
+            assert flushed == [1]
+            await writer.write("2", "01082021", b'{"row":4}\n', tag=2)
+            assert flushed == [1]
+
+        assert flushed == [1, 2]
+        assert read_partition(partition_path(self.output, "2", "01082021", compress=False)) == [{"row": row} for row in range(1, 5)]
+
+
+class TestReportReader(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.directory.name, "reports")
+
+    async def asyncTearDown(self):
+        self.directory.cleanup()
+
+    async def test_pages_split_over_batches_are_read_back_whole(self):
+        """Tests a page written over several batches is indexed in parts and read back from the map, without a copy when it is in one batch."""
+        first = b"".join(b'{"row":%d}\n' % row for row in range(20))
+        second = b'{"row":20}\n'
+        async with PartitionedWriter(self.output, compress=False, buffer_bytes=64) as writer:
+            await writer.write_file("2", "01082021", io.BytesIO(first), chunk_size=50, page=1)
+            await writer.write("2", "01082021", second, page=2)
+            await writer.write("2", "01082021", b'{"row":"unindexed"}\n')
+
+        with ReportReader(self.output, compress=False) as reader:
+            assert reader.page("2", "01082021", 1) == first
+            page = reader.page("2", "01082021", 2)
+            assert isinstance(page, memoryview) and page == second
+            page.release()
+            with self.assertRaises(KeyError):
+                reader.page("2", "01082021", 3)
+            assert parse_rows(reader.day("2", "01082021"))[-1] == {"row": "unindexed"}
+
+    async def test_compressed_pages_and_date_ranges(self):
+        """Tests pages are found in compressed batches, a page written again replaces the earlier one in pages and days and a range skips days with nothing stored."""
+        async with PartitionedWriter(self.output, buffer_bytes=16) as writer:
+            for page in range(1, 4):
+                await writer.write("2", "01082021", b'{"page":%d}\n' % page, page=page)
+            await writer.write("2", "01082021", b'{"page":2,"again":true}\n', page=2)
+            await writer.write("2", "03082021", b'{"page":1}\n', page=1)
+
+        assert os.path.exists(index_path(partition_path(self.output, "2", "01082021")))
+        with ReportReader(self.output) as reader:
+            assert parse_rows(reader.page("2", "01082021", 3)) == [{"page": 3}]
+            assert parse_rows(reader.page("2", "01082021", 2)) == [{"page": 2, "again": True}]
+            assert [(date, len(parse_rows(data))) for date, data in reader.days("2", "31072021", "03082021")] == [("01082021", 3), ("03082021", 1)]
+            assert parse_rows(reader.day("2", "01082021")) == [{"page": 1}, {"page": 3}, {"page": 2, "again": True}]
+            with self.assertRaises(FileNotFoundError):
+                reader.page("2", "02082021", 1)
+
+    async def test_pages_written_again_are_read_once(self):
+        """Tests a page written again after a crash, in parts that share batches with other pages, is read back once from days and partitions."""
+        first = b"".join(b'{"page":1,"row":%d}\n' % row for row in range(6))
+        async with PartitionedWriter(self.output, compress=False, buffer_bytes=64) as writer:
+            await writer.write_file("2", "01082021", io.BytesIO(first), chunk_size=40, page=1)
+            await writer.write("2", "01082021", b'{"page":2}\n', page=2)
+            await writer.write("2", "01082021", b'{"page":"unindexed"}\n')
+            await writer.write_file("2", "01082021", io.BytesIO(first), chunk_size=40, page=1)
+
+        path = partition_path(self.output, "2", "01082021", compress=False)
+        expected = [{"page": 2}, {"page": "unindexed"}] + parse_rows(first)
+        with open(path, "rb") as file:
+            assert file.read().count(b"\n") == 2 * 6 + 2
+        with ReportReader(self.output, compress=False) as reader:
+            assert parse_rows(reader.day("2", "01082021")) == expected
+        assert read_partition(path) == expected
+
+
+class TestStoredDownload(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.directory.name, "reports")
+        self.checkpoint = os.path.join(self.directory.name, "checkpoint.sqlite")
+
+    async def asyncTearDown(self):
+        self.directory.cleanup()
+
+    @patch("sys.stdout", new_callable=io.StringIO)
+    async def test_every_row_is_stored_once_and_checkpointed(self, mock_stdout):
+        """Tests each day's rows are stored in order in their partition and every page is checkpointed once written."""
+        runner, report_api = await start_mock_server()
+        try:
+            await main(report_api=report_api, output=self.output, days=range(1, 3), checkpoint=self.checkpoint, cache=None)
+        finally:
+            await runner.cleanup()
+
+        for date in ("01082021", "02082021"):
+            rows = read_partition(partition_path(self.output, "2", date))
+            day_start = int(datetime(2021, 8, int(date[:2]), tzinfo=timezone.utc).timestamp())
+            assert sorted(row["interval"] for row in rows) == list(range(96))
+            assert sorted(row["timestamp"] for row in rows) == [day_start + 15 * 60 * interval + 14 * 60 for interval in range(96)]
+            assert {row["site"] for row in rows} == {"2"}
+        with Checkpoint(self.checkpoint) as checkpoint:
+            assert checkpoint.completed_pages("2", "01082021") == set(range(1, 11))
+        with ReportReader(self.output) as reader:
+            pages = [parse_rows(reader.page("2", "01082021", page)) for page in range(1, 11)]
+        assert [len(rows) for rows in pages] == [10] * 9 + [6]
+        assert sorted(row["interval"] for rows in pages for row in rows) == list(range(96))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import io
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from ..mock_server import STATS, start_mock_server
+from ..parallel_processing import API_MAX_PAGE_SIZE, Pager, WorkUnit, main
+from ..report_stream import Report
+
+
+class TestPager(unittest.TestCase):
+    def test_total_rows_schedules_every_page(self):
+        """Tests the total rows in the first page schedules every other page of the day at once."""
+        pager = Pager(page_size=10)
+        first = pager.first_units([("2", "01082021")])
+
+        units = pager.follow(first[0], Report({"row_count": 96, "links": []}, 10, None))
+
+        assert first == [WorkUnit("2", "01082021", 1)]
+        assert units == [WorkUnit("2", "01082021", page) for page in range(2, 11)]
+        assert pager.last_pages == {("2", "01082021"): 10}
+        assert pager.follow(units[0], Report({"row_count": 96, "links": []}, 10, None)) == []
+
+    def test_next_page_link_schedules_the_next_page(self):
+        """Tests a page with a next page link schedules the page after it and a page without one ends the day."""
+        pager = Pager(page_size=10)
+        unit = WorkUnit("2", "01082021", 1)
+        link = {"rel": "nextPage", "href": "http://localhost/?page=2"}
+
+        assert pager.follow(unit, Report({"links": [link]}, 1, None)) == [WorkUnit("2", "01082021", 2)]
+        assert pager.follow(WorkUnit("2", "01082021", 2), Report({"links": []}, 1, None)) == []
+        assert pager.last_pages == {("2", "01082021"): 2}
+
+    def test_without_metadata_stops_at_the_first_empty_page(self):
+        """Tests pages without metadata are followed while they have rows and the day ends at an empty or failed page."""
+        pager = Pager(page_size=10)
+
+        assert pager.follow(WorkUnit("2", "01082021", 1), Report({}, 1, None)) == [WorkUnit("2", "01082021", 2)]
+        assert pager.follow(WorkUnit("2", "01082021", 2), Report({}, 0, None)) == []
+        assert pager.follow(WorkUnit("2", "02082021", 1), None) == []
+        assert pager.last_pages == {("2", "01082021"): 1, ("2", "02082021"): 0}
+
+    def test_page_size_is_capped(self):
+        """Tests page sizes outside 1 to the api maximum are refused."""
+        with self.assertRaises(ValueError):
+            Pager(page_size=0)
+        with self.assertRaises(ValueError):
+            Pager(page_size=API_MAX_PAGE_SIZE + 1)
+
+
+class TestParallelProcessing(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.directory.name, "reports")
+
+    async def asyncTearDown(self):
+        self.directory.cleanup()
+
+    @patch("sys.stdout", new_callable=io.StringIO)
+    async def test_requests_run_concurrently_up_to_the_cap(self, mock_stdout):
+        """Tests every page that exists is requested, with many requests in flight at once but never more than the cap."""
+        runner, report_api = await start_mock_server(latency=0.05)
+        try:
+            started = time.perf_counter()
+            await main(report_api=report_api, output=self.output, days=range(1, 5), max_concurrent=10, checkpoint=None, cache=None)
+            elapsed = time.perf_counter() - started
+        finally:
+            await runner.cleanup()
+
+        stats = runner.app[STATS]
+        # 96 rows a day is 10 pages of 10 rows
+        assert stats["requests"] == 4 * 10
+        assert 4 <= stats["max_in_flight"] <= 10
+        # one request at a time would take at least 4 * 10 * 0.05 seconds
+        assert elapsed < 4 * 10 * 0.05 / 2
+        assert "Download complete" in mock_stdout.getvalue()
+
+    @patch("sys.stdout", new_callable=io.StringIO)
+    async def test_pages_stop_with_less_metadata(self, mock_stdout):
+        """Tests a day ends at the page without a next page link, or at the first empty page when there is no metadata."""
+        requests = {}
+        for metadata in ("links", "none"):
+            runner, report_api = await start_mock_server(metadata=metadata)
+            try:
+                await main(report_api=report_api, output=self.output, days=range(1, 3), checkpoint=None, cache=None)
+            finally:
+                await runner.cleanup()
+            requests[metadata] = runner.app[STATS]["requests"]
+
+        assert requests == {"links": 2 * 10, "none": 2 * 11}
+
+    @patch("sys.stdout", new_callable=io.StringIO)
+    async def test_larger_pages_need_fewer_requests(self, mock_stdout):
+        """Tests a page size of a whole day downloads each day in one request."""
+        runner, report_api = await start_mock_server()
+        try:
+            await main(report_api=report_api, output=self.output, days=range(1, 4), checkpoint=None, page_size=96, cache=None)
+        finally:
+            await runner.cleanup()
+
+        assert runner.app[STATS]["requests"] == 3
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+import asyncio
+import io
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from ..connection import ConnectorSettings
+from ..mock_server import STATS, start_mock_server
+from ..output import PartitionedWriter
+from ..parallel_processing import RetryPolicy, download_all, download_report_with_retry
+from ..rate_limit import AdaptiveLimiter, TokenBucket
+
+
+class TestAdaptiveLimiter(unittest.TestCase):
+    def test_ramps_up_while_latency_is_stable(self):
+        """Tests the limit rises by about one for every limit's worth of successful responses."""
+        limiter = AdaptiveLimiter(initial=4, maximum=64)
+
+        for _ in range(4 + 5 + 6):
+            limiter.record(200, 0.01)
+
+        assert 6.5 < limiter.limit < 7.5
+
+    def test_backs_off_on_throttling_once_per_burst(self):
+        """Tests a burst of 429 responses halves the limit once, not once per response."""
+        limiter = AdaptiveLimiter(initial=16, maximum=64)
+
+        for _ in range(16):
+            limiter.record(200, 0.01)
+        for _ in range(5):
+            limiter.record(429, 0.01)
+
+        assert 8 < limiter.limit < 9
+
+    def test_backs_off_on_server_errors_and_rising_latency(self):
+        """Tests server errors and latency well above the best seen both reduce the limit."""
+        errors = AdaptiveLimiter(initial=8)
+        for _ in range(8):
+            errors.record(503, 0.01)
+
+        slow = AdaptiveLimiter(initial=8, latency_tolerance=2.0)
+        slow.record(200, 0.01)
+        for _ in range(20):
+            slow.record(200, 0.1)
+
+        assert errors.limit < 8
+        assert slow.limit < 8
+
+    def test_backs_off_on_requests_without_a_response(self):
+        """Tests requests that time out or fail to connect halve the limit once per burst, like server errors."""
+        limiter = AdaptiveLimiter(initial=8)
+
+        for _ in range(8):
+            limiter.failed()
+        assert limiter.limit == 4
+        for _ in range(3):
+            limiter.failed()
+        assert limiter.limit == 4
+        limiter.failed()
+        assert limiter.limit == 2
+
+    def test_limit_stays_within_bounds(self):
+        """Tests the limit never leaves the minimum and maximum."""
+        limiter = AdaptiveLimiter(initial=2, minimum=2, maximum=3)
+
+        for _ in range(100):
+            limiter.record(200, 0.01)
+        assert limiter.limit == 3
+
+        for _ in range(100):
+            limiter.record(429, 0.01)
+        assert limiter.limit == 2
+
+
+class TestTokenBucket(unittest.IsolatedAsyncioTestCase):
+    async def test_rate_is_capped(self):
+        """Tests requests are started no faster than the rate."""
+        bucket = TokenBucket(rate=100)
+
+        started = time.monotonic()
+        await asyncio.gather(*(bucket.acquire() for _ in range(21)))
+
+        assert time.monotonic() - started >= 0.19
+
+
+class TestThrottledDownload(unittest.IsolatedAsyncioTestCase):
+    @patch("sys.stdout", new_callable=io.StringIO)
+    async def test_limiter_settles_near_server_capacity(self, mock_stdout):
+        """Tests downloading from a server that throttles above 6 requests in flight ramps the limiter up from 2 to 6, then holds it near 6."""
+        # the server's latency is well above the time spent parsing and storing each page, so requests the limiter lets through
+        # are in flight at the server, and only throttling backs off, as latency on a loaded test machine says little about the server
+        runner, report_api = await start_mock_server(latency=0.1, capacity=6)
+        limiter = AdaptiveLimiter(initial=2, maximum=32, latency_tolerance=100.0)
+        limits = []
+        record = limiter.record
+
+        def record_limit(status: int, latency: float) -> None:
+            record(status, latency)
+            limits.append((status, limiter.limit))
+
+        limiter.record = record_limit
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                async with ConnectorSettings().session() as session:
+                    async with PartitionedWriter(os.path.join(directory, "reports"), compress=False) as writer:
+                        await download_all(session, writer, [("2", f"{day:02}082021") for day in range(1, 7)], max_concurrent=32, report_api=report_api, limiter=limiter,
+                                           retry=RetryPolicy(attempts=20, base_delay=0.001, max_delay=0.01))
+        finally:
+            await runner.cleanup()
+
+        stats = runner.app[STATS]
+        # every throttled request is retried
+        assert stats["requests"] == 6 * 10 + stats["throttled"]
+        assert stats["max_in_flight"] == 6
+        assert 0 < stats["throttled"] < stats["requests"] / 4
+        # from the first to the last throttled response the limit stays near the capacity, the last few pages of the download
+        # leave the server idle so the limit is free to ramp up again after them
+        throttled = [number for number, (status, _) in enumerate(limits) if status == 429]
+        assert max(limit for _, limit in limits[:throttled[0] + 1]) >= 6
+        assert all(3 <= limit <= 12 for _, limit in limits[throttled[0]:throttled[-1] + 1])
+
+
+class TestTimedOutDownload(unittest.IsolatedAsyncioTestCase):
+    async def test_timeouts_back_the_limiter_off(self):
+        """Tests requests to a server slower than the timeout back the limiter off once a limit's worth of them have timed out, rather than keeping its limit."""
+        runner, report_api = await start_mock_server(latency=0.3)
+        limiter = AdaptiveLimiter(initial=4)
+        try:
+            async with ConnectorSettings(total_timeout=0.05).session() as session:
+                with self.assertRaises(asyncio.TimeoutError):
+                    await download_report_with_retry(limiter, session, "01082021", "01082021", "2", "1", 10, report_api, RetryPolicy(attempts=5, base_delay=0.001, max_delay=0.001))
+        finally:
+            await runner.cleanup()
+
+        assert limiter.limit == 2
+        assert limiter.in_flight == 0
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import json
+import tracemalloc
+import unittest
+from datetime import datetime, timezone
+
+from ..mock_server import report_rows
+from ..report_stream import MISSING, ReportStreamParser
+
+
+def page_body(rows: list[dict], header_first: bool = True) -> bytes:
+    """Returns the body of a report page holding the rows."""
+    header = {"row_count": len(rows), "links": []}
+    page = {"Header": header, "Rows": rows} if header_first else {"Rows": rows, "Header": header}
+    return json.dumps(page).encode()
+
+
+def parse(body: bytes, chunk_size: int, batch_rows: int = 1024) -> tuple[ReportStreamParser, list[dict]]:
+    """Feeds a body to a parser a chunk at a time and returns the parser and the columns of every batch it handed on."""
+    batches = []
+    parser = ReportStreamParser("2", lambda batch: batches.append({
+        "timestamp": batch.timestamp.tolist(), "interval": batch.interval.tolist(), "avg_mph": batch.avg_mph.tolist(), "total_volume": batch.total_volume.tolist(),
+    }), batch_rows)
+    for start in range(0, len(body), chunk_size):
+        parser.feed(body[start:start + chunk_size])
+    parser.close()
+    return parser, batches
+
+
+class TestReportStreamParser(unittest.TestCase):
+    def test_chunks_parse_the_same_as_the_whole_body(self):
+        """Tests the rows and header are the same however the body is split, with the header before or after the rows."""
+        rows = report_rows("2", "01082021", "01082021", 0, 96)
+        day_start = int(datetime(2021, 8, 1, tzinfo=timezone.utc).timestamp())
+
+        for header_first in (True, False):
+            body = page_body(rows, header_first)
+            for chunk_size in (1, 7, 4096, len(body)):
+                parser, batches = parse(body, chunk_size, batch_rows=40)
+
+                assert parser.header == {"row_count": 96, "links": []}
+                assert parser.rows == 96
+                assert [len(batch["interval"]) for batch in batches] == [40, 40, 16]
+                assert sum((batch["interval"] for batch in batches), []) == list(range(96))
+                assert batches[0]["timestamp"][:2] == [day_start + 14 * 60, day_start + 29 * 60]
+                assert sum((batch["avg_mph"] for batch in batches), []) == [int(row["Avg mph"]) for row in rows]
+
+    def test_blank_values_are_missing(self):
+        """Tests blank speeds and volumes are stored as MISSING and written as null."""
+        row = {"Report Date": "2021-08-01T00:00:00", "Time Period Ending": "00:14:00", "Time Interval": "0", "Avg mph": "", "Total Volume": ""}
+        lines = []
+        parser = ReportStreamParser("2", lambda batch: lines.append(batch.to_ndjson()))
+
+        parser.feed(page_body([row]))
+        parser.close()
+
+        assert json.loads(lines[0]) == {"site": "2", "timestamp": int(datetime(2021, 8, 1, 0, 14, tzinfo=timezone.utc).timestamp()), "interval": 0, "avg_mph": None, "total_volume": None}
+        assert MISSING == -1
+
+    def test_incomplete_body_is_an_error(self):
+        """Tests a body cut off part way through fails when the parser is closed."""
+        body = page_body(report_rows("2", "01082021", "01082021", 0, 10))
+        parser = ReportStreamParser("2", lambda batch: None)
+
+        parser.feed(body[:-20])
+        with self.assertRaises(ValueError):
+            parser.close()
+
+    def test_memory_does_not_grow_with_the_page(self):
+        """Tests the memory used to parse a page is the same for a page three times the size, and far less than the page itself."""
+        peaks = []
+        for end, days in (("31082021", 31), ("31102021", 92)):
+            body = page_body(report_rows("2", "01082021", end, 0, days * 96))
+            parser = ReportStreamParser("2", lambda batch: batch.to_ndjson())
+
+            tracemalloc.start()
+            try:
+                for start in range(0, len(body), 64 * 1024):
+                    parser.feed(body[start:start + 64 * 1024])
+                parser.close()
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+            assert parser.rows == days * 96
+
+        assert peaks[1] < peaks[0] * 1.25
+        assert peaks[1] < len(body) / 2
+
+
+if __name__ == "__main__":
+    unittest.main()